@@ -0,0 +1,281 @@
+"""
+輸出後處理模組
+提供共用額外檔案的放置，以及直接在記憶體中建立 ZIP 壓縮檔
+"""
+
+import errno
+import glob
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from schema import DocumentConfig
+
+logger = logging.getLogger(__name__)
+
+
+# 已壓縮的圖片格式在 ZIP 中直接存放，不再以 deflate 重新壓縮
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.zip'}
+
+# 表示檔案系統或平台不支援該放置方式的錯誤碼，只有這些錯誤才改用下一種方式；
+# 其他錯誤（例如磁碟已滿、權限不足的資料夾）直接拋出
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL}
+
+
+def additional_files(config: DocumentConfig) -> List[Path]:
+    """
+    展開模板中指定的額外檔案
+
+    :param config: 模板設定
+    :return: 符合模式的檔案路徑列表
+    """
+    files = []
+    for file_pattern in config.output.other_file or []:
+        # 處理檔案模式，例如 "/resources/passport_pages/*.png"
+        if file_pattern.startswith('/'):
+            file_pattern = file_pattern[1:]  # 移除開頭的 /
+
+        for src_file in glob.glob(file_pattern):
+            src_path = Path(src_file)
+            if src_path.is_file():
+                files.append(src_path)
+    return files
+
+
+class SharedResources:
+    """
+    所有人員共用的額外檔案
+
+    每次執行只展開一次 other_file 模式。放入個別資料夾時優先使用硬連結或 reflink，
+    檔案系統不支援時才複製；建立壓縮檔時共用檔案只讀取並壓縮一次，之後每個 ZIP 直接沿用。
+
+    :param files: 額外檔案路徑列表
+    :param mode: 放置方式，auto 依序嘗試 hardlink、reflink、copy
+    """
+
+    def __init__(self, files: List[Path], mode: str = "auto"):
+        self.files = files
+        self.names = {path.name for path in files}
+        self._methods = list(PLACE_METHODS) if mode == "auto" else [mode]
+        self._archive_template: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """傳給工作行程時只帶檔案清單與可用的放置方式，鎖與壓縮檔內容在工作行程中重新建立"""
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_archive_template"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: DocumentConfig) -> "SharedResources":
+        """依模板設定展開額外檔案"""
+        return cls(additional_files(config), config.output.other_file_mode)
+
+    def place(self, person_dir: Path):
+        """
+        將額外檔案放入單一人員的輸出資料夾
+
+        :param person_dir: 人員輸出資料夾
+        """
+        person_dir.mkdir(parents=True, exist_ok=True)
+        for src_path in self.files:
+            dst_path = person_dir / src_path.name
+            method = self._place_one(src_path, dst_path)
+            logger.info("已放置檔案 (%s): %s -> %s", method, src_path, dst_path)
+
+    def _place_one(self, src_path: Path, dst_path: Path) -> str:
+        """
+        依序嘗試可用的放置方式
+
+        檔案系統不支援的方式（見 UNSUPPORTED_ERRNOS）之後不再嘗試；其他錯誤或最後一種方式失敗時拋出錯誤
+        """
+        methods = list(self._methods)
+        for i, method in enumerate(methods):
+            try:
+                PLACE_METHODS[method](src_path, dst_path)
+                return method
+            except OSError as e:
+                if i == len(methods) - 1 or e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                logger.debug("無法以 %s 放置 %s: %s，改用其他方式", method, src_path, e)
+                with self._lock:
+                    if method in self._methods:
+                        self._methods.remove(method)
+
+    def archive_template(self) -> bytes:
+        """只含共用檔案的 ZIP 壓縮檔內容，第一次使用時建立"""
+        if self._archive_template is None:
+            with self._lock:
+                if self._archive_template is None:
+                    buffer = io.BytesIO()
+                    with zipfile.ZipFile(buffer, 'w') as zf:
+                        for src_path in self.files:
+                            zf.write(src_path, arcname=src_path.name, compress_type=_compress_type(src_path.name))
+                    self._archive_template = buffer.getvalue()
+        return self._archive_template
+
+    def build_archive(self, card_name: str, card_data: bytes) -> bytes:
+        """
+        建立單一人員的 ZIP 壓縮檔：複製共用檔案的 ZIP 內容後附加證件
+
+        :param card_name: 證件在壓縮檔中的檔名
+        :param card_data: 已編碼的證件內容
+        :return: ZIP 壓縮檔內容
+        """
+        if card_name in self.names:
+            # 證件與共用檔案同名時，壓縮檔中以證件為準
+            return build_archive(card_name, card_data, self.files)
+
+        buffer = io.BytesIO(self.archive_template())
+        buffer.seek(0, io.SEEK_END)
+        with zipfile.ZipFile(buffer, 'a') as zf:
+            zf.writestr(_card_info(card_name), card_data)
+        return buffer.getvalue()
+
+
+def _replace_atomically(dst_path: Path, create: Callable[[Path], None]):
+    """
+    以暫存檔建立目標檔案後再以 os.replace 取代
+
+    多個工作行程同時放置同一個資料夾（多筆資料共用 save_to）時，不會出現先刪除再建立之間的空窗而發生 FileExistsError；
+    目標是以硬連結放置、與原始檔案共用內容的檔案時，也只會替換目錄項目，不會寫入原始檔案。
+
+    :param dst_path: 目標檔案路徑
+    :param create: 在指定路徑建立新檔案的函式
+    """
+    tmp_path = dst_path.with_name(f".{dst_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        create(tmp_path)
+        os.replace(tmp_path, dst_path)
+    finally:
+        # 建立失敗，或暫存檔與目標已是同一個檔案（rename 不做任何事）時，暫存檔仍然存在
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _hardlink(src_path: Path, dst_path: Path):
+    """以硬連結放置檔案，目標已是同一個檔案時略過"""
+    try:
+        if os.path.samefile(src_path, dst_path):
+            return
+    except FileNotFoundError:
+        pass
+    _replace_atomically(dst_path, lambda tmp_path: os.link(src_path, tmp_path))
+
+
+def _reflink(src_path: Path, dst_path: Path):
+    """以 reflink (FICLONE) 放置檔案，只支援 Linux 上的 Btrfs、XFS 等檔案系統"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "此平台不支援 reflink")
+
+    def clone(tmp_path: Path):
+        with open(src_path, 'rb') as src, open(tmp_path, 'xb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(src_path, tmp_path)
+
+    _replace_atomically(dst_path, clone)
+
+
+def _copy(src_path: Path, dst_path: Path):
+    """複製檔案"""
+    _replace_atomically(dst_path, lambda tmp_path: shutil.copy2(src_path, tmp_path))
+
+
+# Linux FICLONE ioctl 編號
+FICLONE = 0x40049409
+
+# 額外檔案的放置方式，auto 模式依此順序嘗試
+PLACE_METHODS: Dict[str, Callable[[Path, Path], None]] = {
+    "hardlink": _hardlink,
+    "reflink": _reflink,
+    "copy": _copy,
+}
+
+
+def copy_additional_files_for_row(config: DocumentConfig, row: Dict[str, str], output_dir: str,
+                                  resources: Optional[SharedResources] = None):
+    """
+    將模板中指定的額外檔案放入單一人員的輸出資料夾
+
+    :param config: 模板設定
+    :param row: CSV 資料行
+    :param output_dir: 輸出資料夾路徑
+    :param resources: 已展開的共用檔案，None 表示依模板設定重新展開
+    """
+    if not config.output.other_file:
+        return
+
+    id_number = row.get('id_number', '')
+    if not id_number:
+        return
+
+    if resources is None:
+        resources = SharedResources.from_config(config)
+    resources.place(Path(output_dir) / config.output.save_to.format(**row))
+
+
+def archive_path_for_row(config: DocumentConfig, row: Dict[str, str], output_dir: str) -> Optional[Path]:
+    """
+    單一人員 ZIP 壓縮檔的路徑：{save_to 的上層資料夾}/{身分證號碼}_documents.zip
+
+    :param config: 模板設定
+    :param row: CSV 資料行
+    :param output_dir: 輸出資料夾路徑
+    :return: 壓縮檔路徑，沒有身分證號碼時回傳 None
+    """
+    id_number = row.get('id_number', '')
+    if not id_number:
+        return None
+
+    person_dir = Path(output_dir) / config.output.save_to.format(**row)
+    return person_dir.parent / f"{id_number}_documents.zip"
+
+
+def _compress_type(filename: str) -> int:
+    """依副檔名決定 ZIP 壓縮方式"""
+    return zipfile.ZIP_STORED if Path(filename).suffix.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def _card_info(card_name: str) -> zipfile.ZipInfo:
+    """證件在壓縮檔中的項目資訊"""
+    info = zipfile.ZipInfo(card_name, date_time=time.localtime()[:6])
+    info.compress_type = _compress_type(card_name)
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def build_archive(card_name: str, card_data: bytes, extra_files: Iterable[Path]) -> bytes:
+    """
+    在記憶體中建立單一人員的 ZIP 壓縮檔，內容為已編碼的證件與額外檔案
+
+    :param card_name: 證件在壓縮檔中的檔名
+    :param card_data: 已編碼的證件內容
+    :param extra_files: 額外檔案路徑
+    :return: ZIP 壓縮檔內容
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        zf.writestr(_card_info(card_name), card_data)
+
+        names = {card_name}
+        for src_path in extra_files:
+            if src_path.name in names:
+                continue
+            names.add(src_path.name)
+            zf.write(src_path, arcname=src_path.name, compress_type=_compress_type(src_path.name))
+    return buffer.getvalue()
@@ -0,0 +1,114 @@
+"""
+MRZ 批次產生效能比較
+比較逐筆呼叫 build_mrz_line1 / build_mrz_line2 與批次 API 的執行時間，並確認兩者結果完全相同
+
+在專案根目錄執行：python -m benchmarks.mrz_batch -n 30000
+"""
+
+import random
+import string
+import time
+
+import click
+
+from libs.mrzgenerater import MRZGenerator
+
+# 產生姓名時使用的字元：大小寫字母、空白與常見符號
+_NAME_CHARS = string.ascii_letters + " -'."
+
+# 部分姓名會加入的非 ASCII 字元（轉大寫後會改變長度，或需要替換為填充字元）
+_NON_ASCII_CHARS = "éßÅﬁ王"
+
+
+def generate_columns(n: int, seed: int = 0, non_ascii_ratio: float = 0.05):
+    """
+    產生隨機的 MRZ 欄位資料
+
+    :param n: 資料筆數
+    :param seed: 亂數種子
+    :param non_ascii_ratio: 姓名含有非 ASCII 字元的比例
+    :return: 欄位名稱對應資料列表的字典
+    """
+    rng = random.Random(seed)
+
+    def text(chars: str, low: int, high: int) -> str:
+        return "".join(rng.choice(chars) for _ in range(rng.randint(low, high)))
+
+    def name(high: int) -> str:
+        value = text(_NAME_CHARS, 0, high)
+        if rng.random() < non_ascii_ratio:
+            position = rng.randint(0, len(value))
+            value = value[:position] + rng.choice(_NON_ASCII_CHARS) + value[position:]
+        return value
+
+    def date() -> str:
+        return f"{rng.randint(0, 99):02d}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+
+    return {
+        "country_codes": [rng.choice(["NRE", "TWN", "nre", "X"]) for _ in range(n)],
+        "last_names": [name(20) for _ in range(n)],
+        "first_names": [name(30) for _ in range(n)],
+        "passport_numbers": [text(string.ascii_uppercase + string.digits + "-", 5, 12) for _ in range(n)],
+        "nationalities": [rng.choice(["NRE", "TWN", "n r"]) for _ in range(n)],
+        "dobs": [date() for _ in range(n)],
+        "genders": [rng.choice(["M", "F", "<", "m", "X", ""]) for _ in range(n)],
+        "expiry_dates": [date() for _ in range(n)],
+        "personal_identifiers": [text(string.ascii_letters + string.digits, 0, 12) for _ in range(n)],
+    }
+
+
+def per_row(generator: MRZGenerator, columns):
+    """逐筆產生 MRZ"""
+    line1 = [generator.build_mrz_line1(*args) for args in zip(
+        columns["country_codes"], columns["last_names"], columns["first_names"])]
+    line2 = [generator.build_mrz_line2(*args) for args in zip(
+        columns["passport_numbers"], columns["nationalities"], columns["dobs"],
+        columns["genders"], columns["expiry_dates"], columns["personal_identifiers"])]
+    return line1, line2
+
+
+def batch(generator: MRZGenerator, columns):
+    """以批次 API 產生 MRZ"""
+    line1 = generator.build_mrz_line1_batch(columns["country_codes"], columns["last_names"], columns["first_names"])
+    line2 = generator.build_mrz_line2_batch(
+        columns["passport_numbers"], columns["nationalities"], columns["dobs"],
+        columns["genders"], columns["expiry_dates"], columns["personal_identifiers"])
+    return line1, line2
+
+
+def _best_time(func, repeat: int) -> float:
+    """執行多次並回傳最短時間（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@click.command()
+@click.option('--rows', '-n', default=30000, type=click.IntRange(min=1), help='資料筆數')
+@click.option('--repeat', '-r', default=3, type=click.IntRange(min=1), help='量測次數（取最小值）')
+@click.option('--seed', default=0, help='亂數種子')
+@click.option('--non-ascii', default=0.05, type=click.FloatRange(0, 1), help='姓名含有非 ASCII 字元的比例')
+def main(rows, repeat, seed, non_ascii):
+    """比較逐筆與批次 MRZ 產生的速度，並確認結果相同"""
+    generator = MRZGenerator()
+    columns = generate_columns(rows, seed, non_ascii)
+
+    expected_line1, expected_line2 = per_row(generator, columns)
+    line1, line2 = batch(generator, columns)
+    mismatches = sum(a != b for a, b in zip(expected_line1, line1.tolist())) \
+        + sum(a != b for a, b in zip(expected_line2, line2.tolist()))
+    if mismatches:
+        raise click.ClickException(f"批次結果與逐筆結果不同: {mismatches} 行")
+
+    per_row_time = _best_time(lambda: per_row(generator, columns), repeat)
+    batch_time = _best_time(lambda: batch(generator, columns), repeat)
+    click.echo(f"{rows} 筆，結果完全相同")
+    click.echo(f"逐筆: {per_row_time * 1000:.1f} ms")
+    click.echo(f"批次: {batch_time * 1000:.1f} ms ({per_row_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
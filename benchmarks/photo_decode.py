@@ -0,0 +1,80 @@
+"""
+照片解碼效能比較
+比較完整解碼與預先縮小解碼（JPEG draft、整數倍 reduce）的耗時、解碼尺寸與最大常駐記憶體
+
+在專案根目錄執行：python -m benchmarks.photo_decode photos/A100000003.jpg 260x340 -r 5
+
+每種模式都在獨立的子行程中執行，以取得各自的最大常駐記憶體。
+"""
+
+import subprocess
+import sys
+import time
+from typing import Tuple
+
+import click
+
+from photo_loader import open_photo
+
+
+def _measure(photo_path: str, target_size: Tuple[int, int], reduce: bool, repeat: int) -> Tuple[float, int, Tuple[int, int]]:
+    """
+    測量解碼時間與解碼後的像素緩衝大小
+
+    :return: (平均解碼秒數, 解碼後 RGBA 緩衝位元組數, 解碼後尺寸)
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        photo = open_photo(photo_path, target_size, reduce=reduce)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, photo.width * photo.height * 4, photo.size
+
+
+def _peak_rss_kb() -> int:
+    """目前行程的最大常駐記憶體 (KB)，不支援的平台回傳 -1"""
+    try:
+        import resource
+    except ImportError:
+        return -1
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的單位為位元組，Linux 為 KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _parse_size(value: str) -> Tuple[int, int]:
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise click.BadParameter(f"格式應為 寬x高，例如 260x340: {value}")
+    return width, height
+
+
+@click.command()
+@click.argument('photo', type=click.Path(exists=True, dir_okay=False))
+@click.argument('size')
+@click.option('--repeat', '-r', default=5, type=click.IntRange(min=1), help='每種模式重複解碼的次數')
+@click.option('--measure', type=click.Choice(["full", "reduced"]), hidden=True)
+def main(photo, size, repeat, measure):
+    """比較完整解碼與預先縮小解碼 PHOTO 到 SIZE（寬x高）的耗時與記憶體"""
+    target_size = _parse_size(size)
+    if measure:
+        elapsed, buffer_bytes, decoded_size = _measure(photo, target_size, measure == "reduced", repeat)
+        click.echo(f"{elapsed} {buffer_bytes} {decoded_size[0]} {decoded_size[1]} {_peak_rss_kb()}")
+        return
+
+    click.echo(f"照片: {photo}，目標尺寸: {target_size[0]}x{target_size[1]}，重複 {repeat} 次")
+    for mode in ("full", "reduced"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.photo_decode", photo, size, "-r", str(repeat), "--measure", mode],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        elapsed, buffer_bytes, width, height, peak_kb = output.split()
+        click.echo(
+            f"{mode:>8}: 解碼 {float(elapsed) * 1000:8.1f} ms/張，"
+            f"解碼尺寸 {width}x{height}，RGBA 緩衝 {int(buffer_bytes) / (1024 * 1024):7.1f} MB，"
+            f"最大常駐記憶體 {int(peak_kb) / 1024:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""
+效能測試套件
+以合成持證人資料量測 DocumentGenerator.process_batch、各階段延遲、照片讀取方式、MRZGenerator 與照片轉換，
+記錄吞吐量、延遲百分位數與最大常駐記憶體，結果寫成 JSON，並可與基準結果比較找出效能退步
+
+在專案根目錄執行：
+  python -m benchmarks.suite run --size 1k -o results.json
+  python -m benchmarks.suite run --size 10k -w 4 --baseline baseline.json --threshold 0.15
+  python -m benchmarks.suite compare results.json baseline.json
+
+每個測試項目都在獨立的子行程中執行，最大常駐記憶體互不影響。
+"""
+
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+from benchmarks.synthetic import DEFAULT_CONVERTER_FILES, DEFAULT_PHOTO_POOL, DEFAULT_PHOTO_SIZE, PROJECT_DIR, SIZES, \
+    prepare_workdir
+
+# 結果檔格式版本
+RESULT_FORMAT_VERSION = 1
+
+# 測試項目，依執行順序排列
+CASES = ["process_batch", "stages", "photo_intake", "mrz", "converter"]
+
+# 預設的效能退步門檻（相對於基準結果的比例）
+DEFAULT_THRESHOLD = 0.10
+
+# 預設的合成資料工作資料夾
+DEFAULT_WORKDIR = Path(tempfile.gettempdir()) / "id_gen_benchmark"
+
+
+def _peak_rss_mb() -> Dict[str, Optional[float]]:
+    """目前行程與已結束子行程中最大的常駐記憶體 (MB)，不支援的平台為 None"""
+    try:
+        import resource
+    except ImportError:
+        return {"peak_rss_mb": None, "peak_child_rss_mb": None}
+    # macOS 的單位為位元組，Linux 為 KB
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    """以毫秒表示的延遲百分位數"""
+    import numpy as np
+
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3), "max_ms": round(float(values.max()), 3)}
+
+
+def _load_rows(rows: int):
+    """讀取工作資料夾中的合成 CSV"""
+    from document_generator import load_csv_data
+    return load_csv_data("data/cardholders.csv")[:rows]
+
+
+def measure_process_batch(rows: int, workers: int, **_) -> Dict[str, object]:
+    """完整的批次生成：預檢、渲染、編碼與寫入，並附上生成器記錄的各階段耗時"""
+    from document_generator import DocumentGenerator
+    from timings import stage_timings
+
+    csv_data = _load_rows(rows)
+    output_dir = tempfile.mkdtemp(prefix="output-", dir=".")
+    try:
+        start = time.perf_counter()
+        generator = DocumentGenerator("benchmark.yml", output_dir=output_dir, use_template_cache=False)
+        loaded = time.perf_counter()
+        results = generator.process_batch(csv_data, workers=workers)
+        elapsed = time.perf_counter() - loaded
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        "rows": len(csv_data),
+        "failed": sum(1 for _, success, _ in results if not success),
+        "template_load_seconds": round(loaded - start, 4),
+        "seconds": round(elapsed, 3),
+        "cards_per_sec": round(len(csv_data) / elapsed, 2),
+        "stages": {
+            stage: {"p50_ms": round(h.quantile(0.5) * 1000, 3), "p95_ms": round(h.quantile(0.95) * 1000, 3),
+                    "max_ms": round(h.max * 1000, 3)}
+            for stage, h in stage_timings.by_stage().items()
+        },
+        **_peak_rss_mb(),
+    }
+
+
+def measure_stages(rows: int, stage_samples: int, **_) -> Dict[str, object]:
+    """在目前行程中逐張量測預檢、渲染（含照片）、編碼與寫入的延遲"""
+    from document_generator import DocumentGenerator
+    from prepass import prepare_rows
+
+    csv_data = _load_rows(min(rows, stage_samples))
+    output_dir = tempfile.mkdtemp(prefix="output-", dir=".")
+    render, encode, write = [], [], []
+    try:
+        generator = DocumentGenerator("benchmark.yml", output_dir=output_dir, use_template_cache=False)
+        start = time.perf_counter()
+        prepared = [row for row, error in prepare_rows(generator.plan, csv_data, generator.output_file_path) if error is None]
+        prepass = time.perf_counter() - start
+
+        for row in prepared:
+            start = time.perf_counter()
+            document = generator.generate_document(row)
+            rendered = time.perf_counter()
+            file_path, data = generator.encode_for_row(document, row)
+            encoded = time.perf_counter()
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(data)
+            written = time.perf_counter()
+            render.append(rendered - start)
+            encode.append(encoded - rendered)
+            write.append(written - encoded)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        "cards": len(prepared),
+        "prepass_us_per_row": round(prepass / max(1, len(csv_data)) * 1e6, 2),
+        "render": _percentiles(render),
+        "encode": _percentiles(encode),
+        "write": _percentiles(write),
+        **_peak_rss_mb(),
+    }
+
+
+def _generate_with_photos(photo_folder: str, rows: List[Dict[str, str]]) -> float:
+    """以指定的照片資料夾單行程生成證件，回傳耗時（秒）"""
+    from document_generator import DocumentGenerator
+
+    template_path = Path(photo_folder) / "benchmark.yml"
+    template_path.write_text(Path("benchmark.yml").read_text(encoding="utf-8").replace(
+        'folder: "photos"', f'folder: "{photo_folder}"'), encoding="utf-8")
+    output_dir = tempfile.mkdtemp(prefix="output-", dir=".")
+    try:
+        generator = DocumentGenerator(str(template_path), output_dir=output_dir, use_template_cache=False)
+        start = time.perf_counter()
+        generator.process_batch(rows)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def measure_photo_intake(rows: int, stage_samples: int, **_) -> Dict[str, object]:
+    """
+    比較 CLI 的兩種照片讀取方式的每張證件耗時（單一工作行程）
+
+    png: 舊的做法，先把 JPEG 全部轉換為全尺寸 PNG，生成時完整解碼 PNG；
+    jpeg: 目前的做法，不轉換，生成時以 draft 直接縮小解碼 JPEG。
+    """
+    from converter import CONVERT_EXTENSIONS, convert_images_to_png
+
+    csv_data = _load_rows(min(rows, stage_samples))
+    intake_dir = Path(tempfile.mkdtemp(prefix="intake-", dir=".")).resolve()
+    try:
+        folders = {}
+        for name in ("png", "jpeg"):
+            folder = folders[name] = intake_dir / name
+            folder.mkdir()
+            for row in csv_data:
+                shutil.copy(Path("photos") / f"{row['id_number']}.jpg", folder)
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            convert_images_to_png(folders["png"])
+            png_convert = time.perf_counter() - start
+            # 舊的照片索引優先使用 PNG：移除 JPEG，只留下轉換結果
+            for source in folders["png"].glob("*.jpg"):
+                source.unlink()
+
+            start = time.perf_counter()
+            convert_images_to_png(folders["jpeg"], extensions=CONVERT_EXTENSIONS)
+            jpeg_convert = time.perf_counter() - start
+
+        png_render = _generate_with_photos(str(folders["png"]), csv_data)
+        jpeg_render = _generate_with_photos(str(folders["jpeg"]), csv_data)
+    finally:
+        shutil.rmtree(intake_dir, ignore_errors=True)
+
+    cards = len(csv_data)
+    png_total, jpeg_total = png_convert + png_render, jpeg_convert + jpeg_render
+    return {
+        "cards": cards,
+        "png": {"convert_ms": round(png_convert / cards * 1000, 3), "render_ms": round(png_render / cards * 1000, 3),
+                "card_ms": round(png_total / cards * 1000, 3)},
+        "jpeg": {"convert_ms": round(jpeg_convert / cards * 1000, 3), "render_ms": round(jpeg_render / cards * 1000, 3),
+                 "card_ms": round(jpeg_total / cards * 1000, 3)},
+        "speedup": round(png_total / jpeg_total, 2),
+        **_peak_rss_mb(),
+    }
+
+
+def measure_mrz(rows: int, seed: int, **_) -> Dict[str, object]:
+    """MRZGenerator 逐筆與批次產生兩行 MRZ 的速度"""
+    from benchmarks.mrz_batch import _best_time, batch, generate_columns, per_row
+    from libs.mrzgenerater import MRZGenerator
+
+    generator = MRZGenerator()
+    columns = generate_columns(rows, seed)
+    per_row_time = _best_time(lambda: per_row(generator, columns), 3)
+    batch_time = _best_time(lambda: batch(generator, columns), 3)
+    return {
+        "rows": rows,
+        "per_row_rows_per_sec": round(rows / per_row_time, 1),
+        "batch_rows_per_sec": round(rows / batch_time, 1),
+        **_peak_rss_mb(),
+    }
+
+
+def measure_converter(workers: int, converter_files: int, **_) -> Dict[str, object]:
+    """照片轉換為 PNG 的速度（複製到全新的資料夾再轉換，不會被轉換紀錄略過）"""
+    from converter import convert_images_to_png
+
+    photos_dir = tempfile.mkdtemp(prefix="convert-", dir=".")
+    try:
+        for source in Path("convert").iterdir():
+            shutil.copy(source, photos_dir)
+        source_bytes = sum(entry.stat().st_size for entry in Path(photos_dir).iterdir())
+        # 轉換函式會逐檔輸出進度，量測時捨棄，結果 JSON 才能從 stdout 讀取
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            convert_images_to_png(photos_dir, workers=workers)
+            elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(photos_dir, ignore_errors=True)
+
+    return {
+        "files": converter_files,
+        "files_per_sec": round(converter_files / elapsed, 2),
+        "mb_per_sec": round(source_bytes / elapsed / (1024 * 1024), 2),
+        **_peak_rss_mb(),
+    }
+
+
+def prepare(rows: int, seed: int, photo_size: Tuple[int, int], photo_pool: int, converter_files: int,
+            **_) -> Dict[str, object]:
+    """產生合成資料（參數相同時沿用既有的工作資料夾）"""
+    prepare_workdir(".", rows, seed, photo_size, photo_pool, converter_files)
+    return {}
+
+
+_MEASURES = {
+    "prepare": prepare,
+    "process_batch": measure_process_batch,
+    "stages": measure_stages,
+    "photo_intake": measure_photo_intake,
+    "mrz": measure_mrz,
+    "converter": measure_converter,
+}
+
+
+def _direction(metric: str) -> int:
+    """指標的方向：1 表示越大越好，-1 表示越小越好，0 表示只供參考不比較"""
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith("_per_sec"):
+        return 1
+    if name.endswith("_ms") or name.endswith("_us_per_row") or name in ("seconds", "peak_rss_mb"):
+        return -1
+    return 0
+
+
+def flatten(cases: Dict[str, Dict[str, object]]) -> Dict[str, float]:
+    """將巢狀的結果攤平成「項目.指標」對應數值的字典"""
+    flat = {}
+
+    def visit(prefix: str, value):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                visit(f"{prefix}.{key}", child)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix] = float(value)
+
+    for case, metrics in cases.items():
+        visit(case, metrics)
+    return flat
+
+
+def compare_results(current: Dict[str, object], baseline: Dict[str, object],
+                    threshold: float) -> Tuple[List[List[str]], List[str]]:
+    """
+    比較本次結果與基準結果
+
+    :param current: 本次結果
+    :param baseline: 基準結果
+    :param threshold: 允許的退步比例，例如 0.1 表示吞吐量下降或延遲增加超過 10% 即視為退步
+    :return: (表格資料, 退步的指標名稱列表)
+    """
+    now, before = flatten(current["cases"]), flatten(baseline["cases"])
+    table, regressions = [], []
+    for metric, value in now.items():
+        direction = _direction(metric)
+        if direction == 0 or metric not in before or before[metric] <= 0:
+            continue
+        change = (value - before[metric]) / before[metric]
+        regressed = change * direction < -threshold
+        if regressed:
+            regressions.append(metric)
+        status = "退步" if regressed else ("進步" if change * direction > threshold else "")
+        table.append([metric, f"{before[metric]:g}", f"{value:g}", f"{change:+.1%}", status])
+    return table, regressions
+
+
+def _run_case(case: str, workdir: Path, options: Dict[str, object]) -> Dict[str, object]:
+    """在獨立的子行程中執行一個測試項目（或產生合成資料），回傳其 JSON 結果"""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "measure", case, str(workdir), json.dumps(options)],
+        cwd=PROJECT_DIR, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise click.ClickException(f"測試項目 {case} 執行失敗:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _environment() -> Dict[str, object]:
+    """記錄執行環境，比較不同機器的結果時可以辨識"""
+    import numpy
+    import PIL
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "numpy": numpy.__version__,
+    }
+
+
+def _parse_size(value: str) -> Tuple[int, int]:
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise click.BadParameter(f"格式應為 寬x高，例如 1200x1600: {value}")
+    return width, height
+
+
+@click.group()
+def cli():
+    """證件生成器效能測試套件"""
+
+
+@cli.command("run")
+@click.option('--size', '-s', default='1k', type=click.Choice(list(SIZES)), help='合成資料的規模')
+@click.option('--rows', '-n', type=click.IntRange(min=1), help='資料筆數（覆寫 --size）')
+@click.option('--workers', '-w', default=1, type=click.IntRange(min=0), help='process_batch 與照片轉換的工作行程數量 (0 表示全部 CPU 核心)')
+@click.option('--case', 'cases', multiple=True, type=click.Choice(CASES), help='只執行指定的測試項目，可重複指定 (預設: 全部)')
+@click.option('--seed', default=0, help='合成資料的亂數種子')
+@click.option('--photo-size', default=f"{DEFAULT_PHOTO_SIZE[0]}x{DEFAULT_PHOTO_SIZE[1]}", help='合成照片的解析度 (寬x高)')
+@click.option('--photo-pool', default=DEFAULT_PHOTO_POOL, type=click.IntRange(min=1), help='實際產生的不同照片數量')
+@click.option('--stage-samples', default=200, type=click.IntRange(min=1), help='量測各階段延遲的證件數量')
+@click.option('--converter-files', default=DEFAULT_CONVERTER_FILES, type=click.IntRange(min=1), help='照片轉換測試的檔案數量')
+@click.option('--workdir', default=str(DEFAULT_WORKDIR), help='合成資料的工作資料夾（參數相同時沿用）')
+@click.option('--output', '-o', help='結果 JSON 的輸出路徑')
+@click.option('--baseline', '-b', type=click.Path(exists=True, dir_okay=False), help='比較用的基準結果 JSON')
+@click.option('--threshold', '-t', default=DEFAULT_THRESHOLD, type=click.FloatRange(min=0), help='視為效能退步的比例')
+def run(size, rows, workers, cases, seed, photo_size, photo_pool, stage_samples, converter_files, workdir, output,
+        baseline, threshold):
+    """
+    產生合成資料並執行效能測試
+
+    指定 --baseline 時，任何指標比基準差超過 --threshold 會以非零狀態結束，可用於 CI。
+    """
+    from tabulate import tabulate
+
+    rows = rows or SIZES[size]
+    photo_size = _parse_size(photo_size)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    workdir = Path(workdir).resolve()
+    options = {"rows": rows, "workers": workers, "seed": seed, "photo_size": list(photo_size),
+               "photo_pool": photo_pool, "stage_samples": stage_samples, "converter_files": converter_files}
+
+    # 合成資料也在子行程中產生：Linux 的子行程會繼承父行程的最大常駐記憶體，父行程需保持精簡
+    click.echo(f"準備合成資料: {rows} 筆，照片 {photo_size[0]}x{photo_size[1]}（{min(photo_pool, rows)} 張不同照片）")
+    _run_case("prepare", workdir, options)
+    results = {
+        "format_version": RESULT_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": _environment(),
+        "params": options,
+        "cases": {},
+    }
+    for case in cases or CASES:
+        click.echo(f"執行 {case}...")
+        results["cases"][case] = _run_case(case, workdir, options)
+
+    table = [[metric, f"{value:g}"] for metric, value in flatten(results["cases"]).items()]
+    click.echo(tabulate(table, headers=["metric", "value"], tablefmt="grid"))
+
+    if output:
+        Path(output).write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        click.echo(f"結果已寫入: {output}")
+
+    if baseline:
+        _report_comparison(results, json.loads(Path(baseline).read_text(encoding="utf-8")), threshold)
+
+
+@cli.command("compare")
+@click.argument('result', type=click.Path(exists=True, dir_okay=False))
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', '-t', default=DEFAULT_THRESHOLD, type=click.FloatRange(min=0), help='視為效能退步的比例')
+def compare(result, baseline, threshold):
+    """比較兩份結果 JSON，有效能退步時以非零狀態結束"""
+    _report_comparison(json.loads(Path(result).read_text(encoding="utf-8")),
+                       json.loads(Path(baseline).read_text(encoding="utf-8")), threshold)
+
+
+def _report_comparison(current: Dict[str, object], baseline: Dict[str, object], threshold: float):
+    """輸出比較表格，有退步時拋出 ClickException"""
+    from tabulate import tabulate
+
+    if current.get("params") != baseline.get("params"):
+        click.echo(f"警告：測試參數與基準不同，結果可能無法直接比較\n  本次: {current.get('params')}\n  基準: {baseline.get('params')}")
+    if current.get("environment") != baseline.get("environment"):
+        click.echo("警告：執行環境與基準不同")
+
+    table, regressions = compare_results(current, baseline, threshold)
+    click.echo(tabulate(table, headers=["metric", "baseline", "current", "change", ""], tablefmt="grid"))
+    if regressions:
+        raise click.ClickException(f"{len(regressions)} 項指標退步超過 {threshold:.0%}: {', '.join(regressions)}")
+    click.echo(f"沒有超過 {threshold:.0%} 的效能退步")
+
+
+@cli.command("measure", hidden=True)
+@click.argument('case', type=click.Choice(list(_MEASURES)))
+@click.argument('workdir')
+@click.argument('options')
+def measure(case, workdir, options):
+    """（內部使用）在工作資料夾中執行單一測試項目，並以一行 JSON 輸出結果"""
+    options = json.loads(options)
+    options["photo_size"] = tuple(options["photo_size"])
+    # 專案模組以相對於工作目錄的路徑讀取 templates、fonts 與 photos
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    click.echo(json.dumps(_MEASURES[case](**options)))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,241 @@
+"""
+效能測試用的合成資料
+以固定的亂數種子產生持證人 CSV、照片、背景與模板，同樣的參數每次產生完全相同的內容
+"""
+
+import csv
+import random
+import shutil
+import string
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+# 資料筆數的預設規模
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+# 照片的預設解析度（手機拍攝後裁成證件照比例的常見大小）
+DEFAULT_PHOTO_SIZE = (1200, 1600)
+
+# 實際產生的照片數量，其餘持證人以符號連結共用，避免 100k 筆時產生數十 GB 的照片
+DEFAULT_PHOTO_POOL = 64
+
+# 照片轉換測試的預設檔案數量
+DEFAULT_CONVERTER_FILES = 64
+
+# 合成資料格式版本，產生方式變更時遞增，舊的工作資料夾會重新產生
+SYNTHETIC_FORMAT_VERSION = 1
+
+# 背景圖片大小（約為 ID-1 卡片在 300 DPI 下的尺寸）
+BACKGROUND_SIZE = (1011, 638)
+
+# 專案根目錄，合成工作資料夾中的 fonts 連結到這裡的字體
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# 使用所有欄位類型（文字、數字、日期、條碼、MRZ）與照片的模板
+TEMPLATE_YAML = """\
+id: "benchmark"
+country: "NRE"
+version: "1.0"
+background:
+  image: "benchmark-bg.png"
+  color: "#f4f4f4"
+fields:
+  - key: "name"
+    type: "text"
+    position: [330, 120]
+    font_size: 36
+    font_color: "#112233"
+    font_family: "CartographMonoCF-Regular.ttf"
+    data_path: "name"
+  - key: "nationality"
+    type: "text"
+    position: [330, 180]
+    font_size: 24
+    font_family: "OCR-B.ttf"
+    data_path: "nationality"
+  - key: "id_number"
+    type: "number"
+    position: [330, 230]
+    font_size: 24
+    font_family: "OCR-B.ttf"
+    data_path: "id_number"
+  - key: "birth_date"
+    type: "date"
+    position: [[330, 290], [430, 290], [490, 290]]
+    font_size: 24
+    font_family: "OCR-B.ttf"
+    data_path: "birth_date"
+  - key: "barcode"
+    type: "barcode"
+    position: [640, 260]
+    size: [340, 80]
+    data_path: "id_number"
+  - key: "mrz"
+    type: "mrz"
+    position: [40, 520]
+    font_size: 28
+    data_path: "id_number"
+    mrz:
+      country_code: "NRE"
+      nationality: "{nationality}"
+      last_name: "{last_name}"
+      first_name: "{first_name}"
+      expiry_date: "{expiry_date}"
+photo:
+  enabled: true
+  folder: "photos"
+  position: [40, 60]
+  size: [260, 340]
+  border_radius: 12
+output:
+  dpi: 300
+  save_to: "{id_number}"
+  output_file_format: "card-{id_number}.png"
+"""
+
+# CSV 欄位
+CSV_COLUMNS = ["name", "last_name", "first_name", "id_number", "birth_date", "expiry_date", "gender", "nationality"]
+
+
+def _word(rng: random.Random, low: int, high: int) -> str:
+    return rng.choice(string.ascii_uppercase) + "".join(
+        rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high) - 1))
+
+
+def _date(rng: random.Random, first_year: int, last_year: int) -> str:
+    return f"{rng.randint(first_year, last_year)}/{rng.randint(1, 12)}/{rng.randint(1, 28)}"
+
+
+def iter_cardholders(rows: int, seed: int = 0) -> Iterator[Dict[str, str]]:
+    """
+    產生合成持證人資料
+
+    :param rows: 資料筆數
+    :param seed: 亂數種子
+    :return: CSV 資料行迭代器
+    """
+    rng = random.Random(seed)
+    for i in range(rows):
+        last_name, first_name = _word(rng, 3, 10), _word(rng, 3, 12)
+        yield {
+            "name": f"{first_name} {last_name}",
+            "last_name": last_name,
+            "first_name": first_name,
+            "id_number": f"B{i:09d}",
+            "birth_date": _date(rng, 1940, 2010),
+            "expiry_date": _date(rng, 2027, 2040),
+            "gender": rng.choice(["男", "女", "非二元性別"]),
+            "nationality": rng.choice(["NRE", "NRE", "NRE", "TWN", "JPN"]),
+        }
+
+
+def write_csv(path: str | Path, rows: int, seed: int = 0):
+    """寫入合成持證人 CSV"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(iter_cardholders(rows, seed))
+
+
+def synthetic_photo(size: Tuple[int, int], seed: int) -> Image.Image:
+    """
+    產生合成照片：漸層背景、橢圓臉部與輕微雜訊（模擬感光元件雜訊），讓壓縮後的大小接近實際照片
+
+    :param size: 照片大小 (寬, 高)
+    :param seed: 亂數種子
+    :return: RGB 圖片
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = rng.uniform(60, 200, size=3)
+    image = np.empty((height, width, 3), dtype=np.float32)
+    for channel in range(3):
+        image[..., channel] = base[channel] + 40 * (y / height) - 20 * (x / width)
+
+    face = ((x - width / 2) / (width * 0.3)) ** 2 + ((y - height * 0.45) / (height * 0.3)) ** 2 <= 1
+    image[face] = rng.uniform(150, 230, size=3)
+    image += rng.normal(0, 3, size=image.shape)
+    return Image.fromarray(np.clip(image, 0, 255).astype(np.uint8), "RGB")
+
+
+def write_photos(folder: str | Path, rows: int, seed: int = 0, size: Tuple[int, int] = DEFAULT_PHOTO_SIZE,
+                 pool: int = DEFAULT_PHOTO_POOL, extension: str = ".jpg"):
+    """
+    寫入每位持證人的照片（以身分證號碼命名）
+
+    只產生 pool 張不同的照片，其餘以符號連結指向其中一張，每張證件仍會各自解碼照片。
+
+    :param folder: 照片資料夾
+    :param rows: 持證人數量
+    :param seed: 亂數種子
+    :param size: 照片解析度
+    :param pool: 實際產生的照片數量
+    :param extension: 照片格式（.jpg、.png、.webp 等）
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    pool = max(1, min(pool, rows))
+    for i in range(rows):
+        path = folder / f"B{i:09d}{extension}"
+        if i < pool:
+            synthetic_photo(size, seed * 100_003 + i).save(path, quality=90)
+        else:
+            path.symlink_to(f"B{i % pool:09d}{extension}")
+
+
+def write_background(path: str | Path, seed: int = 0):
+    """寫入合成背景圖片：類似證件底紋的平滑波紋（不加雜訊，壓縮特性接近實際的證件底圖）"""
+    phase = np.random.default_rng(seed).uniform(0, 2 * np.pi, size=3)
+    width, height = BACKGROUND_SIZE
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([
+        200 + 40 * np.sin(x / 37 + phase[0]),
+        215 + 30 * np.cos(y / 23 + phase[1]),
+        225 + 20 * np.sin((x + y) / 51 + phase[2]),
+    ], axis=-1)
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8), "RGB").convert("RGBA").save(path)
+
+
+def prepare_workdir(workdir: str | Path, rows: int, seed: int = 0, photo_size: Tuple[int, int] = DEFAULT_PHOTO_SIZE,
+                    photo_pool: int = DEFAULT_PHOTO_POOL, converter_files: int = DEFAULT_CONVERTER_FILES) -> Path:
+    """
+    建立效能測試的工作資料夾
+
+    結構與專案根目錄相同（templates、fonts、photos、data），在此資料夾中執行即可使用相對路徑；
+    convert 資料夾放照片轉換測試的來源照片。
+    已存在且參數相同的工作資料夾直接沿用。
+
+    :param workdir: 工作資料夾
+    :param rows: 持證人數量
+    :param seed: 亂數種子
+    :param photo_size: 照片解析度
+    :param photo_pool: 實際產生的照片數量
+    :param converter_files: 照片轉換測試的來源照片數量
+    :return: 工作資料夾路徑
+    """
+    workdir = Path(workdir)
+    stamp = f"{SYNTHETIC_FORMAT_VERSION} {rows} {seed} {photo_size[0]}x{photo_size[1]} {photo_pool} {converter_files}\n"
+    stamp_path = workdir / ".synthetic"
+    if stamp_path.exists() and stamp_path.read_text(encoding="utf-8") == stamp:
+        return workdir
+
+    for name in ("templates", "data", "photos"):
+        (workdir / name).mkdir(parents=True, exist_ok=True)
+    fonts = workdir / "fonts"
+    if not fonts.exists():
+        fonts.symlink_to(PROJECT_DIR / "fonts", target_is_directory=True)
+
+    write_background(workdir / "templates" / "benchmark-bg.png", seed)
+    (workdir / "benchmark.yml").write_text(TEMPLATE_YAML, encoding="utf-8")
+    write_csv(workdir / "data" / "cardholders.csv", rows, seed)
+    for entry in (workdir / "photos").iterdir():
+        entry.unlink()
+    write_photos(workdir / "photos", rows, seed, photo_size, photo_pool)
+    shutil.rmtree(workdir / "convert", ignore_errors=True)
+    write_photos(workdir / "convert", converter_files, seed + 1, photo_size, converter_files)
+    stamp_path.write_text(stamp, encoding="utf-8")
+    return workdir
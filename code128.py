@@ -0,0 +1,211 @@
+"""
+Code128 條碼模組
+直接計算 Code128 模組寬度並繪製到證件上，不經過 PNG 編碼與縮放
+"""
+
+import logging
+from typing import List, Optional, Set, Tuple
+
+from PIL import Image, ImageDraw
+
+logger = logging.getLogger(__name__)
+
+# 每個符號值對應的條/空寬度（條、空交錯，由條開始）
+PATTERNS = [
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232", "2331112",
+]
+
+# 特殊符號值
+CODE_C = 99
+CODE_B = 100
+CODE_A = 101
+START_A = 103
+START_B = 104
+START_C = 105
+STOP = 106
+
+# 條碼左右兩側的靜區寬度（模組數）
+QUIET_ZONE_MODULES = 10
+
+# 未指定大小時的預設模組寬度與條高（像素）
+DEFAULT_MODULE_WIDTH = 2
+DEFAULT_BAR_HEIGHT = 100
+
+# 已警告過區域太窄的 (區域寬度, 模組數)，同樣的情況只警告一次
+_narrow_warnings: Set[Tuple[int, int]] = set()
+
+
+def _digit_run(data: str, start: int) -> int:
+    """計算從 start 開始連續的數字個數"""
+    end = start
+    while end < len(data) and data[end].isdigit() and data[end].isascii():
+        end += 1
+    return end - start
+
+
+def _value_in_set(char: str, charset: str) -> Optional[int]:
+    """取得字元在 A 或 B 字元集中的符號值，不在字元集內時回傳 None"""
+    code = ord(char)
+    if charset == "A":
+        if code < 32:
+            return code + 64
+        if code < 96:
+            return code - 32
+        return None
+    if 32 <= code < 128:
+        return code - 32
+    return None
+
+
+def encode_code128(data: str) -> List[int]:
+    """
+    將資料編碼為 Code128 符號值（含起始碼、校驗碼與結束碼）
+
+    連續 4 位以上的數字（位於開頭或結尾）或 6 位以上的數字（位於中間）會切換到字元集 C。
+
+    :param data: 條碼資料，只能包含 ASCII 字元
+    :return: 符號值列表
+    :raises ValueError: 資料為空或包含非 ASCII 字元時拋出
+    """
+    if not data:
+        raise ValueError("條碼資料不可為空")
+    for char in data:
+        if ord(char) >= 128:
+            raise ValueError(f'Code128 不支援的字元 "{char}"')
+
+    def wants_c(pos: int) -> bool:
+        run = _digit_run(data, pos)
+        at_edge = pos == 0 or pos + run == len(data)
+        return run >= (4 if at_edge else 6)
+
+    values: List[int] = []
+    i = 0
+    if wants_c(0) or (len(data) == 2 and _digit_run(data, 0) == 2):
+        charset = "C"
+        values.append(START_C)
+    elif ord(data[0]) < 32:
+        charset = "A"
+        values.append(START_A)
+    else:
+        charset = "B"
+        values.append(START_B)
+
+    while i < len(data):
+        if charset == "C":
+            if _digit_run(data, i) >= 2:
+                values.append(int(data[i:i + 2]))
+                i += 2
+                continue
+            # 數字用完，切換回 A 或 B
+            charset = "A" if ord(data[i]) < 32 else "B"
+            values.append(CODE_A if charset == "A" else CODE_B)
+            continue
+
+        if wants_c(i):
+            # 奇數個數字時，先以目前字元集輸出一位，再切換到 C
+            if _digit_run(data, i) % 2:
+                values.append(_value_in_set(data[i], charset))
+                i += 1
+            charset = "C"
+            values.append(CODE_C)
+            continue
+
+        value = _value_in_set(data[i], charset)
+        if value is None:
+            charset = "B" if charset == "A" else "A"
+            values.append(CODE_B if charset == "B" else CODE_A)
+            value = _value_in_set(data[i], charset)
+        values.append(value)
+        i += 1
+
+    checksum = values[0]
+    for weight, value in enumerate(values[1:], start=1):
+        checksum += weight * value
+    values.append(checksum % 103)
+    values.append(STOP)
+    return values
+
+
+def code128_widths(data: str) -> List[int]:
+    """
+    取得條碼的條/空寬度序列（以模組為單位，由條開始交錯）
+
+    :param data: 條碼資料
+    :return: 寬度列表
+    """
+    widths: List[int] = []
+    for value in encode_code128(data):
+        widths.extend(int(w) for w in PATTERNS[value])
+    return widths
+
+
+def draw_code128(
+    draw: ImageDraw.ImageDraw,
+    data: str,
+    position: Tuple[int, int],
+    size: Optional[Tuple[int, int]] = None,
+    fill=(0, 0, 0, 255),
+    background=(255, 255, 255, 255),
+):
+    """
+    將 Code128 條碼直接繪製到圖片上
+
+    模組寬度取整數像素，條碼在指定區域內水平置中；區域足夠時兩側保留靜區。
+    區域寬度小於條碼的模組數時，改以每模組 1 像素繪製後縮小到區域內（與舊版縮放條碼圖片相同），
+    條碼不會超出區域，但可能無法掃描，會在日誌中警告。
+
+    :param draw: 目標圖片的 ImageDraw 物件
+    :param data: 條碼資料
+    :param position: 左上角位置 (x, y)
+    :param size: 條碼區域大小 (寬, 高)，未指定時使用預設模組寬度與條高
+    :param fill: 條的顏色
+    :param background: 底色，None 表示不填底色
+    """
+    widths = code128_widths(data)
+    total_modules = sum(widths)
+    x, y = position
+
+    if size is None:
+        module_width = DEFAULT_MODULE_WIDTH
+        width = (total_modules + 2 * QUIET_ZONE_MODULES) * module_width
+        height = DEFAULT_BAR_HEIGHT
+    else:
+        width, height = size
+        module_width = width // (total_modules + 2 * QUIET_ZONE_MODULES)
+        if module_width < 1:
+            # 區域太窄時捨棄靜區
+            module_width = width // total_modules
+
+    if background is not None:
+        draw.rectangle([x, y, x + width - 1, y + height - 1], fill=background)
+
+    if module_width < 1:
+        if (width, total_modules) not in _narrow_warnings:
+            _narrow_warnings.add((width, total_modules))
+            logger.warning(f"條碼區域寬度 {width} 像素小於條碼的 {total_modules} 個模組，已縮小繪製，條碼可能無法掃描")
+        mask = Image.new("L", (total_modules, height), 0)
+        _draw_bars(ImageDraw.Draw(mask), widths, 0, 0, 1, height, 255)
+        draw.bitmap((x, y), mask.resize((width, height), Image.Resampling.LANCZOS), fill=fill)
+        return
+
+    bar_x = x + (width - total_modules * module_width) // 2
+    _draw_bars(draw, widths, bar_x, y, module_width, height, fill)
+
+
+def _draw_bars(draw: ImageDraw.ImageDraw, widths: List[int], x: int, y: int, module_width: int, height: int, fill):
+    """從 x 開始依寬度序列繪製條（偶數索引為條，奇數索引為空）"""
+    for index, modules in enumerate(widths):
+        run = modules * module_width
+        if index % 2 == 0:
+            draw.rectangle([x, y, x + run - 1, y + height - 1], fill=fill)
+        x += run
@@ -9,6 +9,8 @@ IDENTITY_DICT = {
 
 GENDER_CONTENT = ["男  Male", "女  Female", "非二元性別  Non-binary"]
 GENDER_DICT = {"男": "男  Male", "女": "女  Female", "非二元性別": "非二元性別  Non-binary"}
+# MRZ 性別代碼（ICAO 9303：M、F，未指定為 <）
+MRZ_GENDER_CODE_DICT = {"男": "M", "女": "F", "非二元性別": "<"}
 
 ISSUANCE_TYPE_CONTENT = ["初發  First Issue", "補發  Reissue"]
 ISSUANCE_TYPE_DICT = {"初發": "First Issue", "補發": "Reissue"}
@@ -1,60 +1,188 @@
 import os
+import io
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
-import glob
 
-def convert_images_to_png(photos_dir="./photos"):
+from photo_loader import DIRECT_DECODE_EXTENSIONS
+
+# 需要轉換的圖片格式，同一檔名有多種格式時依此順序優先使用
+SOURCE_EXTENSIONS = ['.webp', '.jpeg', '.jpg', '.bmp', '.gif', '.tiff', '.tif']
+
+# 生成證件前需要轉換的格式：JPEG 與 WebP 由照片解碼模組直接讀取，不轉換為全尺寸 PNG
+CONVERT_EXTENSIONS = [ext for ext in SOURCE_EXTENSIONS if ext not in DIRECT_DECODE_EXTENSIONS]
+
+# 記錄來源檔案狀態的清單檔，放在照片目錄中
+MANIFEST_NAME = ".convert_manifest.json"
+
+def _file_hash(file_path):
+    """計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _convert_one(file_path, output_path):
+    """
+    將單一圖片轉換為 PNG
+
+    :return: (來源檔案 SHA-256, 來源檔案大小)
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    with Image.open(io.BytesIO(data)) as img:
+        # 如果是 RGBA 模式，直接儲存
+        # 如果是其他模式，轉換為 RGB
+        if img.mode in ('RGBA', 'LA'):
+            img.save(output_path, 'PNG')
+        else:
+            # 轉換為 RGB 模式以確保相容性
+            rgb_img = img.convert('RGB')
+            rgb_img.save(output_path, 'PNG')
+
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+def _load_manifest(manifest_path):
+    """讀取轉換清單，不存在或格式錯誤時回傳空清單"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(manifest_path, manifest):
+    """寫入轉換清單（先寫暫存檔再取代）"""
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+def _collect_sources(photos_dir, extensions=SOURCE_EXTENSIONS):
+    """
+    掃描一次照片目錄，找出需要轉換的來源圖片
+
+    :param extensions: 要轉換的格式（依優先順序排列）
+    :return: (來源檔案字典 {檔名(不含副檔名): 檔案路徑}, 目錄中已存在的 PNG 檔名集合)
+    """
+    sources = {}
+    existing_png = set()
+    with os.scandir(photos_dir) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext == '.png':
+                existing_png.add(entry.name)
+            elif ext in extensions:
+                current = sources.get(stem)
+                if current is None or extensions.index(ext) < extensions.index(os.path.splitext(current)[1].lower()):
+                    if current is not None:
+                        print(f"跳過 {current} - 已有優先的同名檔案 {entry.path}")
+                    sources[stem] = entry.path
+                else:
+                    print(f"跳過 {entry.path} - 已有優先的同名檔案 {current}")
+    return sources, existing_png
+
+def convert_images_to_png(photos_dir="./photos", workers=None, extensions=SOURCE_EXTENSIONS):
     """
     將 ./photos 目錄中的所有圖片轉換為 PNG 格式
     支援的格式：webp, jpeg, jpg, bmp, gif 等
+
+    只會轉換新增或內容有變更的圖片：照片目錄中的轉換清單會記錄每個來源檔案的
+    修改時間、大小與內容雜湊，下次執行時據此判斷是否需要重新轉換。
+    已有同名 PNG 但轉換清單沒有紀錄時（使用者自行放入的照片），不會覆蓋該 PNG。
+
+    :param photos_dir: 照片目錄
+    :param workers: 平行轉換的行程數量，None 表示使用全部 CPU 核心
+    :param extensions: 要轉換的格式，生成證件前使用 CONVERT_EXTENSIONS（JPEG 與 WebP 不轉換）
     """
     # 確保 photos 目錄存在
     if not os.path.exists(photos_dir):
         print(f"目錄 {photos_dir} 不存在")
         return
-    
-    # 支援的圖片格式
-    supported_formats = ['*.webp', '*.jpeg', '*.jpg', '*.bmp', '*.gif', '*.tiff', '*.tif']
-    
+
+    start_time = time.perf_counter()
+    manifest_path = os.path.join(photos_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    # 項目只會整筆取代，淺複製即可比對；內容未變更時不寫回，避免改變照片目錄的修改時間（照片索引檔以此判斷是否有效）
+    loaded_manifest = dict(manifest)
+    sources, existing_png = _collect_sources(photos_dir, extensions)
+
+    jobs = []
+    skipped_count = 0
+    for stem, file_path in sources.items():
+        name = os.path.basename(file_path)
+        output_name = f"{stem}.png"
+        output_path = os.path.join(photos_dir, output_name)
+        stat = os.stat(file_path)
+        entry = manifest.get(name)
+
+        if output_name in existing_png:
+            if not entry:
+                # 轉換清單沒有紀錄的 PNG 可能是使用者自行放入的照片，不覆蓋
+                print(f"警告：跳過 {file_path} - 已有不是由轉換產生的 {output_name}，不會覆蓋")
+                skipped_count += 1
+                continue
+
+            if entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+                skipped_count += 1
+                continue
+
+            # 修改時間或大小改變，但內容可能相同（例如重新複製檔案）
+            content_hash = _file_hash(file_path)
+            if entry.get('sha256') == content_hash:
+                manifest[name] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': content_hash}
+                skipped_count += 1
+                continue
+
+        jobs.append((name, file_path, output_path, stat))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
     converted_count = 0
-    
-    for format_pattern in supported_formats:
-        # 搜尋指定格式的檔案
-        file_pattern = os.path.join(photos_dir, format_pattern)
-        files = glob.glob(file_pattern, recursive=False)
-        
-        # 也搜尋大寫副檔名
-        file_pattern_upper = os.path.join(photos_dir, format_pattern.upper())
-        files.extend(glob.glob(file_pattern_upper, recursive=False))
-        
-        for file_path in files:
-            try:
-                # 取得檔案名稱（不含副檔名）
-                file_name = os.path.splitext(os.path.basename(file_path))[0]
-                output_path = os.path.join(photos_dir, f"{file_name}.png")
-                
-                # 如果目標 PNG 檔案已存在，跳過
-                if os.path.exists(output_path):
-                    print(f"跳過 {file_path} - PNG 檔案已存在")
-                    continue
-                
-                # 開啟並轉換圖片
-                with Image.open(file_path) as img:
-                    # 如果是 RGBA 模式，直接儲存
-                    # 如果是其他模式，轉換為 RGB
-                    if img.mode in ('RGBA', 'LA'):
-                        img.save(output_path, 'PNG')
-                    else:
-                        # 轉換為 RGB 模式以確保相容性
-                        rgb_img = img.convert('RGB')
-                        rgb_img.save(output_path, 'PNG')
-                
-                print(f"轉換完成: {file_path} -> {output_path}")
-                converted_count += 1
-                
-            except Exception as e:
-                print(f"轉換失敗 {file_path}: {str(e)}")
-    
-    print(f"\n轉換完成！共轉換了 {converted_count} 個檔案")
+    failed_count = 0
+    converted_bytes = 0
+
+    def record(name, file_path, output_path, stat, result):
+        nonlocal converted_count, failed_count, converted_bytes
+        try:
+            content_hash, size = result()
+        except Exception as e:
+            print(f"轉換失敗 {file_path}: {str(e)}")
+            failed_count += 1
+            return
+        manifest[name] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': content_hash}
+        converted_bytes += size
+        converted_count += 1
+        print(f"轉換完成: {file_path} -> {output_path}")
+
+    if workers <= 1 or len(jobs) <= 1:
+        for name, file_path, output_path, stat in jobs:
+            record(name, file_path, output_path, stat, lambda: _convert_one(file_path, output_path))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(job, executor.submit(_convert_one, job[1], job[2])) for job in jobs]
+            for (name, file_path, output_path, stat), future in futures:
+                record(name, file_path, output_path, stat, future.result)
+
+    # 移除已不存在的來源檔案紀錄（此次未轉換的格式保留原紀錄）
+    current_names = {os.path.basename(path) for path in sources.values()}
+    for name in list(manifest):
+        if name not in current_names and os.path.splitext(name)[1].lower() in extensions:
+            del manifest[name]
+    if manifest != loaded_manifest:
+        _save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n轉換完成！共轉換了 {converted_count} 個檔案，略過 {skipped_count} 個未變更的檔案，失敗 {failed_count} 個")
+    if converted_count and elapsed > 0:
+        print(f"轉換速度: {converted_count / elapsed:.1f} 個檔案/秒，{converted_bytes / elapsed / (1024 * 1024):.1f} MB/秒（耗時 {elapsed:.2f} 秒）")
 
 if __name__ == "__main__":
     convert_images_to_png()
@@ -1,115 +1,127 @@
 # 基於模板描述檔的證件生成引擎
 # Template-based Document Generation Engine
 
-from datetime import datetime
 import os
 import csv
+import math
+from collections import deque
+from collections.abc import Sized
+from contextlib import nullcontext
+from functools import partial
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
-from typing import Dict, Any, List, Tuple, Union
-from PIL import Image, ImageDraw, ImageFont
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from PIL import Image, ImageDraw
 import logging
 
-from schema import load_config, DocumentConfig
-from barcode import Code128
-from barcode.writer import ImageWriter
-import io
+from schema import DocumentConfig
+from template_cache import CompiledTemplate, load_template
+from shared_image import SharedImageRef, attach_image, publish_image
+from font_registry import font_registry
+from text_sprites import sprite_cache
+from timings import Histogram, TimingKey, stage_timings
+from logger_config import setup_worker_logger, worker_log_queue
+from mrz_renderer import draw_mrz
+from prepass import PreparedRow, normalize_field, prepare_rows
+from render_plan import CompiledField, compile_render_plan
+from archiver import SharedResources, archive_path_for_row, build_archive, copy_additional_files_for_row
+from manifest import UP_TO_DATE_MESSAGE, BuildManifest, ManifestEntry, row_input_hash, template_fingerprint
+from code128 import draw_code128
+from photo_index import PhotoIndex
+from photo_cache import PhotoCache
+from photo_loader import open_photo
+from encoders import encode_image, output_format
+from writer import WriteBehindQueue
 
 logger = logging.getLogger(__name__)
 
+# 串流模式下每次分派給工作行程的預設資料筆數
+DEFAULT_STREAM_CHUNK_SIZE = 32
+
 class DocumentGenerator:
     """基於模板描述檔的證件生成器"""
     
-    def __init__(self, template_config_path: str):
+    def __init__(self, template_config_path: str, output_dir: str = "output", use_template_cache: bool = True,
+                 template: Optional[CompiledTemplate] = None, photo_index: Optional[PhotoIndex] = None,
+                 shared_resources: Optional[SharedResources] = None):
         """
         初始化證件生成器
         
         :param template_config_path: 模板描述檔路徑
+        :param output_dir: 輸出資料夾路徑
+        :param use_template_cache: 是否使用模板編譯快取（已驗證的設定與解碼後的背景圖片）
+        :param template: 已載入的模板（例如工作行程從主行程取得的設定與共用背景），None 表示從模板描述檔載入
+        :param photo_index: 已建立的照片索引（例如工作行程從主行程取得），None 表示掃描照片資料夾建立
+        :param shared_resources: 已展開的額外檔案（例如工作行程從主行程取得），None 表示依模板設定展開
         """
-        self.config = load_config(template_config_path)
+        self.template_config_path = template_config_path
+        self.use_template_cache = use_template_cache
+        if template is None:
+            template = load_template(template_config_path, use_cache=use_template_cache)
+        self.config = template.config
         self.template_dir = Path("templates")
-        self.output_dir = Path("output")
+        self.output_dir = Path(output_dir)
         
-        # 載入背景圖片
-        self.background_image = self._load_background()
+        # 將模板編譯為渲染計畫，模板錯誤會在這裡就拋出
+        self.plan = compile_render_plan(self.config, {
+            "text": self._render_text,
+            "number": self._render_text,
+            "date": self._render_date,
+            "barcode": self._render_barcode,
+            "mrz": self._render_mrz,
+        })
         
-    def _load_background(self) -> Image.Image:
-        """載入背景圖片"""
-        bg_path = self.template_dir / self.config.background.image
-        if not bg_path.exists():
-            raise FileNotFoundError(f"背景圖片不存在: {bg_path}")
+        # 背景圖片（從快取載入時不需要重新解碼）
+        self.background_image = template.background
+
+        # 掃描一次照片資料夾，之後逐筆以檔名直接查詢
+        self.photo_index = None
+        if self.plan.photo_enabled:
+            if photo_index is None:
+                photo_index = PhotoIndex.build(self.config.photo.folder, self.config.photo.index_file)
+            self.photo_index = photo_index
+
+        # 處理後照片的磁碟快取（可選）
+        self.photo_cache = None
+        if self.plan.photo_enabled and self.config.photo.cache_dir:
+            self.photo_cache = PhotoCache(self.config.photo.cache_dir)
+
+        # 額外檔案只展開一次，所有人員共用
+        if shared_resources is None:
+            shared_resources = SharedResources.from_config(self.config)
+        self.shared_resources = shared_resources
+
+        # 寫入佇列已建立過的輸出資料夾，跨批次共用
+        self._created_dirs: Set[Path] = set()
         
-        return Image.open(bg_path).convert("RGBA")
-    
-    def _get_font(self, font_family: str, font_size: int) -> ImageFont.FreeTypeFont:
-        """取得字體物件"""
-        try:
-            # 如果指定的是 .ttf 檔案，從 fonts 資料夾載入
-            if font_family.endswith('.ttf'):
-                font_path = Path("fonts") / font_family
-                if font_path.exists():
-                    return ImageFont.truetype(str(font_path), font_size)
-                else:
-                    logger.warning(f"字體檔案不存在: {font_path}，使用預設字體")
-                    return ImageFont.load_default()
-            
-            # 嘗試直接使用系統字體名稱
-            return ImageFont.truetype(font_family, font_size)
-        except OSError:
-            try:
-                # 嘗試預設字體
-                return ImageFont.truetype("arial.ttf", font_size)
-            except OSError:
-                # 最後回到預設字體
-                logger.warning(f"無法載入字體 {font_family}，使用預設字體")
-                return ImageFont.load_default()
-    
-    def _generate_barcode(self, data: str) -> Image.Image:
-        """生成條碼圖片"""
-        try:
-            # 創建條碼
-            code128 = Code128(data, writer=ImageWriter())
-            
-            # 將條碼渲染到記憶體
-            buffer = io.BytesIO()
-            code128.write(buffer)
-            buffer.seek(0)
-            
-            # 載入圖片並轉換格式
-            barcode_img = Image.open(buffer).convert("RGBA")
-
-            return barcode_img
-            
-        except Exception as e:
-            logger.error(f"條碼生成失敗: {e}")
-            # 如果條碼生成失敗，返回一個空白圖片
-            return Image.new("RGBA", (200, 50), (255, 255, 255, 0))
-    
     def _resize_photo_cover(self, photo: Image.Image, size: Union[Tuple[int, int], None] = None) -> Image.Image:
         """
         以 cover 方式縮放照片（類似 CSS background-size: cover）
         縮放照片以填滿目標區域，保持比例並從中心裁切
+        每張證件都會呼叫，除錯訊息以 % 格式延後組合，未啟用 DEBUG 等級時不產生字串
         """
         # 目標大小
         if size is None:
-            size = self.config.photo.size
-        target_width = int(size[0] or self.config.photo.size[0])
-        target_height = int(size[1] or self.config.photo.size[1])
-        logger.debug(f"照片目標尺寸: {target_width}x{target_height}")
+            size = self.plan.photo_size
+        target_width = int(size[0] or self.plan.photo_size[0])
+        target_height = int(size[1] or self.plan.photo_size[1])
+        logger.debug("照片目標尺寸: %dx%d", target_width, target_height)
         
         # 計算裁切比例，選擇較大的比例以填滿目標區域
         original_width, original_height = photo.size
-        logger.debug(f"原始照片尺寸: {original_width}x{original_height}")
+        logger.debug("原始照片尺寸: %dx%d", original_width, original_height)
         
         scale_w = target_width / original_width
         scale_h = target_height / original_height
         scale = max(scale_w, scale_h)  # 使用較大的比例確保填滿
-        logger.debug(f"縮放比例: {scale}")
+        logger.debug("縮放比例: %s", scale)
         
         # 按比例縮放照片
         new_width = int(original_width * scale)
         new_height = int(original_height * scale)
         photo = photo.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        logger.debug(f"縮放後照片尺寸: {new_width}x{new_height}")
+        logger.debug("縮放後照片尺寸: %dx%d", new_width, new_height)
         
         # 計算裁切位置（從中心裁切）
         left = (new_width - target_width) // 2
@@ -119,12 +131,12 @@ class DocumentGenerator:
         
         # 裁切照片
         photo = photo.crop((left, top, right, bottom))
-        logger.debug(f"照片裁切完成，裁切區域: ({left}, {top}, {right}, {bottom})")
+        logger.debug("照片裁切完成，裁切區域: (%d, %d, %d, %d)", left, top, right, bottom)
 
         # 創建圓角遮罩
         mask = Image.new('L', (target_width, target_height), 0)
         mask_draw = ImageDraw.Draw(mask)
-        mask_draw.rounded_rectangle([0, 0, target_width, target_height], self.config.photo.border_radius, fill=255)
+        mask_draw.rounded_rectangle([0, 0, target_width, target_height], self.plan.photo_border_radius, fill=255)
         logger.debug("圓角遮罩創建完成")
 
         # 創建帶圓角的照片
@@ -144,29 +156,26 @@ class DocumentGenerator:
         filename = filename.strip()
         return filename
     
+    def _process_photo(self, photo_file) -> Image.Image:
+        """解碼照片（預先縮小到接近目標尺寸）並裁切為模板指定的大小與圓角"""
+        with stage_timings.time("photo_decode"):
+            photo = open_photo(photo_file, self.plan.photo_size)
+        with stage_timings.time("photo_resize"):
+            return self._resize_photo_cover(photo)
+
     def _load_photo(self, csv_row: Dict[str, str]) -> Image.Image:
         """載入個人照片"""
-        photo_dir = Path(self.config.photo.folder)
-        
-        # 嘗試不同的照片檔名格式
-        possible_names = [
-            f"{csv_row.get('name', '')}.png",
-            f"{csv_row.get('name', '')}.jpg", 
-            f"{csv_row.get('name', '')}.jpeg",
-            f"{csv_row.get('id_number', '')}.png",
-            f"{csv_row.get('id_number', '')}.jpg",
-            f"{csv_row.get('id_number', '')}.jpeg",
-        ]
-        
-        for name in possible_names:
-            photo_path = photo_dir / name
-            if photo_path.exists():
-                photo = Image.open(photo_path).convert("RGBA")
-                return self._resize_photo_cover(photo)
+        # 依序以姓名、身分證號碼查詢照片索引
+        with stage_timings.time("photo_lookup"):
+            photo_path = self.photo_index.find(csv_row.get('name', ''), csv_row.get('id_number', ''))
+        if photo_path is not None:
+            if self.photo_cache is not None:
+                return self.photo_cache.load(photo_path, self.plan.photo_size, self.plan.photo_border_radius, self._process_photo)
+            return self._process_photo(photo_path)
         
         # 如果找不到照片，創建一個預設的佔位圖
         logger.warning(f"找不到照片: {csv_row.get('name', '')}, 使用預設佔位圖")
-        size = (int(self.config.photo.size[0]), int(self.config.photo.size[1]))
+        size = self.plan.photo_size
         placeholder = Image.new("RGBA", size, (200, 200, 200, 255))
         draw = ImageDraw.Draw(placeholder)
         draw.text(
@@ -179,7 +188,7 @@ class DocumentGenerator:
     
     def generate_document(self, csv_row: Dict[str, str]) -> Image.Image:
         """
-        根據模板配置生成證件
+        根據模板的渲染計畫生成證件
         
         :param csv_row: CSV 資料行
         :return: 生成的證件圖片
@@ -188,13 +197,13 @@ class DocumentGenerator:
         document = self.background_image.copy()
         draw = ImageDraw.Draw(document)
         
-        # 加入照片 - 位置可以使用浮點數
-        if self.config.photo.enabled: 
+        # 加入照片
+        if self.plan.photo_enabled: 
             photo = self._load_photo(csv_row)
-            document.paste(photo, self.config.photo.position, photo)
+            document.paste(photo, self.plan.photo_position, photo)
         
         # 處理每個欄位
-        for field in self.config.fields:
+        for field in self.plan.fields:
             try:
                 self._render_field(document, draw, field, csv_row)
             except Exception as e:
@@ -203,184 +212,489 @@ class DocumentGenerator:
         
         return document
     
-    def _render_field(self, document: Image.Image, draw: ImageDraw.Draw, field, data_dict: Dict[str, Any]):
-        """渲染單個欄位"""
-        # 取得資料值
-        data_value = data_dict.get(field.data_path, "")
-        if not data_value:
-            logger.warning(f"欄位 {field.key} 的資料路徑 {field.data_path} 沒有對應的值")
-            return
-        
-        if field.type == "barcode":
-            self._render_barcode(document, field, str(data_value))
-        elif field.type == "date":
-            self._render_date(document, draw, field, data_value)
+    def _render_field(self, document: Image.Image, draw: ImageDraw.Draw, field: CompiledField, data_dict: Dict[str, Any]):
+        """渲染單個已編譯的欄位"""
+        if isinstance(data_dict, PreparedRow):
+            # 預檢時已正規化，問題也已記錄在日誌中
+            value = data_dict.values.get(field.key)
         else:
-            self._render_text(draw, field, str(data_value))
-    
-    def _render_text(self, draw: ImageDraw.Draw, field, text: str):
-        """渲染文字欄位"""
-        # 取得字體
-        font_size = field.font_size or 16
-        font_family = field.font_family or "arial"
-        font = self._get_font(font_family, font_size)
-        
-        # 取得顏色
-        color = field.font_color or "#000000"
+            value, error = normalize_field(field, data_dict)
+            if error is not None:
+                logger.error(error)
+            elif value is None:
+                logger.warning(f"欄位 {field.key} 的資料路徑 {field.data_path} 沒有對應的值")
+        if value is None:
+            return
 
-        # 格式化字串
-        # 如果text裡面有任何以大括號包裹的字串，就視為格式化字串
-        # 將字串中的大括號視為CSV欄位名，並替換為對應的資料
-        if "{" in text and "}" in text:
-            try:
-                text = text.format(**field.data_dict)
-            except KeyError as e:
-                logger.error(f"格式化字串失敗: {text}，缺少欄位 {e}")
-                return
+        with stage_timings.time(f"render.{field.type}", field.key):
+            field.render(document, draw, field, value, data_dict)
+    
+    def _render_text(self, document: Image.Image, draw: ImageDraw.Draw, field: CompiledField, text: str, data_dict: Dict[str, Any]):
+        """渲染文字欄位（格式化字串已在正規化時替換）"""
+        # 直接使用浮點數位置（保留次像素定位），重複的文字使用快取的遮罩
+        sprite_cache.draw_text(draw, field.position, text, field.color, field.font)
 
-        # 直接使用浮點數位置 - PIL 支援浮點數位置
-        draw.text(
-            field.position,
-            text,
-            fill=color,
-            font=font
-        )
+    def _render_barcode(self, document: Image.Image, draw: ImageDraw.Draw, field: CompiledField, data: str, data_dict: Dict[str, Any]):
+        """渲染條碼欄位：以整數模組寬度直接繪製 Code128 條碼到欄位位置"""
+        draw_code128(draw, data, field.int_position, field.size)
 
-    def _render_barcode(self, document: Image.Image, field, data: str):
-        """渲染條碼欄位"""
-        # 生成條碼圖片
-        barcode_img = self._generate_barcode(data)
-        
-        # 如果有指定大小，調整條碼大小 - 這裡需要整數
-        if field.size:
-            # 只有大小需要轉換為整數
-            logging.debug(f"圖片大小：{int(field.size[0])}, {int(field.size[1])}")
-            size = (int(field.size[0]), int(field.size[1]))
-            barcode_img = barcode_img.resize(size, Image.Resampling.LANCZOS)
-            barcode_img = self._resize_photo_cover(barcode_img, size)
-
-        # 將位置元組轉換成整數
-        int_pos = (int(field.position[0]), int(field.position[1]))
-        
-        # 位置可以使用浮點數
-        document.paste(barcode_img, int_pos, barcode_img)
+    def _render_mrz(self, document: Image.Image, draw: ImageDraw.Draw, field: CompiledField, lines: Tuple[str, str], data_dict: Dict[str, Any]):
+        """渲染 MRZ 欄位：以 OCR-B 字元圖集逐格繪製正規化時組成的兩行"""
+        draw_mrz(draw, field.position, lines, field.color, field.font, field.line_spacing)
 
-    def _render_date(self, document: Image.Image, draw: ImageDraw.Draw, field, date_str: str):
-        """渲染日期欄位"""
-        # 解析日期字串
-        try:
-            date_obj = datetime.strptime(date_str, "%Y/%m/%d")
-            formatted_date = date_obj.strftime(field.date_format or "%Y/%m/%d")
-        except ValueError:
-            logger.error(f"無法解析日期: {date_str}，請確保來源的日期格式正確（YYYY/MM/DD）")
-            formatted_date = date_str
-
-        # 將日期字串分割成含有年月日的陣列
-        date_arr = formatted_date.split('/')
-
-        # 處理字體
-        font_size = field.font_size or 16
-        font_family = field.font_family or "arial"
-        font = self._get_font(font_family, font_size)
-
-        # 依照field.position渲染日期，field.position將為一個List，前三項分別為年月日的位置
-        if isinstance(field.position, list) and len(field.position) == 3:
-            for i, part in zip(field.position, date_arr):
-                # 渲染日期的每個部分
-                if not isinstance(i, tuple) or len(i) != 2:
-                    logger.error(f"日期欄位 {field.key} 的 position 格式錯誤，應為三個座標 (年、月、日)，目前為 {i}")
-                    return
-                
-                draw.text(i, part, fill=field.font_color or "#000000", font=font)
-        else:
-            logger.error(f"日期欄位 {field.key} 的 position 格式錯誤，應為三個座標")
-            return
+    def _render_date(self, document: Image.Image, draw: ImageDraw.Draw, field: CompiledField, date_parts: Tuple[str, ...], data_dict: Dict[str, Any]):
+        """渲染日期欄位：將正規化時分割好的年、月、日依序渲染到對應位置"""
+        for position, part in zip(field.positions, date_parts):
+            sprite_cache.draw_text(draw, position, part, field.color, field.font)
 
-    def save_document(self, document: Image.Image, csv_row: Dict[str, str]) -> str:
+    def output_file_path(self, csv_row: Dict[str, str]) -> Path:
         """
-        儲存證件檔案
-        
-        :param document: 證件圖片
+        計算證件的輸出檔案路徑（不建立資料夾）
+
         :param csv_row: CSV 資料行
-        :return: 儲存的檔案路徑
+        :return: 輸出檔案路徑
         """
-        # 建立輸出目錄
+        if isinstance(csv_row, PreparedRow):
+            return csv_row.output_path
+
         output_path = self.output_dir / self.config.output.save_to.format(**csv_row)
-        output_path.mkdir(parents=True, exist_ok=True)
         
         # 建立檔案名稱
         filename = self.config.output.output_file_format.format(**csv_row)
         filename = self._sanitize_filename(filename)
         
         # 檢查檔案副檔名
-        if not any(filename.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']):
+        if output_format(filename) is None:
             # 如果沒有副檔名，預設使用 .png
             filename += '.png'
             logger.warning(f"檔案名稱沒有副檔名，自動添加 .png: {filename}")
         
-        file_path = output_path / filename
-        
+        return output_path / filename
+
+    def encode_document(self, document: Image.Image, file_path: Path) -> bytes:
+        """
+        依副檔名與 output.encoder 設定編碼證件圖片
+
+        :param document: 證件圖片
+        :param file_path: 輸出檔案路徑
+        :return: 編碼後的檔案內容
+        """
+        return encode_image(document, output_format(file_path.name), self.config.output.dpi, self.config.output.encoder)
+
+    def encode_for_row(self, document: Image.Image, csv_row: Dict[str, str]) -> Tuple[Path, bytes]:
+        """
+        編碼證件並決定輸出路徑，編碼失敗時改用 PNG 格式
+
+        :param document: 證件圖片
+        :param csv_row: CSV 資料行
+        :return: (輸出檔案路徑, 檔案內容)
+        """
+        file_path = self.output_file_path(csv_row)
         try:
-            # 根據副檔名決定儲存格式
-            if filename.lower().endswith('.png'):
-                document.save(file_path, 'PNG', dpi=(self.config.output.dpi, self.config.output.dpi))
-            elif filename.lower().endswith(('.jpg', '.jpeg')):
-                # JPEG 不支援透明度，需要轉換為 RGB
-                rgb_document = Image.new('RGB', document.size, (255, 255, 255))
-                rgb_document.paste(document, mask=document.split()[-1] if document.mode == 'RGBA' else None)
-                rgb_document.save(file_path, 'JPEG', dpi=(self.config.output.dpi, self.config.output.dpi), quality=95)
-            else:
-                # 其他格式使用預設方式
-                document.save(file_path, dpi=(self.config.output.dpi, self.config.output.dpi))
-            
-            logger.info(f"證件已儲存: {file_path}")
-            return str(file_path)
-            
+            return file_path, self.encode_document(document, file_path)
         except Exception as e:
-            logger.error(f"儲存檔案失敗 {file_path}: {e}")
+            logger.error(f"編碼檔案失敗 {file_path}: {e}")
             # 嘗試用 PNG 格式儲存
             fallback_path = file_path.with_suffix('.png')
-            document.save(fallback_path, 'PNG', dpi=(self.config.output.dpi, self.config.output.dpi))
             logger.info(f"使用 PNG 格式儲存: {fallback_path}")
-            return str(fallback_path)
-    
-    def process_batch(self, csv_data: List[Dict[str, str]]) -> List[Tuple[str, bool, str]]:
+            return fallback_path, self.encode_document(document, fallback_path)
+
+    def save_document(self, document: Image.Image, csv_row: Dict[str, str]) -> str:
+        """
+        儲存證件檔案（同步寫入）
+        
+        :param document: 證件圖片
+        :param csv_row: CSV 資料行
+        :return: 儲存的檔案路徑
+        """
+        file_path, data = self.encode_for_row(document, csv_row)
+
+        # 建立輸出目錄
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(data)
+        logger.info("證件已儲存: %s", file_path)
+        return str(file_path)
+
+    def _row_failure(self, row: Dict[str, str], e: Exception) -> Tuple[str, bool, str]:
+        """記錄並建立單筆資料的失敗結果"""
+        error_msg = f"處理失敗: {str(e)}"
+        logger.error(f"處理 {row.get('id_number', 'unknown')} 時發生錯誤: {error_msg}")
+        logger.debug("錯誤詳細資訊: %s", e, exc_info=True)
+        return (row.get('id_number', 'unknown'), False, error_msg)
+
+    def _place_additional(self, row: Dict[str, str], file_path: Path):
+        """證件寫入完成後，將共用的額外檔案放入該人員的資料夾（在寫入執行緒中執行）"""
+        with stage_timings.time("extra_files"):
+            copy_additional_files_for_row(self.config, row, str(self.output_dir), self.shared_resources)
+
+    def _finish_row(self, document: Image.Image, row: Dict[str, str], copy_additional: bool, create_archive: bool,
+                    write_loose: bool, writer: WriteBehindQueue) -> List[Future]:
+        """
+        編碼已生成的證件，並將證件與 ZIP 壓縮檔排入寫入佇列
+
+        ZIP 壓縮檔直接以記憶體中的證件內容建立，不需等待證件寫入磁碟後再讀回；
+        只有放入額外檔案時（未指定 --skip-additional）壓縮檔才包含額外檔案。
+
+        :param document: 已生成的證件圖片
+        :param row: CSV 資料行
+        :param copy_additional: 是否在儲存後複製模板指定的額外檔案，並將其加入壓縮檔
+        :param create_archive: 是否建立該人員的 ZIP 壓縮檔
+        :param write_loose: 是否在個別資料夾中輸出證件與額外檔案
+        :param writer: 寫入佇列
+        :return: 各項寫入的 Future 列表
+        """
+        with stage_timings.time("encode"):
+            file_path, data = self.encode_for_row(document, row)
+        writes = []
+
+        if write_loose:
+            after = None
+            if copy_additional:
+                # 複製額外檔案
+                after = partial(self._place_additional, row)
+            writes.append(writer.submit(file_path, data, after))
+
+        # 建立壓縮檔
+        if create_archive:
+            archive_path = archive_path_for_row(self.config, row, str(self.output_dir))
+            if archive_path is not None:
+                with stage_timings.time("zip"):
+                    if copy_additional:
+                        archive = self.shared_resources.build_archive(file_path.name, data)
+                    else:
+                        archive = build_archive(file_path.name, data, ())
+                writes.append(writer.submit(archive_path, archive))
+
+        return writes
+
+    def _collect_row(self, row: Dict[str, str], encoded: Future) -> Tuple[str, bool, str]:
+        """等待單筆資料的編碼與寫入完成，並將任何階段的錯誤轉為失敗結果"""
+        try:
+            for write in encoded.result():
+                write.result()
+            return (row.get('id_number', 'unknown'), True, "")
+        except Exception as e:
+            return self._row_failure(row, e)
+
+    def _process_rows(self, rows: Iterable[Dict[str, str]], copy_additional: bool = False, create_archive: bool = False,
+                      write_loose: bool = True) -> Iterator[Tuple[str, bool, str]]:
+        """
+        依序處理多筆資料，渲染、編碼與寫入重疊進行
+
+        目前的執行緒負責渲染，編碼交給 output.encoder.threads 個編碼執行緒，
+        寫入交給 output.writer.threads 個寫入執行緒；處理中的證件數量有上限，結果依輸入順序產出。
+
+        :param rows: CSV 資料行列表或迭代器
+        :param copy_additional: 是否複製額外檔案
+        :param create_archive: 是否建立壓縮檔
+        :param write_loose: 是否在個別資料夾中輸出證件與額外檔案
+        :return: 處理結果迭代器
+        """
+        encoder_threads = self.config.output.encoder.threads
+        writer_config = self.config.output.writer
+        max_pending = encoder_threads * 2 + writer_config.queue_size
+
+        pending = deque()
+        with WriteBehindQueue(writer_config.threads, writer_config.queue_size, self._created_dirs) as writer, \
+                (ThreadPoolExecutor(max_workers=encoder_threads, thread_name_prefix="encoder")
+                 if encoder_threads > 0 else nullcontext()) as encode_pool:
+            for row in rows:
+                encoded = Future()
+                try:
+                    with stage_timings.time("document"):
+                        document = self.generate_document(row)
+                    if encode_pool is not None:
+                        encoded = encode_pool.submit(self._finish_row, document, row, copy_additional, create_archive, write_loose, writer)
+                    else:
+                        encoded.set_result(self._finish_row(document, row, copy_additional, create_archive, write_loose, writer))
+                except Exception as e:
+                    encoded.set_exception(e)
+                pending.append((row, encoded))
+
+                while len(pending) > max_pending:
+                    yield self._collect_row(*pending.popleft())
+
+            while pending:
+                yield self._collect_row(*pending.popleft())
+
+    def _manifest_entry(self, manifest: BuildManifest, template_hash: str, row: Dict[str, str],
+                        write_loose: bool, create_archive: bool) -> Optional[ManifestEntry]:
+        """
+        計算單筆資料的建置紀錄項目
+
+        :return: (證件路徑, 輸入雜湊, 輸出檔案列表)，無法決定輸出路徑時回傳 None（一律重新生成）
+        """
+        try:
+            card_path = self.output_file_path(row)
+            archive_path = archive_path_for_row(self.config, row, str(self.output_dir)) if create_archive else None
+        except (KeyError, IndexError, ValueError):
+            return None
+
+        files = []
+        if write_loose:
+            files.append(manifest.relative(card_path))
+        if archive_path is not None:
+            files.append(manifest.relative(archive_path))
+
+        photo_hash = None
+        if self.photo_index is not None:
+            photo_path = self.photo_index.find(row.get('name', ''), row.get('id_number', ''))
+            if photo_path is not None:
+                photo_hash = manifest.photo_hash(photo_path)
+        return manifest.relative(card_path), row_input_hash(template_hash, row, photo_hash), files
+
+    def process_batch(self, csv_data: Iterable[Dict[str, str]], workers: int = 1, chunk_size: Optional[int] = None,
+                      copy_additional: bool = False, create_archive: bool = False, write_loose: bool = True,
+                      incremental: bool = False, prune: bool = False, strict: bool = False) -> List[Tuple[str, bool, str]]:
         """
         批次處理多個人員資料
+
+        生成前先以欄為單位預檢整份資料（見 prepass.prepare_rows）：無法決定輸出路徑的資料直接回報失敗，
+        其餘資料帶著正規化後的欄位值與輸出路徑進入渲染。
+
+        啟用 incremental 時，會比對輸出資料夾中的建置紀錄（CSV 資料行、模板、背景與字體、照片的雜湊），
+        只重新生成輸入有變更或輸出檔案遺失的證件，其餘回報為 UP_TO_DATE_MESSAGE。
+        建置紀錄中已不對應任何資料的證件會列在日誌中，prune 為 True 時一併刪除。
+
+        :param csv_data: CSV 資料列表或迭代器
+        :param workers: 工作行程數量，1 表示在目前行程中依序處理，0 表示使用全部 CPU 核心
+        :param chunk_size: 每次分派給工作行程的資料筆數，未指定時依資料量自動計算
+        :param copy_additional: 是否在每筆證件儲存後立即複製額外檔案
+        :param create_archive: 是否為每筆資料建立 ZIP 壓縮檔
+        :param write_loose: 是否在個別資料夾中輸出證件與額外檔案，False 時只輸出 ZIP 壓縮檔
+        :param incremental: 是否略過輸入未變更的證件
+        :param prune: 是否刪除已不對應任何資料的證件（需啟用 incremental）
+        :param strict: 是否在預檢時拒絕欄位沒有值或無法正規化的資料
+        :return: 處理結果列表 [(id_number, success, error_message), ...]，順序與輸入相同
+        """
+        manifest = BuildManifest(self.output_dir, self.template_config_path) if incremental else None
+        with manifest if manifest is not None else nullcontext():
+            if manifest is not None:
+                template_hash = template_fingerprint(self.template_config_path, self.config, {
+                    "copy_additional": copy_additional,
+                    "create_archive": create_archive,
+                    "write_loose": write_loose,
+                })
+
+            # 被拒絕或未變更的資料直接填入結果，需要生成的資料先保留位置，生成後依序填回
+            results: List[Optional[Tuple[str, bool, str]]] = []
+            rendered: List[Tuple[int, Optional[ManifestEntry]]] = []
+            seen: Set[str] = set()
+
+            def rows_to_render() -> Iterator[Dict[str, str]]:
+                for row, error in prepare_rows(self.plan, csv_data, self.output_file_path, strict):
+                    if error is not None:
+                        results.append((row.get('id_number', 'unknown'), False, error))
+                        if manifest is not None:
+                            # 被拒絕的資料仍在 CSV 中，上次的輸出不視為過時
+                            try:
+                                seen.add(manifest.relative(self.output_file_path(row)))
+                            except (KeyError, IndexError, ValueError):
+                                pass
+                        continue
+                    entry = None
+                    if manifest is not None:
+                        entry = self._manifest_entry(manifest, template_hash, row, write_loose, create_archive)
+                        if entry is not None:
+                            seen.add(entry[0])
+                            if manifest.is_up_to_date(*entry):
+                                results.append((row.get('id_number', 'unknown'), True, UP_TO_DATE_MESSAGE))
+                                continue
+                    rendered.append((len(results), entry))
+                    results.append(None)
+                    yield row
+
+            rows = rows_to_render()
+            if isinstance(csv_data, Sized):
+                rows = list(rows)
+
+            entries = []
+            for result, (index, entry) in zip(
+                    self._render_batch(rows, workers, chunk_size, copy_additional, create_archive, write_loose), rendered):
+                results[index] = result
+                if result[1] and entry is not None:
+                    entries.append(entry)
+
+            if manifest is None:
+                return results
+
+            manifest.record(entries)
+            skipped = sum(1 for result in results if result[1] and result[2] == UP_TO_DATE_MESSAGE)
+            logger.info(f"重新生成 {len(rendered)} 筆證件，{skipped} 筆輸入未變更已略過")
+
+            stale = manifest.stale(seen)
+            if stale and prune:
+                removed = manifest.prune(stale, self.shared_resources.names)
+                logger.info(f"已移除 {len(stale)} 筆過時的證件，共刪除 {removed} 個檔案")
+            elif stale:
+                for output, _, files in stale:
+                    logger.warning(f"過時的輸出（已無對應的資料）: {', '.join(files) or output}")
+                logger.warning(f"共 {len(stale)} 筆過時的輸出，使用 prune 選項（--prune）可刪除")
+
+        return results
+
+    def _render_batch(self, csv_data: Iterable[Dict[str, str]], workers: int = 1, chunk_size: Optional[int] = None,
+                      copy_additional: bool = False, create_archive: bool = False,
+                      write_loose: bool = True) -> List[Tuple[str, bool, str]]:
+        """
+        生成多個人員的證件（不比對建置紀錄）
+
+        資料可以是列表，也可以是逐筆讀取的迭代器（例如 iter_csv_data）。
+        使用迭代器時只會保留正在處理中的區塊，記憶體用量不隨資料筆數增加。
         
-        :param csv_data: CSV 資料列表
-        :return: 處理結果列表 [(id_number, success, error_message), ...]
+        :param csv_data: CSV 資料列表或迭代器
+        :param workers: 工作行程數量，1 表示在目前行程中依序處理，0 表示使用全部 CPU 核心
+        :param chunk_size: 每次分派給工作行程的資料筆數，未指定時依資料量自動計算
+        :param copy_additional: 是否在每筆證件儲存後立即複製額外檔案
+        :param create_archive: 是否為每筆資料建立 ZIP 壓縮檔
+        :param write_loose: 是否在個別資料夾中輸出證件與額外檔案，False 時只輸出 ZIP 壓縮檔
+        :return: 處理結果列表 [(id_number, success, error_message), ...]，順序與輸入相同
         """
+        if workers == 0:
+            workers = os.cpu_count() or 1
+
+        if workers <= 1 or (isinstance(csv_data, Sized) and len(csv_data) <= 1):
+            hits, misses = sprite_cache.counters()
+            results = list(self._process_rows(csv_data, copy_additional, create_archive, write_loose))
+            _log_sprite_stats(sprite_cache.hits - hits, sprite_cache.misses - misses)
+            logger.debug(f"字體快取統計: {font_registry.stats()}")
+            if self.photo_cache is not None:
+                logger.debug(f"照片快取統計: 命中 {self.photo_cache.hits}，未命中 {self.photo_cache.misses}")
+            return results
+
+        # 將資料切成區塊，讓每個工作行程一次處理多筆以降低行程間通訊成本
+        if chunk_size is None:
+            if isinstance(csv_data, Sized):
+                chunk_size = max(1, math.ceil(len(csv_data) / (workers * 4)))
+            else:
+                chunk_size = DEFAULT_STREAM_CHUNK_SIZE
+        logger.info(f"使用 {workers} 個工作行程處理資料，每個區塊 {chunk_size} 筆")
+
+        # 解碼後的背景只放入共用記憶體一次，工作行程直接連接使用，不各自解碼或複製；
+        # 已驗證的模板設定、照片索引與展開後的額外檔案也一併傳給工作行程，不需要重新解析、驗證或掃描資料夾
+        shared_background, background_ref = publish_image(self.background_image)
+
+        # 工作行程的日誌經由佇列交給主行程寫入同一個日誌檔案
+        log_queue = worker_log_queue()
+
         results = []
-        
-        for row in csv_data:
-            try:
-                # 生成證件
-                document = self.generate_document(row)
-                
-                # 儲存證件
-                file_path = self.save_document(document, row)
-                
-                results.append((row.get('id_number', 'unknown'), True, ""))
-                
-            except Exception as e:
-                error_msg = f"處理失敗: {str(e)}"
-                logger.error(f"處理 {row.get('id_number', 'unknown')} 時發生錯誤: {error_msg}")
-                logger.debug(f"錯誤詳細資訊: {e}", exc_info=True)
-                results.append((row.get('id_number', 'unknown'), False, error_msg))
-        
+        sprite_hits = sprite_misses = 0
+        pending = deque()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self.template_config_path, str(self.output_dir), self.config, background_ref,
+                          log_queue, logging.getLogger().level, self.photo_index, self.shared_resources),
+            ) as executor:
+                # 只保留有限數量的區塊在處理中，並依照提交順序收集結果
+                for chunk in _iter_chunks(csv_data, chunk_size):
+                    pending.append(executor.submit(_process_chunk, chunk, copy_additional, create_archive, write_loose))
+                    if len(pending) >= workers * 2:
+                        chunk_results, (hits, misses), timings = pending.popleft().result()
+                        results.extend(chunk_results)
+                        sprite_hits, sprite_misses = sprite_hits + hits, sprite_misses + misses
+                        stage_timings.merge(timings)
+                while pending:
+                    chunk_results, (hits, misses), timings = pending.popleft().result()
+                    results.extend(chunk_results)
+                    sprite_hits, sprite_misses = sprite_hits + hits, sprite_misses + misses
+                    stage_timings.merge(timings)
+        finally:
+            shared_background.close()
+            shared_background.unlink()
+
+        _log_sprite_stats(sprite_hits, sprite_misses)
         return results
 
-def load_csv_data(csv_path: str) -> List[Dict[str, str]]:
+def _iter_chunks(rows: Iterable[Dict[str, str]], chunk_size: int) -> Iterator[List[Dict[str, str]]]:
     """
-    載入 CSV 資料
+    將資料逐段切成固定大小的區塊
+
+    :param rows: CSV 資料列表或迭代器
+    :param chunk_size: 區塊大小
+    :return: 區塊迭代器
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# 工作行程內的證件生成器，每個行程只在啟動時建立一次
+_worker_generator: Optional[DocumentGenerator] = None
+
+# 工作行程連接的共用背景記憶體，需保留參考直到行程結束
+_worker_shared_background: Optional[shared_memory.SharedMemory] = None
+
+def _init_worker(template_config_path: str, output_dir: str, config: DocumentConfig, background_ref: SharedImageRef,
+                 log_queue=None, log_level: int = logging.NOTSET, photo_index: Optional[PhotoIndex] = None,
+                 shared_resources: Optional[SharedResources] = None):
+    """
+    工作行程初始化：使用主行程傳來的模板設定、照片索引與額外檔案，連接共用背景，並編譯渲染計畫（含字體）
+
+    :param template_config_path: 模板描述檔路徑
+    :param output_dir: 輸出資料夾路徑
+    :param config: 主行程已驗證的模板設定
+    :param background_ref: 共用背景的描述
+    :param log_queue: 主行程的日誌佇列，為 None 時沿用繼承的日誌設定
+    :param log_level: 主行程根logger的日誌等級
+    :param photo_index: 主行程已建立的照片索引
+    :param shared_resources: 主行程已展開的額外檔案
+    """
+    global _worker_generator, _worker_shared_background
+    if log_queue is not None:
+        setup_worker_logger(log_queue, log_level)
+    background, _worker_shared_background = attach_image(background_ref)
+    _worker_generator = DocumentGenerator(
+        template_config_path,
+        output_dir=output_dir,
+        template=CompiledTemplate(config, background),
+        photo_index=photo_index,
+        shared_resources=shared_resources,
+    )
+
+def _process_chunk(rows: List[Dict[str, str]], copy_additional: bool = False, create_archive: bool = False,
+                   write_loose: bool = True) -> Tuple[List[Tuple[str, bool, str]], Tuple[int, int], Dict[TimingKey, Histogram]]:
+    """
+    在工作行程中處理一個資料區塊
+
+    :param rows: CSV 資料行列表
+    :param copy_additional: 是否複製額外檔案
+    :param create_archive: 是否建立壓縮檔
+    :param write_loose: 是否在個別資料夾中輸出證件與額外檔案
+    :return: (處理結果列表, 此區塊的文字快取 (命中, 未命中) 次數, 此區塊的階段耗時)
+    """
+    hits, misses = sprite_cache.counters()
+    results = list(_worker_generator._process_rows(rows, copy_additional, create_archive, write_loose))
+    return results, (sprite_cache.hits - hits, sprite_cache.misses - misses), stage_timings.drain()
+
+def _log_sprite_stats(hits: int, misses: int):
+    """在批次結束時輸出文字點陣快取的命中率"""
+    total = hits + misses
+    if total:
+        logger.info(f"文字點陣快取: 命中 {hits}，未命中 {misses}，命中率 {hits / total:.1%}")
+
+def iter_csv_data(csv_path: str) -> Iterator[Dict[str, str]]:
+    """
+    逐筆讀取 CSV 資料，不會一次把整個檔案載入記憶體
     
     :param csv_path: CSV 檔案路徑
-    :return: CSV 資料列表
+    :return: CSV 資料行迭代器
     """
-    data = []
     with open(csv_path, 'r', encoding='utf-8') as file:
         reader = csv.DictReader(file)
         for row in reader:
-            data.append(dict(row))
-    return data
\ No newline at end of file
+            yield dict(row)
+
+def load_csv_data(csv_path: str) -> List[Dict[str, str]]:
+    """
+    載入 CSV 資料
+    
+    :param csv_path: CSV 檔案路徑
+    :return: CSV 資料列表
+    """
+    return list(iter_csv_data(csv_path))
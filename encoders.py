@@ -0,0 +1,97 @@
+"""
+輸出編碼模組
+依照 OutputConfig.encoder 的設定，將證件圖片編碼為檔案內容
+"""
+
+import io
+from typing import Optional
+
+from PIL import ExifTags, Image
+
+from schema import EncoderConfig
+
+# 副檔名對應的輸出格式
+OUTPUT_FORMATS = {
+    '.png': 'PNG',
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.webp': 'WEBP',
+    '.bmp': 'BMP',
+    '.tiff': 'TIFF',
+}
+
+# zlib 壓縮策略對應的數值，"default" 使用 Pillow 預設值（保留自適應濾波）
+PNG_STRATEGIES = {
+    "default": -1,
+    "filtered": 1,
+    "huffman_only": 2,
+    "rle": 3,
+    "fixed": 4,
+}
+
+
+def output_format(filename: str) -> Optional[str]:
+    """
+    依副檔名取得輸出格式
+
+    :param filename: 檔案名稱
+    :return: Pillow 格式名稱，不支援的副檔名回傳 None
+    """
+    for ext, fmt in OUTPUT_FORMATS.items():
+        if filename.lower().endswith(ext):
+            return fmt
+    return None
+
+
+def _resolution_exif(dpi: int) -> Image.Exif:
+    """以 EXIF 的 XResolution / YResolution 記錄解析度（單位為英吋）"""
+    exif = Image.Exif()
+    exif[ExifTags.Base.XResolution] = dpi
+    exif[ExifTags.Base.YResolution] = dpi
+    exif[ExifTags.Base.ResolutionUnit] = 2
+    return exif
+
+
+def encode_image(document: Image.Image, fmt: str, dpi: int, encoder: EncoderConfig) -> bytes:
+    """
+    將證件圖片編碼為指定格式
+
+    :param document: 證件圖片
+    :param fmt: Pillow 格式名稱 (PNG、JPEG、WEBP 等)
+    :param dpi: 圖片解析度
+    :param encoder: 編碼設定
+    :return: 編碼後的檔案內容
+    """
+    buffer = io.BytesIO()
+
+    if fmt == 'PNG':
+        png = encoder.png
+        image = document
+        if png.palette_colors:
+            # 量化為調色盤 PNG，FASTOCTREE 支援保留透明度
+            image = document.quantize(colors=png.palette_colors, method=Image.Quantize.FASTOCTREE)
+        image.save(
+            buffer, 'PNG',
+            dpi=(dpi, dpi),
+            compress_level=png.compress_level,
+            compress_type=PNG_STRATEGIES[png.strategy],
+        )
+    elif fmt == 'JPEG':
+        jpeg = encoder.jpeg
+        # JPEG 不支援透明度，需要轉換為 RGB
+        rgb_document = Image.new('RGB', document.size, (255, 255, 255))
+        rgb_document.paste(document, mask=document.split()[-1] if document.mode == 'RGBA' else None)
+        options = {"quality": jpeg.quality, "progressive": jpeg.progressive}
+        if jpeg.subsampling is not None:
+            options["subsampling"] = jpeg.subsampling
+        rgb_document.save(buffer, 'JPEG', dpi=(dpi, dpi), **options)
+    elif fmt == 'WEBP':
+        webp = encoder.webp
+        # WebP 沒有解析度欄位，Pillow 會忽略 dpi 參數，改寫入 EXIF
+        document.save(buffer, 'WEBP', lossless=webp.lossless, quality=webp.quality, method=webp.method,
+                      exif=_resolution_exif(dpi))
+    else:
+        # 其他格式使用預設方式
+        document.save(buffer, fmt, dpi=(dpi, dpi))
+
+    return buffer.getvalue()
@@ -0,0 +1,290 @@
+"""
+字體索引模組
+掃描系統字體資料夾與 fonts 資料夾，讀取字體檔案的 name 表建立「字體家族名稱 → 字體檔案」的索引，
+並快取在磁碟上，之後啟動時不需要重新掃描
+"""
+
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 索引的字體副檔名
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc", ".otc")
+
+# 索引檔格式版本，格式或解析方式變更時遞增以捨棄舊索引
+INDEX_FORMAT_VERSION = 1
+
+# name 表中的名稱編號：1 字體家族、2 子家族、16 排版用家族、17 排版用子家族
+_FAMILY_NAME_IDS = (1, 16)
+_SUBFAMILY_NAME_IDS = (2, 17)
+
+# 視為一般字重的子家族名稱，同一家族有多個檔案時優先使用
+_REGULAR_SUBFAMILIES = {"regular", "normal", "book", "roman", "medium"}
+
+# 索引項目：(字體檔案路徑, TTC 中的字體索引)
+FontEntry = Tuple[str, int]
+
+
+def default_font_dirs() -> List[Path]:
+    """
+    目前平台的字體資料夾，以及專案的 fonts 資料夾
+
+    :return: 字體資料夾列表
+    """
+    home = Path.home()
+    if sys.platform == "win32":
+        windir = os.environ.get("WINDIR", r"C:\Windows")
+        dirs = [Path(windir) / "Fonts"]
+        local_app_data = os.environ.get("LOCALAPPDATA")
+        if local_app_data:
+            dirs.append(Path(local_app_data) / "Microsoft" / "Windows" / "Fonts")
+    elif sys.platform == "darwin":
+        dirs = [Path("/System/Library/Fonts"), Path("/Library/Fonts"), home / "Library" / "Fonts"]
+    else:
+        data_home = Path(os.environ.get("XDG_DATA_HOME", home / ".local" / "share"))
+        dirs = [Path("/usr/share/fonts"), Path("/usr/local/share/fonts"), data_home / "fonts", home / ".fonts"]
+    dirs.append(Path("fonts"))
+    return dirs
+
+
+def user_cache_dir() -> Path:
+    """本程式在使用者快取資料夾中的目錄（Linux/macOS 為 ~/.cache/id-gen，Windows 為 %LOCALAPPDATA%\\id-gen）"""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local"))
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return base / "id-gen"
+
+
+def default_cache_file() -> Path:
+    """字體索引檔的預設路徑（使用者快取資料夾中）"""
+    return user_cache_dir() / "font_index.json"
+
+
+def _decode_name(platform_id: int, raw: bytes) -> Optional[str]:
+    """解碼 name 表中的字串，Unicode 與 Windows 平台為 UTF-16BE，Macintosh 平台為 Mac Roman"""
+    try:
+        if platform_id in (0, 3):
+            return raw.decode("utf-16-be")
+        if platform_id == 1:
+            return raw.decode("mac_roman")
+    except UnicodeDecodeError:
+        pass
+    return None
+
+
+def _read_names(data: bytes, font_offset: int) -> Tuple[List[str], List[str]]:
+    """
+    讀取單一字體的 name 表
+
+    :param data: 字體檔案內容
+    :param font_offset: 字體在檔案中的起始位置（TTC 中各字體的偏移量）
+    :return: (家族名稱列表, 子家族名稱列表)
+    """
+    num_tables = struct.unpack_from(">H", data, font_offset + 4)[0]
+    for i in range(num_tables):
+        tag, _, offset, _ = struct.unpack_from(">4sIII", data, font_offset + 12 + i * 16)
+        if tag == b"name":
+            break
+    else:
+        return [], []
+
+    _, count, string_offset = struct.unpack_from(">HHH", data, offset)
+    families: List[str] = []
+    subfamilies: List[str] = []
+    for i in range(count):
+        platform_id, _, _, name_id, length, name_offset = struct.unpack_from(">HHHHHH", data, offset + 6 + i * 12)
+        if name_id not in _FAMILY_NAME_IDS and name_id not in _SUBFAMILY_NAME_IDS:
+            continue
+        start = offset + string_offset + name_offset
+        name = _decode_name(platform_id, data[start:start + length])
+        if not name:
+            continue
+        target = families if name_id in _FAMILY_NAME_IDS else subfamilies
+        if name not in target:
+            target.append(name)
+    return families, subfamilies
+
+
+def read_font_names(font_path: str | Path) -> Iterator[Tuple[int, List[str], List[str]]]:
+    """
+    讀取字體檔案中每個字體的家族與子家族名稱
+
+    :param font_path: 字體檔案路徑 (TTF、OTF、TTC)
+    :return: (TTC 中的字體索引, 家族名稱列表, 子家族名稱列表) 迭代器
+    """
+    data = Path(font_path).read_bytes()
+    if data[:4] == b"ttcf":
+        num_fonts = struct.unpack_from(">I", data, 8)[0]
+        offsets = struct.unpack_from(f">{num_fonts}I", data, 12)
+    elif data[:4] in (b"\x00\x01\x00\x00", b"OTTO", b"true"):
+        offsets = (0,)
+    else:
+        return
+
+    for index, font_offset in enumerate(offsets):
+        families, subfamilies = _read_names(data, font_offset)
+        yield index, families, subfamilies
+
+
+class FontIndex:
+    """
+    字體家族名稱索引
+
+    名稱比對不分大小寫。同一家族有多個檔案（例如 Regular 與 Bold）時，優先使用一般字重的檔案。
+
+    :param families: 小寫家族名稱對應 (字體檔案路徑, TTC 字體索引) 的字典
+    """
+
+    def __init__(self, families: Dict[str, FontEntry]):
+        self.families = families
+
+    def __len__(self) -> int:
+        return len(self.families)
+
+    def __contains__(self, family: str) -> bool:
+        return family.lower() in self.families
+
+    def find(self, family: str) -> Optional[FontEntry]:
+        """
+        查詢字體家族
+
+        :param family: 字體家族名稱
+        :return: (字體檔案路徑, TTC 字體索引)，找不到時回傳 None
+        """
+        return self.families.get(family.lower())
+
+    @staticmethod
+    def _walk(font_dirs: List[Path]) -> Tuple[List[str], Dict[str, int]]:
+        """
+        遞迴列出字體檔案
+
+        :return: (字體檔案路徑列表, 各資料夾的修改時間)
+        """
+        files: List[str] = []
+        dir_mtimes: Dict[str, int] = {}
+        stack = [str(d) for d in font_dirs]
+        while stack:
+            directory = stack.pop()
+            try:
+                dir_mtimes[directory] = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(FONT_EXTENSIONS):
+                            files.append(entry.path)
+            except OSError:
+                continue
+        return sorted(files), dir_mtimes
+
+    @staticmethod
+    def scan(font_files: List[str]) -> Dict[str, FontEntry]:
+        """
+        讀取字體檔案並建立家族名稱索引
+
+        :param font_files: 字體檔案路徑列表
+        :return: 小寫家族名稱對應 (字體檔案路徑, TTC 字體索引) 的字典
+        """
+        families: Dict[str, FontEntry] = {}
+        ranks: Dict[str, int] = {}
+        for font_file in font_files:
+            try:
+                fonts = list(read_font_names(font_file))
+            except (OSError, struct.error) as e:
+                logger.debug(f"無法讀取字體檔案 {font_file}: {e}")
+                continue
+            for index, names, subfamilies in fonts:
+                rank = 0 if any(s.lower() in _REGULAR_SUBFAMILIES for s in subfamilies) else 1
+                for name in names:
+                    key = name.lower()
+                    if key not in families or rank < ranks[key]:
+                        families[key] = (os.path.abspath(font_file), index)
+                        ranks[key] = rank
+        return families
+
+    @classmethod
+    def build(cls, font_dirs: Optional[List[Path]] = None, cache_file: Optional[str | Path] = None) -> "FontIndex":
+        """
+        建立字體索引
+
+        索引檔記錄了每個字體資料夾（含子資料夾）的修改時間，全部相同時直接載入，
+        否則重新掃描並寫回索引檔。
+
+        :param font_dirs: 字體資料夾列表，None 表示使用 default_font_dirs()
+        :param cache_file: 索引檔路徑，None 表示不使用索引檔
+        :return: 字體索引
+        """
+        font_dirs = default_font_dirs() if font_dirs is None else font_dirs
+        # 以絕對路徑記錄，避免 fonts 等相對路徑在不同工作目錄下共用同一份索引
+        font_dirs = [Path(d).absolute() for d in font_dirs]
+        roots = [str(d) for d in font_dirs]
+
+        if cache_file is not None:
+            cache_path = Path(cache_file)
+            try:
+                with cache_path.open('r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_FORMAT_VERSION and data.get("roots") == roots and cls._dirs_unchanged(data["dirs"], roots):
+                    logger.debug(f"使用字體索引檔: {cache_path}，共 {len(data['families'])} 個字體家族")
+                    return cls({k: tuple(v) for k, v in data["families"].items()})
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+        font_files, dir_mtimes = cls._walk(font_dirs)
+        families = cls.scan(font_files)
+        logger.debug(f"已建立字體索引，共 {len(font_files)} 個字體檔案、{len(families)} 個字體家族")
+
+        if cache_file is not None:
+            try:
+                cache_path = Path(cache_file)
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+                with tmp_path.open('w', encoding='utf-8') as f:
+                    json.dump({
+                        "version": INDEX_FORMAT_VERSION,
+                        "roots": roots,
+                        "dirs": dir_mtimes,
+                        "families": families,
+                    }, f, ensure_ascii=False)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                logger.debug(f"無法寫入字體索引檔 {cache_file}: {e}")
+
+        return cls(families)
+
+    @staticmethod
+    def _dirs_unchanged(dir_mtimes: Dict[str, int], roots: List[str]) -> bool:
+        """檢查索引檔記錄的資料夾是否都未變更，且原本不存在的字體根資料夾仍不存在"""
+        for directory, mtime_ns in dir_mtimes.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return all(root in dir_mtimes or not os.path.isdir(root) for root in roots)
+
+
+_font_index: Optional[FontIndex] = None
+_font_index_lock = threading.Lock()
+
+
+def get_font_index() -> FontIndex:
+    """
+    取得行程共用的字體索引，第一次呼叫時建立（使用預設字體資料夾與索引檔）
+
+    :return: 字體索引
+    """
+    global _font_index
+    if _font_index is None:
+        with _font_index_lock:
+            if _font_index is None:
+                _font_index = FontIndex.build(cache_file=default_cache_file())
+    return _font_index
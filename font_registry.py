@@ -0,0 +1,162 @@
+"""
+字體註冊表模組
+提供整個行程共用的字體快取，避免每次渲染都重新解析 TTF 檔案
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import ImageFont
+
+from font_index import get_font_index
+
+logger = logging.getLogger(__name__)
+
+# 快取鍵：(字體家族或路徑, 字體大小, 排版引擎)
+FontKey = Tuple[str, int, Optional[int]]
+
+
+class FontRegistry:
+    """
+    以 LRU 方式快取字體物件的註冊表
+
+    :param max_size: 最多保留的字體物件數量，超過時淘汰最久未使用的字體
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._fonts: "OrderedDict[FontKey, ImageFont.FreeTypeFont]" = OrderedDict()
+        # 記錄哪些鍵是載入失敗後回退到預設字體的結果
+        self._fallback_keys = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, font_family: str, font_size: int, layout_engine: Optional[int] = None, fallback: bool = True) -> ImageFont.FreeTypeFont:
+        """
+        取得字體物件
+
+        :param font_family: 字體家族名稱（透過字體索引查詢）、fonts 資料夾中的 .ttf 檔名或字體檔案路徑
+        :param font_size: 字體大小
+        :param layout_engine: PIL 排版引擎 (ImageFont.Layout)，None 表示使用預設值
+        :param fallback: 載入失敗時是否回退到預設字體，False 則拋出 OSError
+        :return: 字體物件
+        """
+        key = (str(font_family), int(font_size), layout_engine)
+
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None and (fallback or key not in self._fallback_keys):
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+
+        font, is_fallback = self._load(font_family, int(font_size), layout_engine, fallback)
+
+        with self._lock:
+            self._fonts[key] = font
+            self._fonts.move_to_end(key)
+            if is_fallback:
+                self._fallback_keys.add(key)
+            else:
+                self._fallback_keys.discard(key)
+            while len(self._fonts) > self.max_size:
+                evicted_key, _ = self._fonts.popitem(last=False)
+                self._fallback_keys.discard(evicted_key)
+                self.evictions += 1
+
+        return font
+
+    def _load(self, font_family: str, font_size: int, layout_engine: Optional[int], fallback: bool) -> Tuple[ImageFont.FreeTypeFont, bool]:
+        """從檔案或系統載入字體物件，回傳 (字體物件, 是否為回退字體)"""
+        try:
+            # 如果指定的是 .ttf 檔案，單純檔名從 fonts 資料夾載入，含路徑則直接使用
+            if font_family.endswith('.ttf'):
+                font_path = font_file_path(font_family)
+                if font_path.exists():
+                    return ImageFont.truetype(str(font_path), font_size, layout_engine=layout_engine), False
+                if not fallback:
+                    raise OSError(f"字體檔案不存在: {font_path}")
+                logger.warning(f"字體檔案不存在: {font_path}，使用預設字體")
+                return ImageFont.load_default(), True
+
+            # 以字體索引查詢家族名稱，找不到時交給 Pillow 以檔名搜尋系統字體
+            entry = get_font_index().find(font_family)
+            if entry is not None:
+                font_path, index = entry
+                return ImageFont.truetype(font_path, font_size, index=index, layout_engine=layout_engine), False
+            return ImageFont.truetype(font_family, font_size, layout_engine=layout_engine), False
+        except OSError:
+            if not fallback:
+                raise
+            try:
+                # 嘗試預設字體
+                return ImageFont.truetype("arial.ttf", font_size, layout_engine=layout_engine), True
+            except OSError:
+                # 最後回到預設字體
+                logger.warning(f"無法載入字體 {font_family}，使用預設字體")
+                return ImageFont.load_default(), True
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得快取統計資訊
+
+        :return: 包含命中、未命中、淘汰次數與命中率的字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._fonts),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """清除所有快取的字體與統計資訊"""
+        with self._lock:
+            self._fonts.clear()
+            self._fallback_keys.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+def font_file_path(font_family: str) -> Optional[Path]:
+    """
+    解析字體設定對應的字體檔案路徑（不檢查檔案是否存在）
+
+    :param font_family: 字體家族名稱、fonts 資料夾中的 .ttf 檔名或字體檔案路徑
+    :return: 字體檔案路徑，字體索引中找不到的家族名稱回傳 None
+    """
+    if font_family.endswith('.ttf'):
+        # 單純檔名從 fonts 資料夾載入，含路徑則直接使用
+        font_path = Path(font_family)
+        return Path("fonts") / font_family if font_path.parent == Path('.') else font_path
+
+    entry = get_font_index().find(font_family)
+    return Path(entry[0]) if entry is not None else None
+
+
+# 行程內共用的字體註冊表
+font_registry = FontRegistry()
+
+
+def get_font(font_family: str, font_size: int, layout_engine: Optional[int] = None, fallback: bool = True) -> ImageFont.FreeTypeFont:
+    """
+    從行程共用的字體註冊表取得字體物件
+
+    :param font_family: 字體家族名稱、fonts 資料夾中的 .ttf 檔名或字體檔案路徑
+    :param font_size: 字體大小
+    :param layout_engine: PIL 排版引擎 (ImageFont.Layout)
+    :param fallback: 載入失敗時是否回退到預設字體
+    :return: 字體物件
+    """
+    return font_registry.get(font_family, font_size, layout_engine, fallback)
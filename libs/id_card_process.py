@@ -1,7 +1,9 @@
 import os
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import logging
 
+from font_registry import get_font
+
 # 獲取logger
 logger = logging.getLogger(__name__)
 
@@ -32,7 +34,7 @@ def add_text_to_template(template: tuple, text: str, position: tuple, font_size:
     
     try:
         draw = ImageDraw.Draw(template)
-        font = ImageFont.truetype("./fonts/NotoSansTC-Bold.ttf", font_size)
+        font = get_font("./fonts/NotoSansTC-Bold.ttf", font_size, fallback=False)
         draw.text(position, text, font=font, fill="black")
         logger.debug("文字添加成功")
         return template
@@ -54,7 +56,7 @@ def add_text_to_template_tps(template: tuple, text: str, position: tuple, font_s
     
     try:
         draw = ImageDraw.Draw(template)
-        font = ImageFont.truetype("./fonts/TaipeiSansTCBeta-Regular.ttf", font_size)
+        font = get_font("./fonts/TaipeiSansTCBeta-Regular.ttf", font_size, fallback=False)
         draw.text(position, text, font=font, fill="black")
         logger.debug("文字添加成功")
         return template
@@ -76,7 +78,7 @@ def add_code_to_template(template: tuple, code: str, position: tuple, font_size:
     
     try:
         draw = ImageDraw.Draw(template)
-        font = ImageFont.truetype("./fonts/CartographMonoCF-Regular.ttf", font_size)
+        font = get_font("./fonts/CartographMonoCF-Regular.ttf", font_size, fallback=False)
         draw.text(position, code, font=font, fill="black")
         logger.debug("代碼添加成功")
         return template
@@ -98,7 +100,7 @@ def add_mrz_to_template(template: tuple, mrz: str, position: tuple, font_size: i
     
     try:
         draw = ImageDraw.Draw(template)
-        font = ImageFont.truetype("./fonts/OCR-B.ttf", font_size)
+        font = get_font("./fonts/OCR-B.ttf", font_size, fallback=False)
         draw.text(position, mrz, font=font, fill="black")
         logger.debug("MRZ添加成功")
         return template
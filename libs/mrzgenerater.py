@@ -1,4 +1,13 @@
 import re
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+# 批次 API 的欄位：整欄資料，或套用到每一筆的單一字串
+Column = Union[str, Sequence[str]]
+
+# 編碼後的字串欄：(字元碼陣列 (筆數, 最大長度), 各筆長度)
+_Codes = Tuple[np.ndarray, np.ndarray]
 
 class MRZGenerator:
     """
@@ -166,6 +175,205 @@ class MRZGenerator:
         )
         return mrz_line2
 
+    # --- 批次 API ---
+    # 以整欄資料為單位，字串轉為 UCS-4 字元碼陣列後，以查表與陣列運算完成清理、填充與校驗碼計算，
+    # 結果與逐筆呼叫 build_mrz_line1 / build_mrz_line2 完全相同。
+
+    def build_mrz_line1_batch(self, country_codes: Column, last_names: Column, first_names: Column) -> np.ndarray:
+        """
+        批次建立 MRZ 的第一行。
+        :param country_codes: 國籍代碼欄（或所有人共用的單一字串）。
+        :param last_names: 姓氏欄。
+        :param first_names: 名字欄。
+        :return: MRZ 第一行的字串陣列，順序與輸入相同。
+        """
+        n = _batch_size(country_codes, last_names, first_names)
+        filler = self.CONFIG["FILLER"]
+
+        name_field = _concat([
+            self._sanitize_batch(_column(last_names, n)),
+            _constant(filler * 2, n),
+            self._sanitize_batch(_column(first_names, n)),
+        ])
+        prefix_length = len(self.CONFIG["PASSPORT_TYPE"]) + 3 + self.CONFIG["COUNTRY_CODE_LENGTH"]
+
+        return _to_strings(_concat([
+            _constant(f"{self.CONFIG['PASSPORT_TYPE']}{filler}", n),
+            self._pad_batch(self._sanitize_batch(_column(country_codes, n)), self.CONFIG["COUNTRY_CODE_LENGTH"]),
+            _constant(filler * 2, n),
+            self._pad_batch(name_field, self.CONFIG["MRZ_LINE_LENGTH"] - prefix_length),
+        ]))
+
+    def build_mrz_line2_batch(
+        self,
+        passport_numbers: Column,
+        nationalities: Column,
+        dobs: Column,
+        genders: Column,
+        expiry_dates: Column,
+        personal_identifiers: Column,
+    ) -> np.ndarray:
+        """
+        批次建立 MRZ 的第二行。
+        :param passport_numbers: 護照號碼欄。
+        :param nationalities: 國籍欄（或所有人共用的單一字串）。
+        :param dobs: 出生日期欄 (YYMMDD)。
+        :param genders: 性別欄 (M/F/<)。
+        :param expiry_dates: 有效期欄 (YYMMDD)。
+        :param personal_identifiers: 個人識別碼欄。
+        :return: MRZ 第二行的字串陣列，順序與輸入相同。
+        :raises ValueError: 如果出生日期或有效期含有不支援的字元。
+        """
+        n = _batch_size(passport_numbers, nationalities, dobs, genders, expiry_dates, personal_identifiers)
+        filler = _constant(self.CONFIG["FILLER"], n)
+
+        passport_num = self._pad_batch(
+            self._sanitize_batch(_column(passport_numbers, n)), self.CONFIG["PASSPORT_NUMBER_FIELD_LENGTH"]
+        )
+        nationality = self._pad_batch(self._sanitize_batch(_column(nationalities, n)), self.CONFIG["COUNTRY_CODE_LENGTH"])
+        # 出生日期與有效期與逐筆版本相同，不經清理直接放入
+        dob = _encode(_column(dobs, n))
+        self._check_digits_batch(dob)  # 出生日期的校驗碼不放入 MRZ，但仍檢查字元
+        gender = self._pad_batch(self._sanitize_batch(_column(genders, n)), 1)
+        expiry_date = _encode(_column(expiry_dates, n))
+        personal_id = self._pad_batch(self._sanitize_batch(_column(personal_identifiers, n)), 7)
+
+        return _to_strings(_concat([
+            passport_num, filler, _digits(self._check_digits_batch(passport_num)),
+            filler, nationality,
+            filler, dob,
+            filler, gender,
+            filler, expiry_date, filler, _digits(self._check_digits_batch(expiry_date)),
+            _constant(self.CONFIG["FILLER"] * 2, n),
+            personal_id, filler, _digits(self._check_digits_batch(personal_id)),
+        ]))
+
+    def _sanitize_batch(self, strings: List[str]) -> _Codes:
+        """
+        批次版的 sanitize_and_pad(s, 0)：轉大寫並將非大寫字母、數字或 '<' 的字元替換為填充字元。
+        只有含非 ASCII 字元的資料逐筆呼叫 str.upper（可能改變長度，例如 ß → SS），其餘以查表完成。
+        """
+        codes, lengths = _encode(strings)
+        non_ascii = (codes >= 128).any(axis=1)
+        if non_ascii.any():
+            strings = [s.upper() if flag else s for s, flag in zip(strings, non_ascii.tolist())]
+            codes, lengths = _encode(strings)
+
+        table = _sanitize_table(self.CONFIG["FILLER"])
+        sanitized = np.where(codes < 128, table[np.minimum(codes, 127)], ord(self.CONFIG["FILLER"])).astype(np.uint32)
+        sanitized[np.arange(codes.shape[1]) >= lengths[:, None]] = 0
+        return sanitized, lengths
+
+    def _pad_batch(self, field: _Codes, length: int) -> _Codes:
+        """批次將已清理的字串以填充字元填充或截斷至指定長度。"""
+        codes, lengths = field
+        padded = np.full((codes.shape[0], length), ord(self.CONFIG["FILLER"]), dtype=np.uint32)
+        width = min(codes.shape[1], length)
+        keep = np.arange(width) < lengths[:, None]
+        padded[:, :width] = np.where(keep, codes[:, :width], padded[:, :width])
+        return padded, np.full(codes.shape[0], length, dtype=np.int64)
+
+    def _check_digits_batch(self, field: _Codes) -> np.ndarray:
+        """
+        批次計算校驗碼。
+        :return: 各筆的校驗碼 (0-9)。
+        :raises ValueError: 如果遇到不支援的字元。
+        """
+        codes, lengths = field
+        values = _value_table(tuple(self.CHAR_TO_VALUE.items()))[np.minimum(codes, 127)]
+        values[codes >= 128] = -1
+        in_range = np.arange(codes.shape[1]) < lengths[:, None]
+
+        invalid = (values < 0) & in_range
+        if invalid.any():
+            row, col = np.argwhere(invalid)[0]
+            raise ValueError(f'不支援的字元 "{chr(codes[row, col])}"，無法計算校驗碼。（第 {row} 筆）')
+
+        weights = np.resize(np.array(self.CONFIG["WEIGHTS"], dtype=np.int64), codes.shape[1])
+        return (np.where(in_range, values, 0) * weights).sum(axis=1) % 10
+
+_sanitize_tables = {}
+_value_tables = {}
+
+def _sanitize_table(filler: str) -> np.ndarray:
+    """ASCII 字元碼對應清理後字元碼的查表（小寫轉大寫，不允許的字元轉為填充字元）"""
+    table = _sanitize_tables.get(filler)
+    if table is None:
+        table = np.array([
+            ord(c.upper()) if re.fullmatch(r'[A-Z0-9<]', c.upper()) else ord(filler)
+            for c in map(chr, range(128))
+        ], dtype=np.uint32)
+        _sanitize_tables[filler] = table
+    return table
+
+def _value_table(char_to_value: Tuple[Tuple[str, int], ...]) -> np.ndarray:
+    """ASCII 字元碼對應校驗碼數值的查表，不支援的字元為 -1"""
+    table = _value_tables.get(char_to_value)
+    if table is None:
+        table = np.full(128, -1, dtype=np.int64)
+        for char, value in char_to_value:
+            table[ord(char)] = value
+        _value_tables[char_to_value] = table
+    return table
+
+def _batch_size(*columns: Column) -> int:
+    """檢查各欄筆數一致，單一字串不計入"""
+    sizes = {len(column) for column in columns if not isinstance(column, str)}
+    if len(sizes) > 1:
+        raise ValueError(f"各欄資料筆數不一致: {sorted(sizes)}")
+    return sizes.pop() if sizes else 1
+
+def _column(column: Column, n: int) -> List[str]:
+    """將欄位轉為字串列表，單一字串套用到每一筆"""
+    return [column] * n if isinstance(column, str) else list(column)
+
+def _encode(strings: List[str]) -> _Codes:
+    """將字串列表轉為 UCS-4 字元碼陣列，超出各筆長度的位置為 0"""
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    array = np.array(strings, dtype=str) if strings else np.empty(0, dtype="<U1")
+    codes = array.view(np.uint32).reshape(len(strings), array.dtype.itemsize // 4)
+    return codes, lengths
+
+def _constant(text: str, n: int) -> _Codes:
+    """每一筆都相同的固定字串"""
+    codes = np.tile(np.array([ord(c) for c in text], dtype=np.uint32), (n, 1))
+    return codes, np.full(n, len(text), dtype=np.int64)
+
+def _digits(values: np.ndarray) -> _Codes:
+    """將校驗碼轉為單一數字字元"""
+    return (values.astype(np.uint32) + ord("0"))[:, None], np.ones(len(values), dtype=np.int64)
+
+def _concat(fields: List[_Codes]) -> _Codes:
+    """依序串接各欄位，各筆長度可以不同"""
+    n = fields[0][0].shape[0]
+    lengths = np.sum([field_lengths for _, field_lengths in fields], axis=0).astype(np.int64)
+    width = int(lengths.max()) if n else 0
+    # 多一欄作為超出各筆長度的字元的寫入位置，最後捨棄
+    result = np.zeros((n, width + 1), dtype=np.uint32)
+
+    offsets = np.zeros(n, dtype=np.int64)
+    offset = 0  # 所有資料的起點相同時的起點，不同時為 None
+    for codes, field_lengths in fields:
+        field_width = codes.shape[1]
+        if offset is not None and n and (field_lengths == field_width).all():
+            # 固定長度的欄位直接以切片複製
+            result[:, offset:offset + field_width] = codes
+            offset += field_width
+        else:
+            positions = np.arange(field_width)
+            targets = np.where(positions < field_lengths[:, None], offsets[:, None] + positions, width)
+            np.put_along_axis(result, targets, codes, axis=1)
+            offset = None
+        offsets += field_lengths
+    return result[:, :width], lengths
+
+def _to_strings(field: _Codes) -> np.ndarray:
+    """將字元碼陣列轉回字串陣列"""
+    codes, _ = field
+    if codes.shape[1] == 0:
+        return np.full(codes.shape[0], "", dtype="<U1")
+    return np.ascontiguousarray(codes).view(f"<U{codes.shape[1]}").reshape(codes.shape[0])
+
 # 如何在其他檔案中引入和使用這個類別的範例：
 if __name__ == "__main__":
     generator = MRZGenerator()
@@ -1,13 +1,27 @@
 """
 集中式日誌配置模組
-提供彩色日誌輸出和統一的日誌管理
+提供彩色日誌輸出和統一的日誌管理，可改為經由佇列在背景執行緒寫入，工作行程的日誌也彙整到同一個日誌檔案
 """
 
+import atexit
 import logging
+import multiprocessing
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
 import colorlog
 import os
 from datetime import datetime
 
+# 主行程實際輸出日誌的處理器（檔案與終端）
+_handlers: List[logging.Handler] = []
+
+# 執行中的日誌監聽器，在背景執行緒中把佇列裡的紀錄交給上述處理器
+_listeners: List[QueueListener] = []
+
+# 工作行程共用的日誌佇列，第一次需要時才建立
+_worker_queue: Optional["multiprocessing.Queue"] = None
+
 def setup_logger(name: str = None) -> logging.Logger:
     """
     設定彩色日誌輸出
@@ -56,10 +70,14 @@ def setup_logger(name: str = None) -> logging.Logger:
     
     return logger
 
-def setup_main_logger() -> logging.Logger:
+def setup_main_logger(async_logging: bool = False) -> logging.Logger:
     """
     設定主要的日誌輸出，包含檔案輸出和彩色終端輸出
-    
+
+    非同步模式下根logger只把紀錄放入佇列，格式化、寫檔與終端輸出都在監聽器的背景執行緒進行，
+    產生日誌的執行緒不會等待磁碟或終端；程式結束時會先寫完佇列中剩餘的紀錄。
+
+    :param async_logging: 是否以佇列在背景執行緒輸出日誌
     :return: 配置好的主logger
     """
     # 確保logs目錄存在
@@ -68,7 +86,8 @@ def setup_main_logger() -> logging.Logger:
     # 獲取根logger
     root_logger = logging.getLogger()
     
-    # 清除現有的handlers
+    # 停止先前的監聽器並清除現有的handlers
+    stop_logging()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
     
@@ -111,11 +130,81 @@ def setup_main_logger() -> logging.Logger:
     )
     console_handler.setFormatter(color_formatter)
     
-    # 添加處理器到根logger
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    # 添加處理器到根logger（非同步模式下改由監聽器使用）
+    _handlers[:] = [file_handler, console_handler]
+    if async_logging:
+        log_queue = queue.SimpleQueue()
+        root_logger.addHandler(QueueHandler(log_queue))
+        _start_listener(log_queue)
+    else:
+        root_logger.addHandler(file_handler)
+        root_logger.addHandler(console_handler)
     
     # 記錄日誌檔案路徑
     root_logger.info(f"日誌檔案已創建: {log_filename}")
     
     return root_logger
+
+def _start_listener(log_queue) -> QueueListener:
+    """以主行程的處理器啟動一個監聽器"""
+    listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    listener.start()
+    if not _listeners:
+        atexit.register(stop_logging)
+    _listeners.append(listener)
+    return listener
+
+def worker_log_queue() -> Optional["multiprocessing.Queue"]:
+    """
+    取得工作行程使用的日誌佇列
+
+    第一次呼叫時建立佇列並啟動對應的監聽器，工作行程的紀錄經由此佇列寫入主行程的日誌檔案與終端，
+    不論工作行程以 fork 或 spawn 啟動都只有主行程寫入同一個日誌檔案。
+
+    :return: 日誌佇列，尚未呼叫 setup_main_logger 時為 None（工作行程沿用預設的日誌設定）
+    """
+    global _worker_queue
+    if not _handlers:
+        return None
+    if _worker_queue is None:
+        _worker_queue = multiprocessing.Queue()
+        _start_listener(_worker_queue)
+    return _worker_queue
+
+def setup_worker_logger(log_queue: "multiprocessing.Queue", level: int):
+    """
+    設定工作行程的日誌：根logger只保留指向主行程佇列的處理器（移除 fork 時繼承的檔案與終端處理器）
+
+    :param log_queue: worker_log_queue 回傳的日誌佇列
+    :param level: 主行程根logger的日誌等級，低於此等級的紀錄在工作行程內就被略過
+    """
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+def stop_logging():
+    """
+    停止所有監聽器並等待佇列中的紀錄寫完
+
+    根logger改為直接使用檔案與終端處理器，之後的紀錄同步輸出，不會遺失。
+    """
+    global _worker_queue
+    if not _listeners:
+        return
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+    if _worker_queue is not None:
+        _worker_queue.close()
+        _worker_queue.join_thread()
+        _worker_queue = None
+
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root_logger.removeHandler(handler)
+    for handler in _handlers:
+        if handler not in root_logger.handlers:
+            root_logger.addHandler(handler)
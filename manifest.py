@@ -0,0 +1,294 @@
+"""
+建置紀錄模組
+在輸出資料夾中以 SQLite 記錄每個證件的輸入雜湊與輸出檔案，
+下次執行時只重新生成輸入有變更的證件，並找出已不對應任何資料的輸出
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from archiver import additional_files
+from schema import DocumentConfig
+from template_cache import template_assets
+
+logger = logging.getLogger(__name__)
+
+# 建置紀錄檔名，放在輸出資料夾中
+MANIFEST_NAME = ".id_gen_manifest.sqlite"
+
+# 建置紀錄格式版本，格式或雜湊內容變更時遞增，舊紀錄中的證件會全部重新生成
+MANIFEST_FORMAT_VERSION = 2
+
+# 輸入未變更、略過生成的證件在處理結果中的訊息
+UP_TO_DATE_MESSAGE = "Up to date"
+
+# 建置紀錄項目：(證件路徑, 輸入雜湊, 輸出檔案路徑列表)，路徑皆相對於輸出資料夾
+ManifestEntry = Tuple[str, str, List[str]]
+
+
+def _stat_record(path: str | Path) -> Optional[Tuple[int, int]]:
+    """檔案的 (大小, 修改時間)，檔案不存在時回傳 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def template_fingerprint(template_path: str | Path, config: DocumentConfig, options: Dict[str, object]) -> str:
+    """
+    計算模板相關輸入的雜湊：模板 YAML、背景圖片與字體的內容、額外檔案，以及輸出選項
+
+    :param template_path: 模板描述檔路徑
+    :param config: 模板設定
+    :param options: 影響輸出檔案的選項（例如是否建立壓縮檔）
+    :return: SHA-256 十六進位字串
+    """
+    digest = hashlib.sha256()
+    digest.update(str(MANIFEST_FORMAT_VERSION).encode("utf-8"))
+    digest.update(Path(template_path).read_bytes())
+    assets = {path: record["sha256"] for path, record in template_assets(config).items()}
+    # 額外檔案以大小與修改時間判斷，避免每次執行都讀取全部內容
+    extras = {str(path.resolve()): _stat_record(path) for path in additional_files(config)}
+    digest.update(json.dumps([assets, extras, options], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _file_sha256(path: Path) -> str:
+    """計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_input_hash(template_hash: str, row: Dict[str, str], photo_hash: Optional[str]) -> str:
+    """
+    計算單筆資料的輸入雜湊：模板雜湊、CSV 資料行，以及實際使用的照片內容
+
+    :param template_hash: template_fingerprint 的結果
+    :param row: CSV 資料行
+    :param photo_hash: 照片內容的 SHA-256（見 BuildManifest.photo_hash），None 表示使用佔位圖
+    :return: SHA-256 十六進位字串
+    """
+    payload = json.dumps([template_hash, row, photo_hash], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class BuildManifest:
+    """
+    輸出資料夾的建置紀錄
+
+    紀錄依模板分開保存，同一個輸出資料夾可以放多個模板的輸出，互不影響。
+
+    :param output_dir: 輸出資料夾路徑
+    :param template_path: 模板描述檔路徑
+    """
+
+    def __init__(self, output_dir: str | Path, template_path: str | Path):
+        self.output_dir = Path(output_dir)
+        self.template = str(Path(template_path).resolve())
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.output_dir / MANIFEST_NAME)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            " template TEXT NOT NULL,"
+            " output TEXT NOT NULL,"
+            " input_hash TEXT NOT NULL,"
+            " files TEXT NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (template, output))"
+        )
+        # 一次載入此模板的全部紀錄，逐筆比對時不需要查詢資料庫
+        self._entries: Dict[str, Tuple[str, List[str]]] = {}
+        for output, input_hash, files, version in self._conn.execute(
+                "SELECT output, input_hash, files, version FROM outputs WHERE template = ?", (self.template,)):
+            if version == MANIFEST_FORMAT_VERSION:
+                self._entries[output] = (input_hash, json.loads(files))
+
+        # 照片內容雜湊，以完整的檔案狀態為鍵：大小、修改時間、inode 與狀態變更時間都相同時才沿用，
+        # 其餘情況（例如以 cp -p 或 touch 還原修改時間的新照片）重新讀取內容計算
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS photos ("
+            " path TEXT PRIMARY KEY,"
+            " stat TEXT NOT NULL,"
+            " sha256 TEXT NOT NULL)"
+        )
+        self._photos: Dict[str, Tuple[str, str]] = {
+            path: (stat, sha256) for path, stat, sha256 in self._conn.execute("SELECT path, stat, sha256 FROM photos")
+        }
+        self._pending_photos: Dict[str, Tuple[str, str]] = {}
+
+    def __enter__(self) -> "BuildManifest":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """寫入尚未保存的照片雜湊並關閉資料庫連線"""
+        self._save_photos()
+        self._conn.close()
+
+    def photo_hash(self, photo_path: str | Path) -> Optional[str]:
+        """
+        取得照片的內容雜湊，檔案狀態與上次記錄完全相同時不重新讀取
+
+        :param photo_path: 照片路徑
+        :return: SHA-256 十六進位字串，照片無法讀取時回傳 None
+        """
+        path = str(Path(photo_path).resolve())
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = f"{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}:{stat.st_ctime_ns}"
+        cached = self._photos.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        try:
+            content_hash = _file_sha256(Path(path))
+        except OSError:
+            return None
+        self._photos[path] = self._pending_photos[path] = (key, content_hash)
+        return content_hash
+
+    def _save_photos(self):
+        """寫入新計算的照片雜湊"""
+        if not self._pending_photos:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO photos VALUES (?, ?, ?)",
+                                   [(path, stat, sha256) for path, (stat, sha256) in self._pending_photos.items()])
+        self._pending_photos.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def relative(self, path: str | Path) -> str:
+        """輸出資料夾中的檔案以相對路徑記錄，搬移輸出資料夾後紀錄仍然有效"""
+        return Path(os.path.relpath(path, self.output_dir)).as_posix()
+
+    def is_up_to_date(self, output: str, input_hash: str, files: List[str]) -> bool:
+        """
+        檢查證件是否不需要重新生成：輸入雜湊與上次相同、輸出檔案相同且都還存在
+
+        :param output: 證件路徑（相對於輸出資料夾）
+        :param input_hash: 本次的輸入雜湊
+        :param files: 本次會產生的輸出檔案（相對於輸出資料夾）
+        """
+        entry = self._entries.get(output)
+        if entry is None or entry[0] != input_hash or entry[1] != files:
+            return False
+        return all((self.output_dir / name).exists() for name in files)
+
+    def record(self, entries: Iterable[ManifestEntry]):
+        """
+        記錄已成功生成的證件
+
+        :param entries: (證件路徑, 輸入雜湊, 輸出檔案列表) 迭代器
+        """
+        now = time.time()
+        rows = []
+        for output, input_hash, files in entries:
+            self._entries[output] = (input_hash, files)
+            rows.append((self.template, output, input_hash, json.dumps(files, ensure_ascii=False), MANIFEST_FORMAT_VERSION, now))
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._save_photos()
+
+    def stale(self, seen: Iterable[str]) -> List[ManifestEntry]:
+        """
+        找出本次資料中已不存在的證件紀錄
+
+        :param seen: 本次資料對應的證件路徑
+        :return: 過時的紀錄列表
+        """
+        seen = set(seen)
+        return [(output, input_hash, files) for output, (input_hash, files) in sorted(self._entries.items())
+                if output not in seen]
+
+    def prune(self, stale: Iterable[ManifestEntry], extra_names: Iterable[str] = ()) -> int:
+        """
+        刪除過時證件的輸出檔案與紀錄，並移除因此變空的資料夾
+
+        仍有效的紀錄也會產生的檔案（例如同一人員的壓縮檔）不刪除；人員資料夾仍有有效的證件時，保留其中的額外檔案。
+
+        :param stale: stale() 回傳的過時紀錄
+        :param extra_names: 人員資料夾中可一併刪除的額外檔案名稱
+        :return: 刪除的檔案數量
+        """
+        extra_names = set(extra_names)
+        stale = list(stale)
+        live_files, live_dirs = self._live_outputs({output for output, _, _ in stale})
+        removed = 0
+        outputs = []
+        for output, _, files in stale:
+            outputs.append(output)
+            for name in files:
+                if name in live_files:
+                    # 壓縮檔等路徑與仍有效的證件共用（例如只變更了 output_file_format），不刪除
+                    continue
+                path = self.output_dir / name
+                try:
+                    path.unlink()
+                    removed += 1
+                    logger.info(f"已刪除過時的輸出: {path}")
+                except FileNotFoundError:
+                    pass
+
+            # 刪除人員資料夾中的額外檔案，資料夾變空後往上移除空資料夾；
+            # 資料夾仍有有效的證件時，額外檔案仍在使用中
+            person_dir = (self.output_dir / output).parent
+            if Path(output).parent.as_posix() in live_dirs:
+                continue
+            for name in extra_names:
+                try:
+                    (person_dir / name).unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+            self._remove_empty_dirs(person_dir)
+
+        for output in outputs:
+            self._entries.pop(output, None)
+        with self._conn:
+            self._conn.executemany("DELETE FROM outputs WHERE template = ? AND output = ?",
+                                   [(self.template, output) for output in outputs])
+        return removed
+
+    def _live_outputs(self, stale_outputs: Set[str]) -> Tuple[Set[str], Set[str]]:
+        """
+        仍有效的紀錄（包含同一輸出資料夾中其他模板的紀錄）使用的輸出檔案與人員資料夾
+
+        :param stale_outputs: 此模板中即將刪除的證件路徑
+        :return: (輸出檔案路徑集合, 人員資料夾路徑集合)，皆相對於輸出資料夾
+        """
+        live_files: Set[str] = set()
+        live_dirs: Set[str] = set()
+        for template, output, files in self._conn.execute("SELECT template, output, files FROM outputs"):
+            if template == self.template and output in stale_outputs:
+                continue
+            live_files.update(json.loads(files))
+            live_dirs.add(Path(output).parent.as_posix())
+        return live_files, live_dirs
+
+    def _remove_empty_dirs(self, directory: Path):
+        """由下往上移除空資料夾，不超出輸出資料夾"""
+        root = self.output_dir.resolve()
+        directory = directory.resolve()
+        while directory != root and root in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                return
+            directory = directory.parent
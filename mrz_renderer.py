@@ -0,0 +1,301 @@
+"""
+MRZ 渲染模組
+依模板的 mrz 設定以 MRZGenerator 組成兩行機器可讀區，並以預先點陣化的 OCR-B 字元圖集繪製：
+MRZ 只使用 A–Z、0–9 與 '<'，字體又是等寬字體，每個字元只需點陣化一次，之後逐格拼接
+"""
+
+import math
+import string
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from constraits import MRZ_GENDER_CODE_DICT
+from libs.mrzgenerater import MRZGenerator
+from schema import MRZSourceConfig
+
+# MRZ 使用的字元
+MRZ_CHARSET = string.ascii_uppercase + string.digits + "<"
+
+# 行程內共用的 MRZ 產生器（不保存狀態）
+_generator = MRZGenerator()
+
+
+def _mrz_date(value: str) -> str:
+    """將 CSV 的 YYYY/MM/DD 日期轉為 MRZ 的 YYMMDD，其他格式原樣使用"""
+    try:
+        return datetime.strptime(value, "%Y/%m/%d").strftime("%y%m%d")
+    except ValueError:
+        return value
+
+
+def build_mrz_lines(source: MRZSourceConfig, document_number: str, row: Dict[str, str]) -> Tuple[str, str]:
+    """
+    組成單筆資料的兩行 MRZ
+
+    :param source: 模板中的 mrz 設定，各值為可包含 {CSV 欄位名} 的格式字串
+    :param document_number: 證件號碼（欄位 data_path 的值）
+    :param row: CSV 資料行
+    :return: (第一行, 第二行)
+    :raises KeyError: 格式字串引用了不存在的 CSV 欄位
+    :raises ValueError: 日期含有無法計算校驗碼的字元
+    """
+    country_code = source.country_code.format(**row)
+    nationality = source.nationality.format(**row) if source.nationality is not None else country_code
+    gender = source.gender.format(**row)
+
+    line1 = _generator.build_mrz_line1(
+        country_code=country_code,
+        last_name=source.last_name.format(**row),
+        first_name=source.first_name.format(**row),
+    )
+    line2 = _generator.build_mrz_line2(
+        passport_number=document_number,
+        nationality=nationality,
+        dob=_mrz_date(source.birth_date.format(**row)),
+        gender=MRZ_GENDER_CODE_DICT.get(gender, gender),
+        expiry_date=_mrz_date(source.expiry_date.format(**row)),
+        personal_identifier=source.personal_identifier.format(**row),
+    )
+    return line1, line2
+
+
+def build_mrz_lines_batch(source: MRZSourceConfig, document_numbers: List[str],
+                          rows: List[Dict[str, str]]) -> Tuple[List[Optional[Tuple[str, str]]], Dict[int, str]]:
+    """
+    一次組成多筆資料的 MRZ：格式字串逐筆展開，校驗碼與補齊交給 MRZGenerator 的批次 API
+
+    :param source: 模板中的 mrz 設定
+    :param document_numbers: 各筆資料的證件號碼
+    :param rows: CSV 資料行列表
+    :return: (各筆的 (第一行, 第二行)，失敗的資料為 None；資料索引對應錯誤訊息)
+    """
+    lines: List[Optional[Tuple[str, str]]] = [None] * len(rows)
+    errors: Dict[int, str] = {}
+    dates: Dict[str, str] = {}
+
+    def mrz_date(value: str) -> str:
+        if value not in dates:
+            dates[value] = _mrz_date(value)
+        return dates[value]
+
+    valid = []
+    columns = {name: [] for name in ("country_codes", "last_names", "first_names", "passport_numbers",
+                                     "nationalities", "dobs", "genders", "expiry_dates", "personal_identifiers")}
+    for i, (document_number, row) in enumerate(zip(document_numbers, rows)):
+        try:
+            country_code = source.country_code.format(**row)
+            nationality = source.nationality.format(**row) if source.nationality is not None else country_code
+            gender = source.gender.format(**row)
+            values = (country_code, source.last_name.format(**row), source.first_name.format(**row), document_number,
+                      nationality, mrz_date(source.birth_date.format(**row)), MRZ_GENDER_CODE_DICT.get(gender, gender),
+                      mrz_date(source.expiry_date.format(**row)), source.personal_identifier.format(**row))
+        except (KeyError, IndexError, ValueError) as e:
+            errors[i] = f"MRZ 格式化失敗，缺少欄位 {e}" if isinstance(e, KeyError) else f"MRZ 格式化失敗: {e}"
+            continue
+        valid.append(i)
+        for column, value in zip(columns.values(), values):
+            column.append(value)
+
+    if not valid:
+        return lines, errors
+
+    try:
+        line1 = _generator.build_mrz_line1_batch(
+            columns["country_codes"], columns["last_names"], columns["first_names"]).tolist()
+        line2 = _generator.build_mrz_line2_batch(
+            columns["passport_numbers"], columns["nationalities"], columns["dobs"], columns["genders"],
+            columns["expiry_dates"], columns["personal_identifiers"]).tolist()
+    except ValueError:
+        # 批次中有無法計算校驗碼的資料，改為逐筆產生以找出是哪幾筆
+        for i in valid:
+            try:
+                lines[i] = build_mrz_lines(source, document_numbers[i], rows[i])
+            except ValueError as e:
+                errors[i] = f"MRZ 產生失敗: {e}"
+        return lines, errors
+
+    for i, first, second in zip(valid, line1, line2):
+        lines[i] = (first, second)
+    return lines, errors
+
+
+# 已計算的字距微調表，與次像素起點無關，每個字體只計算一次
+_kerning_tables: Dict[ImageFont.FreeTypeFont, np.ndarray] = {}
+_kerning_lock = threading.Lock()
+
+
+def _kerning_table(font: ImageFont.FreeTypeFont) -> np.ndarray:
+    """
+    MRZ 字元對的字距微調（26.6 定點數）
+
+    以 getlength 的差值計算，與 Pillow 排版時加在前一個字元字寬上的值相同。
+
+    :param font: 字體
+    :return: (字元數, 字元數) 的陣列，[前一個字元, 後一個字元] 的索引順序與 MRZ_CHARSET 相同
+    """
+    table = _kerning_tables.get(font)
+    if table is None:
+        lengths = [font.getlength(char) for char in MRZ_CHARSET]
+        table = np.array([
+            [round((font.getlength(left + right) - lengths[i] - lengths[j]) * 64) for j, right in enumerate(MRZ_CHARSET)]
+            for i, left in enumerate(MRZ_CHARSET)
+        ], dtype=np.int64)
+        with _kerning_lock:
+            table = _kerning_tables.setdefault(font, table)
+    return table
+
+
+class GlyphAtlas:
+    """
+    等寬字體的 MRZ 字元圖集
+
+    每個字元以指定的次像素起點點陣化一次，放在固定寬度的格子中；繪製一行時以字元索引取出格子並排成一張遮罩，
+    再以遮罩混合顏色貼到證件上。
+
+    字元位置與 Pillow 的 FreeType 排版相同：筆位置以 26.6 定點數（1/64 像素）累加字寬與字距微調，
+    每個字元再各自四捨五入到整數像素，因此字距微調累積到半像素時，之後的字元會與直接繪製文字一樣移動 1 像素。
+
+    :param font: 等寬字體（通常為 OCR-B）
+    :param start: 文字起點座標的小數部分，與 ImageDraw.text 的次像素定位相同
+    :raises ValueError: 字體不是等寬字體時拋出
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont, start: Tuple[float, float] = (0.0, 0.0)):
+        lengths = {char: font.getlength(char) for char in MRZ_CHARSET}
+        advances = {round(length) for length in lengths.values()}
+        if len(advances) != 1:
+            raise ValueError(f"MRZ 字體必須為等寬字體，字元寬度: {sorted(advances)}")
+        self.advance = advances.pop()
+
+        # 26.6 定點數的字寬、起點，以及每對字元的字距微調
+        self.advance_26_6 = round(lengths[MRZ_CHARSET[0]] * 64)
+        self.start_26_6 = math.floor(start[0] * 64 + 0.5)
+        self.kerning = _kerning_table(font)
+
+        # 以點陣化結果的偏移量決定格子範圍（字元超出字寬時格子會比字寬大，拼接時需要疊合）
+        metrics = []
+        for char in MRZ_CHARSET:
+            mask, offset = font.getmask2(char, "L", anchor="la", start=start)
+            metrics.append((offset, mask.size))
+        self.left = min(0, min(offset[0] for offset, _ in metrics))
+        self.top = min(offset[1] for offset, _ in metrics)
+        right = max(self.advance, max(offset[0] + size[0] for offset, size in metrics))
+        bottom = max(offset[1] + size[1] for offset, size in metrics)
+        self.cell_size = (right - self.left, bottom - self.top)
+
+        # 繪製位置必須為非負數，整數部分與小數部分才會與直接繪製時相同，因此先畫在較大的畫布上再裁切
+        shift_y = max(0, -self.top)
+        cells = []
+        for char in MRZ_CHARSET:
+            canvas = Image.new("L", (self.cell_size[0], bottom + shift_y), 0)
+            ImageDraw.Draw(canvas).text((start[0] - self.left, start[1] + shift_y), char, fill=255, font=font)
+            cells.append(np.asarray(canvas)[self.top + shift_y:])
+        self.cells = np.stack(cells)
+        self.overlapping = self.cell_size[0] != self.advance
+        # 字寬為整數像素且沒有字距微調時，字元位置固定為字寬的整數倍
+        self.fixed_pitch = self.advance_26_6 == self.advance * 64 and not self.kerning.any()
+
+        # ASCII 字元碼對應格子索引，不在 MRZ 字元集中的字元為 -1
+        self.index = np.full(128, -1, dtype=np.int64)
+        for i, char in enumerate(MRZ_CHARSET):
+            self.index[ord(char)] = i
+
+    def line_mask(self, text: str) -> np.ndarray:
+        """
+        拼接一行文字的遮罩
+
+        :param text: 只包含 MRZ 字元的文字
+        :return: (高, 寬) 的 uint8 遮罩
+        :raises ValueError: 文字包含 MRZ 字元集以外的字元
+        """
+        codes = np.frombuffer(text.encode("ascii", errors="replace"), dtype=np.uint8)
+        indices = self.index[np.minimum(codes, 127)]
+        if (indices < 0).any():
+            raise ValueError(f"MRZ 含有無法繪製的字元: {text}")
+
+        glyphs = self.cells[indices]
+        width, height = self.cell_size
+        positions = self.positions(indices)
+        if not self.overlapping and (np.diff(positions) == self.advance).all():
+            # 格子互不重疊且字元間距都等於字寬，直接排成一列
+            return glyphs.transpose(1, 0, 2).reshape(height, len(text) * width)
+
+        # 格子重疊（格子寬於字寬或字距微調使字元靠近）時，重疊部分取較大值（與 FreeType 點陣化整行文字的方式相同）
+        mask = np.zeros((height, int(positions[-1]) + width), dtype=np.uint8)
+        for x, glyph in zip(positions.tolist(), glyphs):
+            np.maximum(mask[:, x:x + width], glyph, out=mask[:, x:x + width])
+        return mask
+
+    def positions(self, indices: np.ndarray) -> np.ndarray:
+        """
+        計算各字元相對於第一個字元的整數像素位置
+
+        :param indices: 字元的格子索引
+        :return: 各字元的 x 位移（像素）
+        """
+        if self.fixed_pitch or len(indices) < 2:
+            return np.arange(len(indices), dtype=np.int64) * self.advance
+        pen = np.zeros(len(indices), dtype=np.int64)
+        np.cumsum(self.advance_26_6 + self.kerning[indices[:-1], indices[1:]], out=pen[1:])
+        # 與 FreeType 的 PIXEL 巨集相同，四捨五入到整數像素
+        return ((self.start_26_6 + pen + 32) >> 6) - ((self.start_26_6 + 32) >> 6)
+
+    def draw(self, draw: ImageDraw.ImageDraw, xy: Tuple[float, float], text: str, fill: Tuple[int, ...]):
+        """
+        繪製一行 MRZ
+
+        :param draw: 證件圖片的繪圖物件
+        :param xy: 文字左上角位置，小數部分需與建立圖集時的 start 相同
+        :param text: 只包含 MRZ 字元的文字
+        :param fill: 文字顏色
+        """
+        if not text:
+            return
+        mask = Image.fromarray(self.line_mask(text), "L")
+        draw.bitmap((int(xy[0]) + self.left, int(xy[1]) + self.top), mask, fill=fill)
+
+
+# 已建立的字元圖集，鍵為 (字體物件, 座標的小數部分)
+_atlases: Dict[Tuple[ImageFont.FreeTypeFont, Tuple[float, float]], GlyphAtlas] = {}
+_atlases_lock = threading.Lock()
+
+
+def get_glyph_atlas(font: ImageFont.FreeTypeFont, xy: Tuple[float, float]) -> GlyphAtlas:
+    """
+    取得行程共用的字元圖集，同一字體與同一次像素起點只建立一次
+
+    :param font: 等寬字體
+    :param xy: 文字位置（只使用小數部分）
+    :return: 字元圖集
+    """
+    start = (xy[0] % 1, xy[1] % 1)
+    key = (font, start)
+    atlas = _atlases.get(key)
+    if atlas is None:
+        with _atlases_lock:
+            atlas = _atlases.get(key)
+            if atlas is None:
+                atlas = GlyphAtlas(font, start)
+                _atlases[key] = atlas
+    return atlas
+
+
+def draw_mrz(draw: ImageDraw.ImageDraw, xy: Tuple[float, float], lines: List[str], fill: Tuple[int, ...],
+             font: ImageFont.FreeTypeFont, line_spacing: float):
+    """
+    以字元圖集繪製多行 MRZ
+
+    :param draw: 證件圖片的繪圖物件
+    :param xy: 第一行左上角位置
+    :param lines: MRZ 各行文字
+    :param fill: 文字顏色
+    :param font: 等寬字體
+    :param line_spacing: 行距（像素）
+    """
+    for i, line in enumerate(lines):
+        position = (xy[0], xy[1] + i * line_spacing)
+        get_glyph_atlas(font, position).draw(draw, position, line, fill)
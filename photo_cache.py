@@ -0,0 +1,119 @@
+"""
+照片快取模組
+以來源照片內容雜湊、目標尺寸與圓角半徑為鍵，將裁切完成的 RGBA 照片保存在磁碟上
+"""
+
+import hashlib
+import io
+import logging
+import os
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 照片處理方式的版本，裁切或縮放演算法變更時遞增，使舊快取失效
+PROCESSING_VERSION = "cover-2"
+
+# 處理照片的函式：接收照片檔案（路徑或已讀入的位元組串流），回傳處理完成的照片
+PhotoProducer = Callable[[Union[Path, BinaryIO]], Image.Image]
+
+
+class PhotoCache:
+    """
+    處理後照片的磁碟快取
+
+    內容相同的來源照片（例如以不同檔名存放的同一張照片）會對應到同一個快取項目。
+    來源檔案的路徑、大小與修改時間也會記錄對應的內容雜湊，未變更的來源照片不需要重新讀取。
+
+    :param cache_dir: 快取資料夾路徑
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def _source_ref_path(self, photo_path: Path, stat: os.stat_result) -> Path:
+        """來源檔案狀態對應的內容雜湊記錄檔路徑"""
+        ref_key = hashlib.sha256(
+            f"{photo_path.resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8")
+        ).hexdigest()
+        return self.cache_dir / "refs" / ref_key[:2] / ref_key
+
+    def _entry_path(self, key: str) -> Path:
+        """快取項目的檔案路徑"""
+        return self.cache_dir / "photos" / key[:2] / f"{key}.png"
+
+    @staticmethod
+    def make_key(content_hash: str, size: Tuple[int, int], border_radius: int) -> str:
+        """
+        建立快取鍵
+
+        :param content_hash: 來源照片內容的 SHA-256
+        :param size: 目標尺寸 (寬, 高)
+        :param border_radius: 圓角半徑
+        :return: 快取鍵
+        """
+        raw = f"{PROCESSING_VERSION}\0{content_hash}\0{size[0]}x{size[1]}\0{border_radius}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _content_hash(self, photo_path: Path) -> Tuple[str, Optional[bytes]]:
+        """
+        取得來源照片的內容雜湊
+
+        :return: (內容雜湊, 來源位元組)，若雜湊來自記錄檔則來源位元組為 None
+        """
+        stat = os.stat(photo_path)
+        ref_path = self._source_ref_path(photo_path, stat)
+        try:
+            return ref_path.read_text(encoding="ascii").strip(), None
+        except OSError:
+            pass
+
+        data = photo_path.read_bytes()
+        content_hash = hashlib.sha256(data).hexdigest()
+        self._write_atomic(ref_path, content_hash.encode("ascii"))
+        return content_hash, data
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        """先寫入暫存檔再取代，避免多個行程同時寫入時讀到不完整的檔案"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def load(self, photo_path: str | Path, size: Tuple[int, int], border_radius: int, producer: PhotoProducer) -> Image.Image:
+        """
+        取得處理完成的照片，快取中沒有時呼叫 producer 處理並寫入快取
+
+        :param photo_path: 來源照片路徑
+        :param size: 目標尺寸 (寬, 高)
+        :param border_radius: 圓角半徑
+        :param producer: 處理照片的函式
+        :return: 處理完成的 RGBA 照片
+        """
+        photo_path = Path(photo_path)
+        content_hash, data = self._content_hash(photo_path)
+        key = self.make_key(content_hash, size, border_radius)
+        entry_path = self._entry_path(key)
+
+        try:
+            with Image.open(entry_path) as cached:
+                photo = cached.convert("RGBA")
+            self.hits += 1
+            return photo
+        except (OSError, ValueError):
+            pass
+
+        self.misses += 1
+        photo = producer(io.BytesIO(data) if data is not None else photo_path)
+
+        buffer = io.BytesIO()
+        photo.save(buffer, "PNG", compress_level=1)
+        self._write_atomic(entry_path, buffer.getvalue())
+        logger.debug("已快取處理後的照片: %s -> %s", photo_path, entry_path.name)
+        return photo
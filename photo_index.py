@@ -0,0 +1,117 @@
+"""
+照片索引模組
+啟動時掃描一次照片資料夾，之後以檔名（不含副檔名）直接查詢照片路徑
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 支援的照片副檔名，同一檔名有多種格式時依此順序優先使用：
+# JPEG 與 WebP 原始檔優先於 PNG（可直接縮小解碼，舊版轉換留下的全尺寸 PNG 不再使用）
+SUPPORTED_EXTENSIONS = (".jpg", ".jpeg", ".webp", ".png", ".bmp", ".gif", ".tiff", ".tif")
+_EXTENSION_PRIORITY = {ext: i for i, ext in enumerate(SUPPORTED_EXTENSIONS)}
+
+# 索引檔格式版本，格式變更時遞增以捨棄舊索引
+INDEX_FORMAT_VERSION = 2
+
+
+class PhotoIndex:
+    """
+    照片資料夾索引
+
+    :param folder: 照片資料夾路徑
+    :param entries: 檔名（不含副檔名）對應實際檔名的字典
+    """
+
+    def __init__(self, folder: str | Path, entries: Dict[str, str]):
+        self.folder = Path(folder)
+        self.entries = entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def find(self, *stems: str) -> Optional[Path]:
+        """
+        依序以多個檔名查詢照片
+
+        :param stems: 候選檔名（不含副檔名），空字串會被略過
+        :return: 第一個找到的照片路徑，都找不到時回傳 None
+        """
+        for stem in stems:
+            if not stem:
+                continue
+            filename = self.entries.get(stem)
+            if filename is not None:
+                return self.folder / filename
+        return None
+
+    @staticmethod
+    def scan(folder: str | Path) -> Dict[str, str]:
+        """
+        掃描照片資料夾（不含子資料夾）
+
+        :param folder: 照片資料夾路徑
+        :return: 檔名（不含副檔名）對應實際檔名的字典
+        """
+        entries: Dict[str, str] = {}
+        with os.scandir(folder) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                priority = _EXTENSION_PRIORITY.get(ext.lower())
+                if priority is None or not entry.is_file():
+                    continue
+                current = entries.get(stem)
+                if current is None or priority < _EXTENSION_PRIORITY[os.path.splitext(current)[1].lower()]:
+                    entries[stem] = entry.name
+        return entries
+
+    @classmethod
+    def build(cls, folder: str | Path, index_file: Optional[str | Path] = None) -> "PhotoIndex":
+        """
+        建立照片索引
+
+        指定 index_file 時，若索引檔記錄的資料夾修改時間與目前相同則直接載入，
+        否則重新掃描並寫回索引檔。新增、刪除或重新命名照片都會改變資料夾修改時間。
+
+        :param folder: 照片資料夾路徑
+        :param index_file: 索引檔路徑，None 表示不使用索引檔
+        :return: 照片索引
+        """
+        folder = Path(folder)
+        mtime_ns = os.stat(folder).st_mtime_ns
+
+        if index_file is not None:
+            index_path = Path(index_file)
+            try:
+                with index_path.open('r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if (data.get("version") == INDEX_FORMAT_VERSION
+                        and data.get("folder") == str(folder.resolve())
+                        and data.get("mtime_ns") == mtime_ns):
+                    logger.debug(f"使用照片索引檔: {index_path}，共 {len(data['entries'])} 張照片")
+                    return cls(folder, data["entries"])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        entries = cls.scan(folder)
+        logger.info(f"已建立照片索引: {folder}，共 {len(entries)} 張照片")
+
+        if index_file is not None:
+            index_path = Path(index_file)
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+            with tmp_path.open('w', encoding='utf-8') as f:
+                json.dump({
+                    "version": INDEX_FORMAT_VERSION,
+                    "folder": str(folder.resolve()),
+                    "mtime_ns": mtime_ns,
+                    "entries": entries,
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, index_path)
+
+        return cls(folder, entries)
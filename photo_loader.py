@@ -0,0 +1,55 @@
+"""
+照片解碼模組
+在解碼階段就把照片縮小到接近目標尺寸，避免完整解碼高解析度照片
+"""
+
+import math
+from pathlib import Path
+from typing import BinaryIO, Tuple, Union
+
+from PIL import Image
+
+# 預先縮小後保留的倍數：至少保留目標尺寸的兩倍像素，讓最後的 LANCZOS 縮放維持品質
+REDUCING_GAP = 2.0
+
+# 直接解碼原始檔的格式：JPEG 以 draft 縮小解碼，WebP 解碼也比轉換後的全尺寸 PNG 快，不需要先轉換為 PNG
+DIRECT_DECODE_EXTENSIONS = (".jpg", ".jpeg", ".webp")
+
+
+def _cover_size(image_size: Tuple[int, int], target_size: Tuple[int, int]) -> Tuple[int, int]:
+    """計算 cover 縮放時需要保留的最小尺寸（含 REDUCING_GAP）"""
+    width, height = image_size
+    target_width, target_height = target_size
+    scale = max(target_width / width, target_height / height)
+    return (
+        max(1, math.ceil(width * scale * REDUCING_GAP)),
+        max(1, math.ceil(height * scale * REDUCING_GAP)),
+    )
+
+
+def open_photo(photo_file: Union[str, Path, BinaryIO], target_size: Tuple[int, int], reduce: bool = True) -> Image.Image:
+    """
+    開啟照片並縮小到接近目標尺寸後轉為 RGBA
+
+    JPEG 會使用 draft 模式在 DCT 階段直接以 1/2、1/4 或 1/8 解碼；
+    其他格式則在解碼後以整數倍 reduce() 預先縮小。兩者都會保留至少 REDUCING_GAP 倍的目標尺寸。
+
+    :param photo_file: 照片路徑或檔案物件
+    :param target_size: 之後要以 cover 方式縮放到的尺寸 (寬, 高)
+    :param reduce: 是否預先縮小，False 則完整解碼
+    :return: RGBA 照片
+    """
+    photo = Image.open(photo_file)
+    if not reduce:
+        return photo.convert("RGBA")
+
+    needed = _cover_size(photo.size, target_size)
+    if photo.format == "JPEG":
+        # draft 只會選擇不小於 needed 的縮放比例
+        photo.draft("RGB" if photo.mode == "RGB" else photo.mode, needed)
+
+    factor = min(photo.width // needed[0], photo.height // needed[1])
+    if factor > 1:
+        photo = photo.reduce(factor)
+
+    return photo.convert("RGBA")
@@ -0,0 +1,254 @@
+"""
+資料預檢模組
+生成證件前以欄為單位檢查並正規化 CSV：日期欄中相同的值只解析一次、MRZ 以批次 API 產生、輸出路徑預先計算。
+無法生成的資料在渲染前就被拒絕，不會先做完照片與條碼等工作才失敗；渲染時直接使用正規化後的值
+"""
+
+import logging
+import time
+from collections.abc import Sized
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from mrz_renderer import build_mrz_lines_batch
+from render_plan import CompiledField, RenderPlan
+
+logger = logging.getLogger(__name__)
+
+# 串流資料每次預檢的筆數，記憶體用量不隨資料筆數增加
+DEFAULT_BLOCK_SIZE = 1024
+
+# 同一個欄位的問題在日誌中最多列出的筆數
+MAX_REPORTED_ROWS = 5
+
+# 欄位正規化結果：(各資料行的值，沒有值或無法渲染時為 None；資料行索引對應錯誤訊息)
+NormalizedColumn = Tuple[List[Any], Dict[int, str]]
+
+# 預檢結果：(資料行, 錯誤訊息)，錯誤訊息為 None 時資料行為 PreparedRow
+PrepassItem = Tuple[Dict[str, str], Optional[str]]
+
+
+class PreparedRow(dict):
+    """
+    已預檢的 CSV 資料行
+
+    內容與原始資料行相同（建置紀錄、額外檔案與壓縮檔路徑照常使用），另外帶有各欄位正規化後的值與輸出路徑，
+    傳給工作行程時一併序列化。
+
+    :param row: 原始 CSV 資料行
+    :param values: 欄位名稱對應正規化後的值，沒有值的欄位不渲染
+    :param output_path: 證件的輸出檔案路徑
+    """
+
+    def __init__(self, row: Dict[str, str], values: Dict[str, Any], output_path: Path):
+        super().__init__(row)
+        self.values = values
+        self.output_path = output_path
+
+
+def _normalize_text(field: CompiledField, rows: List[Dict[str, str]], raw: List[str]) -> NormalizedColumn:
+    """文字與數字欄位：含有大括號的值視為格式化字串，以 CSV 欄位替換"""
+    values, errors = [], {}
+    for i, (row, text) in enumerate(zip(rows, raw)):
+        if "{" in text and "}" in text:
+            try:
+                text = text.format(**row)
+            except KeyError as e:
+                errors[i] = f"格式化字串失敗: {text}，缺少欄位 {e}"
+                text = None
+            except (IndexError, ValueError) as e:
+                errors[i] = f"格式化字串失敗: {text}，{e}"
+                text = None
+        values.append(text)
+    return values, errors
+
+
+def _normalize_date(field: CompiledField, rows: List[Dict[str, str]], raw: List[str]) -> NormalizedColumn:
+    """日期欄位：相同的日期只解析一次，結果為年、月、日三段文字；無法解析時保留原始文字"""
+    parsed: Dict[str, Optional[Tuple[str, ...]]] = {}
+    for text in set(raw):
+        try:
+            parsed[text] = tuple(datetime.strptime(text, "%Y/%m/%d").strftime(field.date_format).split('/'))
+        except ValueError:
+            parsed[text] = None
+
+    values, errors = [], {}
+    for i, text in enumerate(raw):
+        parts = parsed[text]
+        if parts is None:
+            errors[i] = f"無法解析日期: {text}，請確保來源的日期格式正確（YYYY/MM/DD）"
+            parts = tuple(text.split('/'))
+        values.append(parts)
+    return values, errors
+
+
+def _normalize_barcode(field: CompiledField, rows: List[Dict[str, str]], raw: List[str]) -> NormalizedColumn:
+    """條碼欄位：Code128 只能編碼 ASCII 字元"""
+    values, errors = [], {}
+    for i, data in enumerate(raw):
+        if not data.isascii():
+            errors[i] = f"條碼資料包含 Code128 不支援的字元: {data}"
+            data = None
+        values.append(data)
+    return values, errors
+
+
+def _normalize_mrz(field: CompiledField, rows: List[Dict[str, str]], raw: List[str]) -> NormalizedColumn:
+    """MRZ 欄位：整欄一次交給批次 API 產生兩行 MRZ"""
+    return build_mrz_lines_batch(field.mrz, raw, rows)
+
+
+# 欄位類型對應的正規化函式
+_NORMALIZERS: Dict[str, Callable[[CompiledField, List[Dict[str, str]], List[str]], NormalizedColumn]] = {
+    "text": _normalize_text,
+    "number": _normalize_text,
+    "date": _normalize_date,
+    "barcode": _normalize_barcode,
+    "mrz": _normalize_mrz,
+}
+
+
+def normalize_column(field: CompiledField, rows: List[Dict[str, str]]) -> NormalizedColumn:
+    """
+    以欄為單位正規化一個欄位的值
+
+    日期的年月日、格式化後的文字與 MRZ 兩行都在這裡產生，渲染函式只負責繪製。
+    無法解析的日期會保留原始文字（與錯誤訊息一起回傳），其他錯誤的值為 None。
+
+    :param field: 已編譯的欄位
+    :param rows: CSV 資料行列表
+    :return: (各資料行的正規化值，沒有值時為 None；資料行索引對應錯誤訊息)
+    """
+    values: List[Any] = [None] * len(rows)
+    errors: Dict[int, str] = {}
+    present = [i for i, row in enumerate(rows) if row.get(field.data_path)]
+    if not present:
+        return values, errors
+
+    column, column_errors = _NORMALIZERS[field.type](
+        field, [rows[i] for i in present], [str(rows[i][field.data_path]) for i in present])
+    for i, value in zip(present, column):
+        values[i] = value
+    for local, error in column_errors.items():
+        errors[present[local]] = error
+    return values, errors
+
+
+def normalize_field(field: CompiledField, row: Dict[str, str]) -> Tuple[Any, Optional[str]]:
+    """
+    正規化單筆資料的欄位值（未經預檢的資料行使用）
+
+    :param field: 已編譯的欄位
+    :param row: CSV 資料行
+    :return: (正規化後的值，沒有值或無法渲染時為 None；錯誤訊息)
+    """
+    values, errors = normalize_column(field, [row])
+    return values[0], errors.get(0)
+
+
+def _report(field: CompiledField, problem: str, row_numbers: List[int], strict: bool):
+    """在日誌中整理同一欄位的問題，只列出前幾筆"""
+    listed = "、".join(str(n) for n in row_numbers[:MAX_REPORTED_ROWS])
+    more = "…" if len(row_numbers) > MAX_REPORTED_ROWS else ""
+    outcome = "已拒絕" if strict else "仍會生成"
+    logger.warning(f"欄位 {field.key}: {len(row_numbers)} 筆資料{problem}（第 {listed}{more} 筆，{outcome}）")
+
+
+def _prepare_block(plan: RenderPlan, rows: List[Dict[str, str]], first_row: int,
+                   output_file_path: Callable[[Dict[str, str]], Path], strict: bool) -> List[PrepassItem]:
+    """
+    預檢一段資料
+
+    :param first_row: 此段第一筆資料的編號（從 1 開始），用於日誌
+    """
+    problems: List[List[str]] = [[] for _ in rows]
+    columns: Dict[str, List[Any]] = {}
+
+    for field in plan.fields:
+        values, errors = normalize_column(field, rows)
+        columns[field.key] = values
+
+        missing = [i for i, value in enumerate(values) if value is None and i not in errors]
+        if missing:
+            _report(field, f"沒有 {field.data_path} 的值", [first_row + i for i in missing], strict)
+            if strict:
+                for i in missing:
+                    problems[i].append(f"欄位 {field.key} 沒有 {field.data_path} 的值")
+
+        if errors:
+            _report(field, "無法正規化", [first_row + i for i in errors], strict)
+            for i, error in errors.items():
+                logger.debug("第 %d 筆資料欄位 %s: %s", first_row + i, field.key, error)
+                if strict:
+                    problems[i].append(f"欄位 {field.key}: {error}")
+
+    items: List[PrepassItem] = []
+    for i, row in enumerate(rows):
+        try:
+            output_path = output_file_path(row)
+        except KeyError as e:
+            problems[i].append(f"輸出路徑格式化失敗，缺少欄位 {e}")
+        except (IndexError, ValueError) as e:
+            problems[i].append(f"輸出路徑格式化失敗: {e}")
+
+        if problems[i]:
+            items.append((row, "資料驗證失敗: " + "；".join(problems[i])))
+            continue
+        values = {key: column[i] for key, column in columns.items() if column[i] is not None}
+        items.append((PreparedRow(row, values, output_path), None))
+    return items
+
+
+def _blocks(rows: Iterable[Dict[str, str]], block_size: int) -> Iterator[List[Dict[str, str]]]:
+    """列表整份一次預檢，迭代器逐段預檢"""
+    if isinstance(rows, Sized):
+        yield list(rows)
+        return
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def prepare_rows(plan: RenderPlan, rows: Iterable[Dict[str, str]], output_file_path: Callable[[Dict[str, str]], Path],
+                 strict: bool = False, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[PrepassItem]:
+    """
+    預檢並正規化 CSV 資料，結果順序與輸入相同
+
+    一律拒絕無法決定輸出路徑的資料（save_to 或 output_file_format 引用了不存在的欄位）；
+    strict 為 True 時，欄位沒有值、日期無法解析、MRZ 或條碼無法產生的資料也會被拒絕，否則只記錄在日誌中並照常生成。
+
+    :param plan: 渲染計畫
+    :param rows: CSV 資料列表或迭代器
+    :param output_file_path: 計算資料行輸出檔案路徑的函式
+    :param strict: 是否拒絕任何欄位有問題的資料
+    :param block_size: 迭代器每次預檢的筆數
+    :return: (資料行, 錯誤訊息) 迭代器，通過預檢的資料行為 PreparedRow
+    """
+    header = None
+    total = rejected = 0
+    elapsed = 0.0
+    for block in _blocks(rows, block_size):
+        if header is None and block:
+            # 只需檢查一次 CSV 是否有模板引用的欄位
+            header = block[0].keys()
+            for field in plan.fields:
+                if field.data_path not in header:
+                    logger.warning(f"CSV 沒有 {field.data_path} 欄位，欄位 {field.key} 不會渲染")
+
+        start = time.perf_counter()
+        items = _prepare_block(plan, block, total + 1, output_file_path, strict)
+        elapsed += time.perf_counter() - start
+        total += len(block)
+        for row, error in items:
+            if error is not None:
+                rejected += 1
+                logger.error(f"拒絕 {row.get('id_number', 'unknown')}: {error}")
+            yield row, error
+
+    logger.info(f"預檢 {total} 筆資料，拒絕 {rejected} 筆（{elapsed * 1000:.1f} ms）")
@@ -0,0 +1,182 @@
+"""
+模板渲染計畫模組
+將 DocumentConfig 預先編譯為渲染計畫，逐筆生成證件時只需綁定資料並繪製
+"""
+
+from dataclasses import dataclass, field as dataclass_field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import ImageColor, ImageFont
+
+from schema import DocumentConfig, FieldDefinition, MRZSourceConfig
+from font_registry import get_font
+
+# 欄位預設值
+DEFAULT_FONT_FAMILY = "arial"
+DEFAULT_FONT_SIZE = 16
+DEFAULT_FONT_COLOR = "#000000"
+
+# MRZ 欄位的預設字體（等寬的 OCR-B）
+DEFAULT_MRZ_FONT_FAMILY = "OCR-B.ttf"
+
+# 會使用字體的欄位類型
+FONT_FIELD_TYPES = ("text", "number", "date", "mrz")
+
+# 多行文字的額外行距，與 ImageDraw 多行文字的預設值相同
+MULTILINE_SPACING = 4
+
+# 渲染函式簽章：(document, draw, compiled_field, value, csv_row)
+FieldRenderer = Callable[..., None]
+
+
+@dataclass
+class CompiledField:
+    """
+    已預先解析的欄位
+
+    :param key: 欄位名稱
+    :param type: 欄位類型
+    :param data_path: 對應的 CSV 欄位名稱
+    :param render: 此欄位的渲染函式
+    :param position: 單一座標欄位的位置（文字保留浮點數以支援次像素定位）
+    :param int_position: 轉換為整數的位置，供貼圖使用
+    :param positions: 日期欄位的年、月、日位置
+    :param size: 整數大小 (寬, 高)
+    :param font: 已載入的字體物件
+    :param color: 已解析的 RGB 顏色
+    :param date_format: 日期輸出格式
+    :param mrz: MRZ 欄位的資料來源
+    :param line_spacing: MRZ 兩行之間的距離（像素）
+    """
+    key: str
+    type: str
+    data_path: str
+    render: FieldRenderer
+    position: Optional[Tuple[float, float]] = None
+    int_position: Optional[Tuple[int, int]] = None
+    positions: List[Tuple[float, float]] = dataclass_field(default_factory=list)
+    size: Optional[Tuple[int, int]] = None
+    font: Optional[ImageFont.FreeTypeFont] = None
+    color: Optional[Tuple[int, ...]] = None
+    date_format: str = "%Y/%m/%d"
+    mrz: Optional[MRZSourceConfig] = None
+    line_spacing: float = 0.0
+
+
+@dataclass
+class RenderPlan:
+    """
+    模板的渲染計畫
+
+    :param fields: 已編譯的欄位列表
+    :param photo_enabled: 是否啟用照片
+    :param photo_position: 照片位置（整數）
+    :param photo_size: 照片大小（整數）
+    :param photo_border_radius: 照片圓角半徑
+    """
+    fields: List[CompiledField]
+    photo_enabled: bool
+    photo_position: Tuple[int, int]
+    photo_size: Tuple[int, int]
+    photo_border_radius: int
+
+
+def _parse_color(field: FieldDefinition) -> Tuple[int, ...]:
+    """解析欄位顏色"""
+    color = field.font_color or DEFAULT_FONT_COLOR
+    try:
+        return ImageColor.getrgb(color)
+    except ValueError:
+        raise ValueError(f"欄位 {field.key} 的顏色格式錯誤: {color}")
+
+
+def field_font_family(field: FieldDefinition) -> str:
+    """欄位使用的字體，未指定時 MRZ 欄位使用 OCR-B，其他欄位使用預設字體"""
+    if field.font_family:
+        return field.font_family
+    return DEFAULT_MRZ_FONT_FAMILY if field.type == "mrz" else DEFAULT_FONT_FAMILY
+
+
+def _to_point(field: FieldDefinition, point) -> Tuple[float, float]:
+    """檢查並轉換單一座標"""
+    if not isinstance(point, (tuple, list)) or len(point) != 2:
+        raise ValueError(f"欄位 {field.key} 的座標格式錯誤: {point}")
+    return (float(point[0]), float(point[1]))
+
+
+def compile_field(field: FieldDefinition, renderers: Dict[str, FieldRenderer]) -> CompiledField:
+    """
+    編譯單一欄位
+
+    :param field: 欄位定義
+    :param renderers: 欄位類型對應的渲染函式
+    :return: 已編譯的欄位
+    :raises ValueError: 欄位設定無法渲染時拋出
+    """
+    render = renderers.get(field.type)
+    if render is None:
+        raise ValueError(f"欄位 {field.key} 的類型 {field.type} 沒有對應的渲染方式")
+
+    compiled = CompiledField(
+        key=field.key,
+        type=field.type,
+        data_path=field.data_path,
+        render=render,
+        date_format=field.date_format or "%Y/%m/%d",
+    )
+
+    if field.type == "date":
+        # 日期欄位需要三個座標，分別為年、月、日
+        if not isinstance(field.position, list) or len(field.position) != 3:
+            raise ValueError(f"日期欄位 {field.key} 的 position 格式錯誤，應為三個座標 (年、月、日)，目前為 {field.position}")
+        compiled.positions = [_to_point(field, point) for point in field.position]
+    else:
+        compiled.position = _to_point(field, field.position)
+        compiled.int_position = (int(compiled.position[0]), int(compiled.position[1]))
+
+    if field.size:
+        compiled.size = (int(field.size[0]), int(field.size[1]))
+        if compiled.size[0] <= 0 or compiled.size[1] <= 0:
+            raise ValueError(f"欄位 {field.key} 的大小必須為正數，目前為 {field.size}")
+
+    if field.type in FONT_FIELD_TYPES:
+        compiled.font = get_font(field_font_family(field), field.font_size or DEFAULT_FONT_SIZE)
+        compiled.color = _parse_color(field)
+
+    if field.type == "mrz":
+        compiled.mrz = field.mrz
+        compiled.line_spacing = field.mrz.line_spacing
+        if compiled.line_spacing is None:
+            compiled.line_spacing = compiled.font.getbbox("A")[3] + MULTILINE_SPACING
+
+    return compiled
+
+
+def compile_render_plan(config: DocumentConfig, renderers: Dict[str, FieldRenderer]) -> RenderPlan:
+    """
+    將模板設定編譯為渲染計畫
+
+    :param config: 模板設定
+    :param renderers: 欄位類型對應的渲染函式
+    :return: 渲染計畫
+    :raises ValueError: 模板中有無法渲染的欄位時拋出，並列出所有錯誤
+    """
+    fields = []
+    errors = []
+    for field in config.fields:
+        try:
+            fields.append(compile_field(field, renderers))
+        except ValueError as e:
+            errors.append(str(e))
+
+    if errors:
+        raise ValueError("模板編譯失敗:\n" + "\n".join(errors))
+
+    photo = config.photo
+    return RenderPlan(
+        fields=fields,
+        photo_enabled=photo.enabled,
+        photo_position=(int(photo.position[0]), int(photo.position[1])),
+        photo_size=(int(photo.size[0]), int(photo.size[1])),
+        photo_border_radius=photo.border_radius or 0,
+    )
@@ -6,6 +6,8 @@ __all__ = [
     "load_config",
     "DocumentConfig",
     "FieldDefinition",
+    "MRZSourceConfig",
     "PhotoConfig",
-    "OutputConfig"
+    "OutputConfig",
+    "EncoderConfig"
 ]
@@ -4,16 +4,44 @@ from pydantic import BaseModel, DirectoryPath, field_validator, model_validator
 
 from .validators import validate_color_format, validate_font_family
 
+class MRZSourceConfig(BaseModel):
+    """
+    MRZ 欄位的資料來源，每個值都是可包含 {CSV 欄位名} 的格式字串（與 save_to 相同）
+
+    證件號碼取自欄位本身的 data_path。日期可為 YYYY/MM/DD（自動轉為 YYMMDD）或 YYMMDD，
+    性別可為 constraits.MRZ_GENDER_CODE_DICT 中的中文名稱或 M/F/<。
+
+    :param country_code: 發照國代碼
+    :param nationality: 國籍代碼，None 表示與 country_code 相同
+    :param last_name: 姓氏
+    :param first_name: 名字
+    :param birth_date: 出生日期
+    :param gender: 性別
+    :param expiry_date: 有效期
+    :param personal_identifier: 個人識別碼
+    :param line_spacing: 兩行之間的距離（像素），None 表示與 ImageDraw 多行文字相同（字高加 4）
+    """
+    country_code: str
+    nationality: Optional[str] = None
+    last_name: str = "{last_name}"
+    first_name: str = "{first_name}"
+    birth_date: str = "{birth_date}"
+    gender: str = "{gender}"
+    expiry_date: str = "{expiry_date}"
+    personal_identifier: str = ""
+    line_spacing: Optional[float] = None
+
 class FieldDefinition(BaseModel):
     """
     欄位定義模型（支援日期欄位的多位置）
 
     - 若 type 為 "date"，position 可為 List[Tuple[float, float]]
     - 否則為單一 Tuple[float, float]
+    - 若 type 為 "mrz"，需要 mrz 設定，data_path 為證件號碼
     """
 
     key: str
-    type: Literal["text", "number", "date", "barcode"]
+    type: Literal["text", "number", "date", "barcode", "mrz"]
     position: Union[
         Tuple[float, float],
         List[Tuple[float, float]]
@@ -24,6 +52,7 @@ class FieldDefinition(BaseModel):
     size: Optional[Tuple[int, int]] = None
     date_format: str = "%Y/%m/%d"
     data_path: str
+    mrz: Optional[MRZSourceConfig] = None
 
     @field_validator("font_color", mode="after")
     @classmethod
@@ -45,6 +74,8 @@ class FieldDefinition(BaseModel):
         else:
             if not isinstance(self.position, tuple):
                 raise ValueError(f"當 type 為 '{self.type}' 時，position 應為單一座標")
+        if self.type == "mrz" and self.mrz is None:
+            raise ValueError(f"MRZ 欄位 {self.key} 需要 mrz 設定（至少包含 country_code）")
         return self
 
 # 背景圖格式驗證
@@ -77,6 +108,8 @@ class PhotoConfig(BaseModel):
     :param position: 照片位置 (x, y)
     :param size: 照片大小 (寬, 高)
     :param border_radius: 照片邊框半徑
+    :param index_file: 照片索引檔路徑，照片數量很多時可避免每次都重新掃描資料夾
+    :param cache_dir: 處理後照片的快取資料夾，重複執行時可略過照片解碼與縮放
     :raises ValueError: 如果資料夾為空，則拋出此錯誤
     """
     enabled: bool
@@ -84,6 +117,8 @@ class PhotoConfig(BaseModel):
     position: Tuple[int, int]
     size: Tuple[int, int]
     border_radius: Optional[int] = 0
+    index_file: Optional[str] = None
+    cache_dir: Optional[str] = None
 
     @field_validator("folder", mode="after")
     @classmethod
@@ -92,6 +127,122 @@ class PhotoConfig(BaseModel):
             raise ValueError(f"photo.folder 資料夾存在，但為空：{v}")
         return v
 
+class PngEncoderConfig(BaseModel):
+    """
+    PNG 編碼設定
+
+    :param compress_level: zlib 壓縮等級 (0-9)，數字越小編碼越快、檔案越大
+    :param strategy: zlib 壓縮策略
+    :param palette_colors: 量化為調色盤 PNG 的顏色數量 (2-256)，None 表示不量化
+    """
+    compress_level: int = 6
+    strategy: Literal["default", "filtered", "huffman_only", "rle", "fixed"] = "default"
+    palette_colors: Optional[int] = None
+
+    @field_validator("compress_level", mode="after")
+    @classmethod
+    def check_compress_level(cls, v: int) -> int:
+        if not 0 <= v <= 9:
+            raise ValueError(f"PNG compress_level 必須介於 0 到 9，目前為 {v}")
+        return v
+
+    @field_validator("palette_colors", mode="after")
+    @classmethod
+    def check_palette_colors(cls, v: Optional[int]) -> Optional[int]:
+        if v is not None and not 2 <= v <= 256:
+            raise ValueError(f"PNG palette_colors 必須介於 2 到 256，目前為 {v}")
+        return v
+
+class JpegEncoderConfig(BaseModel):
+    """
+    JPEG 編碼設定
+
+    :param quality: 品質 (1-100)
+    :param subsampling: 色度抽樣方式，None 表示使用 Pillow 預設值
+    :param progressive: 是否輸出漸進式 JPEG
+    """
+    quality: int = 95
+    subsampling: Optional[Literal["4:4:4", "4:2:2", "4:2:0"]] = None
+    progressive: bool = False
+
+    @field_validator("quality", mode="after")
+    @classmethod
+    def check_quality(cls, v: int) -> int:
+        if not 1 <= v <= 100:
+            raise ValueError(f"JPEG quality 必須介於 1 到 100，目前為 {v}")
+        return v
+
+class WebpEncoderConfig(BaseModel):
+    """
+    WebP 編碼設定
+
+    :param lossless: 是否使用無損壓縮
+    :param quality: 品質 (0-100)，無損壓縮時代表壓縮力道
+    :param method: 編碼方法 (0-6)，數字越大越慢、檔案越小
+    """
+    lossless: bool = False
+    quality: int = 90
+    method: int = 4
+
+    @field_validator("quality", mode="after")
+    @classmethod
+    def check_quality(cls, v: int) -> int:
+        if not 0 <= v <= 100:
+            raise ValueError(f"WebP quality 必須介於 0 到 100，目前為 {v}")
+        return v
+
+    @field_validator("method", mode="after")
+    @classmethod
+    def check_method(cls, v: int) -> int:
+        if not 0 <= v <= 6:
+            raise ValueError(f"WebP method 必須介於 0 到 6，目前為 {v}")
+        return v
+
+class EncoderConfig(BaseModel):
+    """
+    輸出編碼設定
+
+    :param png: PNG 編碼設定
+    :param jpeg: JPEG 編碼設定
+    :param webp: WebP 編碼設定
+    :param threads: 編碼執行緒數量，0 表示在渲染執行緒中同步編碼
+    """
+    png: PngEncoderConfig = PngEncoderConfig()
+    jpeg: JpegEncoderConfig = JpegEncoderConfig()
+    webp: WebpEncoderConfig = WebpEncoderConfig()
+    threads: int = 2
+
+    @field_validator("threads", mode="after")
+    @classmethod
+    def check_threads(cls, v: int) -> int:
+        if v < 0:
+            raise ValueError(f"encoder.threads 不可為負數，目前為 {v}")
+        return v
+
+class WriterConfig(BaseModel):
+    """
+    輸出寫入設定
+
+    :param threads: 寫入執行緒數量
+    :param queue_size: 等待寫入的檔案數量上限，佇列已滿時生成會暫停等待
+    """
+    threads: int = 4
+    queue_size: int = 32
+
+    @field_validator("threads", mode="after")
+    @classmethod
+    def check_threads(cls, v: int) -> int:
+        if v < 1:
+            raise ValueError(f"writer.threads 必須至少為 1，目前為 {v}")
+        return v
+
+    @field_validator("queue_size", mode="after")
+    @classmethod
+    def check_queue_size(cls, v: int) -> int:
+        if v < 1:
+            raise ValueError(f"writer.queue_size 必須至少為 1，目前為 {v}")
+        return v
+
 class OutputConfig(BaseModel):
     """
     輸出設定模型
@@ -100,11 +251,17 @@ class OutputConfig(BaseModel):
     :param save_to: 儲存路徑格式
     :param output_file_format: 輸出檔案格式
     :param other_file: 其他檔案模式列表
+    :param other_file_mode: 其他檔案放入個別資料夾的方式，auto 依序嘗試 hardlink、reflink、copy
+    :param encoder: 輸出編碼設定
+    :param writer: 輸出寫入設定
     """
     dpi: int = 300
     save_to: str
     output_file_format: str
     other_file: Optional[List[str]] = []
+    other_file_mode: Literal["auto", "hardlink", "reflink", "copy"] = "auto"
+    encoder: EncoderConfig = EncoderConfig()
+    writer: WriterConfig = WriterConfig()
 
 class DocumentConfig(BaseModel):
     """
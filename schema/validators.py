@@ -1,7 +1,8 @@
 import re
 from typing import Optional
 from pathlib import Path
-import matplotlib.font_manager as fm
+
+from font_index import get_font_index
 
 
 def is_hex_color(s: str) -> bool:
@@ -56,8 +57,7 @@ def validate_font_family(font: Optional[str]) -> Optional[str]:
             raise ValueError(f"字體檔案不存在: {font_path}，可用字體: {available_names}")
         return font
     
-    # 原有的系統字體檢查邏輯
-    font_names = {f.name for f in fm.fontManager.ttflist}
-    if font not in font_names:
+    # 系統字體：查詢字體索引（系統字體資料夾與 fonts 資料夾）
+    if font not in get_font_index():
         raise ValueError(f"系統未安裝字體 '{font}'，請確認拼字或安裝字體")
     return font
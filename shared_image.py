@@ -0,0 +1,43 @@
+"""
+共用記憶體影像模組
+將解碼後的影像放入 multiprocessing.shared_memory，讓多個工作行程直接讀取同一份像素資料
+"""
+
+from multiprocessing import shared_memory
+from typing import Tuple
+
+from PIL import Image
+
+# 共用影像的描述：(共用記憶體名稱, 影像模式, 影像尺寸)，可透過 initargs 傳給工作行程
+SharedImageRef = Tuple[str, str, Tuple[int, int]]
+
+
+def publish_image(image: Image.Image) -> Tuple[shared_memory.SharedMemory, SharedImageRef]:
+    """
+    將影像的原始像素複製到新的共用記憶體區塊
+
+    呼叫端負責在所有工作行程結束後呼叫 close() 與 unlink() 釋放共用記憶體。
+
+    :param image: 要共用的影像
+    :return: (共用記憶體物件, 共用影像描述)
+    """
+    data = image.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[:len(data)] = data
+    return shm, (shm.name, image.mode, image.size)
+
+
+def attach_image(ref: SharedImageRef) -> Tuple[Image.Image, shared_memory.SharedMemory]:
+    """
+    連接到共用影像，不複製像素資料
+
+    回傳的影像為唯讀，修改前需先 copy()。呼叫端必須保留共用記憶體物件的參考直到不再使用影像。
+
+    :param ref: publish_image 回傳的共用影像描述
+    :return: (唯讀影像, 共用記憶體物件)
+    """
+    name, mode, size = ref
+    # 由建立者負責釋放，連接端不向 resource tracker 註冊，避免行程結束時被提前移除
+    shm = shared_memory.SharedMemory(name=name, track=False)
+    image = Image.frombuffer(mode, size, shm.buf, "raw", mode, 0, 1)
+    return image, shm
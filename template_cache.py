@@ -0,0 +1,234 @@
+"""
+模板編譯快取模組
+保存已驗證的模板設定與解碼後的背景圖片，模板與其引用的背景、字體都未變更時，
+之後執行可以略過 YAML 解析、pydantic 驗證與 PNG 解碼
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image
+
+import schema
+from font_index import user_cache_dir
+from font_registry import font_file_path
+from render_plan import FONT_FIELD_TYPES, field_font_family
+from schema import DocumentConfig, load_config
+
+logger = logging.getLogger(__name__)
+
+# 快取格式版本，格式或編譯內容變更時遞增以捨棄舊快取
+CACHE_FORMAT_VERSION = 2
+
+# 背景圖片所在的資料夾
+TEMPLATE_DIR = Path("templates")
+
+
+@dataclass
+class CompiledTemplate:
+    """
+    編譯完成的模板
+
+    :param config: 已驗證的模板設定
+    :param background: RGBA 背景圖片（從快取載入時為唯讀的記憶體映射影像）
+    :param cached: 是否從快取載入
+    """
+    config: DocumentConfig
+    background: Image.Image
+    cached: bool = False
+
+
+def default_cache_dir() -> Path:
+    """模板快取的預設資料夾"""
+    return user_cache_dir() / "templates"
+
+
+def _schema_fingerprint() -> str:
+    """模板驗證程式碼的雜湊，schema 變更時舊的快取設定不再相容"""
+    digest = hashlib.sha256()
+    for source in sorted(Path(schema.__file__).parent.glob("*.py")):
+        digest.update(source.name.encode("utf-8"))
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+def _file_hash(path: Path) -> str:
+    """計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with path.open('rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _asset_record(path: Path) -> Dict[str, object]:
+    """記錄資源檔案的大小、修改時間與內容雜湊"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _file_hash(path)}
+
+
+def _asset_unchanged(path: str, record: Dict[str, object]) -> bool:
+    """
+    檢查資源檔案是否未變更
+
+    大小與修改時間相同時直接視為未變更，否則重新計算內容雜湊比對；
+    內容相同但修改時間不同時（例如重新複製檔案）會更新 record 中的修改時間。
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != record["size"]:
+        return False
+    if stat.st_mtime_ns == record["mtime_ns"]:
+        return True
+    if _file_hash(Path(path)) != record["sha256"]:
+        return False
+    record["mtime_ns"] = stat.st_mtime_ns
+    return True
+
+
+def template_assets(config: DocumentConfig) -> Dict[str, Dict[str, object]]:
+    """
+    列出模板引用的背景圖片與字體檔案
+
+    :param config: 模板設定
+    :return: 檔案絕對路徑對應檔案記錄的字典
+    """
+    paths = [TEMPLATE_DIR / config.background.image]
+    for field in config.fields:
+        if field.type in FONT_FIELD_TYPES:
+            font_path = font_file_path(field_font_family(field))
+            if font_path is not None and font_path.is_file():
+                paths.append(font_path)
+    return {str(path.resolve()): _asset_record(path) for path in paths}
+
+
+def _entry_dir(cache_dir: Path, template_bytes: bytes) -> Path:
+    """模板內容、工作目錄與驗證程式碼對應的快取資料夾"""
+    raw = hashlib.sha256()
+    for part in (str(CACHE_FORMAT_VERSION), _schema_fingerprint(), os.getcwd()):
+        raw.update(part.encode("utf-8"))
+        raw.update(b"\0")
+    raw.update(template_bytes)
+    key = raw.hexdigest()
+    return cache_dir / key[:2] / key
+
+
+def _load_entry(entry_dir: Path) -> Optional[CompiledTemplate]:
+    """讀取快取項目，不存在或資源已變更時回傳 None"""
+    try:
+        with (entry_dir / "meta.json").open('r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("version") != CACHE_FORMAT_VERSION:
+            return None
+        mtimes = {path: record["mtime_ns"] for path, record in meta["assets"].items()}
+        if not all(_asset_unchanged(path, record) for path, record in meta["assets"].items()):
+            return None
+        if any(record["mtime_ns"] != mtimes[path] for path, record in meta["assets"].items()):
+            # 記錄新的修改時間，下次不需要重新計算雜湊
+            try:
+                _write_json_atomic(entry_dir / "meta.json", meta)
+            except OSError:
+                pass
+
+        with (entry_dir / "config.pickle").open('rb') as f:
+            config = pickle.load(f)
+
+        # 以記憶體映射載入原始 RGBA 像素，不需要解碼
+        with (entry_dir / "background.rgba").open('rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        background = Image.frombuffer("RGBA", tuple(meta["background_size"]), buffer, "raw", "RGBA", 0, 1)
+        return CompiledTemplate(config, background, cached=True)
+    except (OSError, ValueError, KeyError, TypeError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def _write_json_atomic(path: Path, data: Dict[str, object]):
+    """先寫入暫存檔再取代"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open('w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _write_entry(entry_dir: Path, compiled: CompiledTemplate, assets: Dict[str, Dict[str, object]]):
+    """寫入快取項目：先寫入暫存資料夾，完成後再改名，避免其他行程讀到不完整的項目"""
+    entry_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = entry_dir.with_name(f"{entry_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+
+    with (tmp_dir / "config.pickle").open('wb') as f:
+        pickle.dump(compiled.config, f, protocol=pickle.HIGHEST_PROTOCOL)
+    (tmp_dir / "background.rgba").write_bytes(compiled.background.tobytes())
+    _write_json_atomic(tmp_dir / "meta.json", {
+        "version": CACHE_FORMAT_VERSION,
+        "background_size": list(compiled.background.size),
+        "assets": assets,
+    })
+
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # 其他行程已經寫入相同的項目
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_background(config: DocumentConfig) -> Image.Image:
+    """
+    載入並解碼背景圖片
+
+    :param config: 模板設定
+    :return: RGBA 背景圖片
+    """
+    bg_path = TEMPLATE_DIR / config.background.image
+    if not bg_path.exists():
+        raise FileNotFoundError(f"背景圖片不存在: {bg_path}")
+    return Image.open(bg_path).convert("RGBA")
+
+
+def load_template(path: str | Path, cache_dir: Optional[str | Path] = None, use_cache: bool = True) -> CompiledTemplate:
+    """
+    載入模板設定與背景圖片，優先使用編譯快取
+
+    快取以模板 YAML 的內容為鍵，並記錄背景圖片與引用字體的內容雜湊；
+    任何一個檔案變更、或 schema 驗證程式碼變更時都會重新驗證並更新快取。
+
+    :param path: 模板描述檔路徑
+    :param cache_dir: 快取資料夾，None 表示使用 default_cache_dir()
+    :param use_cache: 是否使用快取，False 則每次重新解析與驗證
+    :return: 編譯完成的模板
+    """
+    path = Path(path)
+    if not use_cache:
+        config = load_config(path)
+        return CompiledTemplate(config, load_background(config))
+
+    if not path.exists():
+        raise FileNotFoundError(f"配置檔不存在：{path}")
+    template_bytes = path.read_bytes()
+    entry_dir = _entry_dir(Path(cache_dir) if cache_dir is not None else default_cache_dir(), template_bytes)
+
+    compiled = _load_entry(entry_dir)
+    if compiled is not None:
+        logger.debug(f"使用模板編譯快取: {path} -> {entry_dir}")
+        return compiled
+
+    config = load_config(path)
+    compiled = CompiledTemplate(config, load_background(config))
+    try:
+        _write_entry(entry_dir, compiled, template_assets(config))
+        logger.debug(f"已寫入模板編譯快取: {path} -> {entry_dir}")
+    except OSError as e:
+        logger.debug(f"無法寫入模板編譯快取 {entry_dir}: {e}")
+    return compiled
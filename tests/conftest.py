@@ -0,0 +1,70 @@
+"""測試共用的模板工作目錄：背景、字體、照片與額外檔案都放在暫存資料夾中"""
+
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+TEMPLATE_YAML = """\
+id: "test"
+country: "NRE"
+version: "1.0"
+background:
+  image: "bg.png"
+  color: "#f4f4f4"
+fields:
+  - key: "name"
+    type: "text"
+    position: [40, 20]
+    font_size: 24
+    font_color: "#112233"
+    font_family: "OCR-B.ttf"
+    data_path: "name"
+photo:
+  enabled: true
+  folder: "photos"
+  position: [10, 60]
+  size: [60, 80]
+output:
+  save_to: "{id_number}"
+  output_file_format: "card-{id_number}.png"
+  other_file:
+    - "/resources/pages/*.png"
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    建立只含一個文字欄位與照片的模板工作目錄，並切換到該目錄（模板中的路徑都是相對路徑）
+
+    :return: 工作目錄路徑，模板為 template.yml
+    """
+    (tmp_path / "templates").mkdir()
+    Image.new("RGBA", (320, 200), (240, 240, 240, 255)).save(tmp_path / "templates" / "bg.png")
+    os.symlink(PROJECT_DIR / "fonts", tmp_path / "fonts")
+
+    (tmp_path / "photos").mkdir()
+    Image.new("RGB", (120, 160), (200, 120, 80)).save(tmp_path / "photos" / "A100000000.png")
+
+    pages = tmp_path / "resources" / "pages"
+    pages.mkdir(parents=True)
+    for i in range(2):
+        Image.new("RGB", (40, 40), (i * 100, 50, 50)).save(pages / f"p{i}.png")
+
+    (tmp_path / "template.yml").write_text(TEMPLATE_YAML, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / ".cache"))
+    return tmp_path
+
+
+@pytest.fixture
+def rows():
+    """兩筆 CSV 資料"""
+    return [
+        {"name": "Alice", "id_number": "A100000000"},
+        {"name": "Bob", "id_number": "A100000001"},
+    ]
@@ -0,0 +1,37 @@
+"""ZIP 壓縮檔內容：只有放入額外檔案時才包含 other_file"""
+
+import zipfile
+
+import pytest
+
+from document_generator import DocumentGenerator
+
+
+def _namelist(path):
+    with zipfile.ZipFile(path) as zf:
+        return sorted(zf.namelist())
+
+
+@pytest.mark.parametrize("write_loose", [True, False])
+def test_archive_includes_additional_files(workspace, rows, write_loose):
+    generator = DocumentGenerator("template.yml", output_dir="output", use_template_cache=False)
+    results = generator.process_batch(rows, copy_additional=True, create_archive=True, write_loose=write_loose)
+    assert all(success for _, success, _ in results)
+
+    for row in rows:
+        archive = workspace / "output" / f"{row['id_number']}_documents.zip"
+        assert _namelist(archive) == [f"card-{row['id_number']}.png", "p0.png", "p1.png"]
+        person_dir = workspace / "output" / row["id_number"]
+        assert (person_dir / "p0.png").exists() == write_loose
+
+
+@pytest.mark.parametrize("write_loose", [True, False])
+def test_skip_additional_leaves_archive_without_extras(workspace, rows, write_loose):
+    generator = DocumentGenerator("template.yml", output_dir="output", use_template_cache=False)
+    results = generator.process_batch(rows, copy_additional=False, create_archive=True, write_loose=write_loose)
+    assert all(success for _, success, _ in results)
+
+    for row in rows:
+        archive = workspace / "output" / f"{row['id_number']}_documents.zip"
+        assert _namelist(archive) == [f"card-{row['id_number']}.png"]
+        assert not (workspace / "output" / row["id_number"] / "p0.png").exists()
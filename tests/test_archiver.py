@@ -0,0 +1,95 @@
+"""額外檔案的放置：切換放置方式不會破壞原始檔案，只有不支援的錯誤才改用其他方式"""
+
+import errno
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import archiver
+from archiver import SharedResources
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "resources" / "page.png"
+    path.parent.mkdir()
+    path.write_bytes(b"original page")
+    return path
+
+
+@pytest.mark.parametrize("second_mode", ["copy", "reflink", "auto"])
+def test_switching_from_hardlink_keeps_source(tmp_path, source, second_mode):
+    person_dir = tmp_path / "output" / "A100000000"
+    SharedResources([source], "hardlink").place(person_dir)
+    dst_path = person_dir / source.name
+    assert os.path.samefile(source, dst_path)
+
+    try:
+        SharedResources([source], second_mode).place(person_dir)
+    except OSError as e:
+        # 檔案系統不支援 reflink 時，只指定 reflink 會失敗，但不可影響原始檔案
+        assert second_mode == "reflink" and e.errno in archiver.UNSUPPORTED_ERRNOS
+    assert source.read_bytes() == b"original page"
+
+    if second_mode == "copy":
+        assert not os.path.samefile(source, dst_path)
+        assert dst_path.read_bytes() == b"original page"
+
+
+def test_copy_then_hardlink(tmp_path, source):
+    person_dir = tmp_path / "output" / "A100000000"
+    SharedResources([source], "copy").place(person_dir)
+    SharedResources([source], "hardlink").place(person_dir)
+    assert os.path.samefile(source, person_dir / source.name)
+
+
+def test_unsupported_method_falls_back(tmp_path, source, monkeypatch):
+    def cross_device(src_path, dst_path):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setitem(archiver.PLACE_METHODS, "hardlink", cross_device)
+    resources = SharedResources([source], "auto")
+    resources.place(tmp_path / "a")
+    assert (tmp_path / "a" / source.name).read_bytes() == b"original page"
+    assert "hardlink" not in resources._methods
+
+
+def test_other_errors_are_raised(tmp_path, source, monkeypatch):
+    def disk_full(src_path, dst_path):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setitem(archiver.PLACE_METHODS, "hardlink", disk_full)
+    resources = SharedResources([source], "auto")
+    with pytest.raises(OSError) as info:
+        resources.place(tmp_path / "a")
+    assert info.value.errno == errno.ENOSPC
+    assert resources._methods[0] == "hardlink"
+
+
+def test_pickled_resources_keep_files_and_methods(tmp_path, source):
+    resources = SharedResources([source], "auto")
+    resources._methods.remove("hardlink")
+    resources.archive_template()
+
+    restored = pickle.loads(pickle.dumps(resources))
+    assert restored.files == [source]
+    assert restored._methods == ["reflink", "copy"]
+    assert restored._archive_template is None
+    restored.place(tmp_path / "a")
+    assert (tmp_path / "a" / source.name).read_bytes() == b"original page"
+
+
+@pytest.mark.parametrize("mode", ["hardlink", "copy", "auto"])
+def test_concurrent_placement_into_shared_dir(tmp_path, source, mode):
+    # 多筆資料共用同一個 save_to 資料夾時，同時放置不可失敗
+    person_dir = tmp_path / "output" / "shared"
+    resources = SharedResources([source], mode)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for future in [executor.submit(resources.place, person_dir) for _ in range(200)]:
+            future.result()
+
+    assert (person_dir / source.name).read_bytes() == b"original page"
+    assert source.read_bytes() == b"original page"
+    assert sorted(path.name for path in person_dir.iterdir()) == [source.name]
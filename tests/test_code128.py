@@ -0,0 +1,102 @@
+"""Code128 條碼：繪製結果解碼後須與原始資料相同，且不可超出欄位區域"""
+
+import logging
+
+import pytest
+from PIL import Image, ImageDraw
+
+from code128 import PATTERNS, QUIET_ZONE_MODULES, START_A, START_B, START_C, STOP, code128_widths, draw_code128, encode_code128
+
+SAMPLES = ["B000000001", "A123456789", "abc", "12", "X1234567Y", "\x01ab\x02", "HELLO-world 2025", "9" * 15]
+
+
+def decode_values(values):
+    """依 Code128 規則將符號值解碼為文字，並檢查校驗碼"""
+    assert values[-1] == STOP
+    checksum = values[0] + sum(weight * value for weight, value in enumerate(values[1:-2], start=1))
+    assert checksum % 103 == values[-2]
+
+    charset = {START_A: "A", START_B: "B", START_C: "C"}[values[0]]
+    text = []
+    for value in values[1:-2]:
+        if charset == "C":
+            if value < 100:
+                text.append(f"{value:02d}")
+            else:
+                charset = "B" if value == 100 else "A"
+        elif value == 99:
+            charset = "C"
+        elif charset == "A" and value == 100:
+            charset = "B"
+        elif charset == "B" and value == 101:
+            charset = "A"
+        elif charset == "A":
+            text.append(chr(value + 32) if value < 64 else chr(value - 64))
+        else:
+            text.append(chr(value + 32))
+    return "".join(text)
+
+
+def read_widths(image, y, x0, x1):
+    """讀取一列像素中第一個到最後一個深色像素之間的條/空寬度（像素）"""
+    dark = [image.getpixel((x, y))[0] < 128 for x in range(x0, x1)]
+    first, last = dark.index(True), len(dark) - dark[::-1].index(True)
+    runs, current = [], 0
+    for i in range(first, last):
+        if i > first and dark[i] != dark[i - 1]:
+            runs.append(current)
+            current = 0
+        current += 1
+    runs.append(current)
+    return runs
+
+
+def widths_to_values(widths):
+    lookup = {pattern: value for value, pattern in enumerate(PATTERNS)}
+    values, i = [], 0
+    while i < len(widths):
+        size = 7 if i + 7 == len(widths) else 6
+        values.append(lookup["".join(str(w) for w in widths[i:i + size])])
+        i += size
+    return values
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_encode_round_trip(data):
+    assert decode_values(encode_code128(data)) == data
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_drawn_barcode_decodes_within_box(data):
+    image = Image.new("RGBA", (400, 100), (200, 200, 200, 255))
+    draw_code128(ImageDraw.Draw(image), data, (20, 10), (340, 80))
+
+    module_width = 340 // (sum(code128_widths(data)) + 2 * QUIET_ZONE_MODULES)
+    runs = read_widths(image, 50, 20, 360)
+    assert all(run % module_width == 0 for run in runs)
+    assert decode_values(widths_to_values([run // module_width for run in runs])) == data
+
+    # 區域外維持原本的底色
+    outside = Image.new("RGBA", image.size, (200, 200, 200, 255))
+    outside.paste(image.crop((20, 10, 360, 90)), (20, 10))
+    assert outside.tobytes() == image.tobytes()
+
+
+def test_narrow_box_stays_inside_and_warns(caplog):
+    data = "B000000001-LONG-DATA"
+    image = Image.new("RGBA", (200, 60), (200, 200, 200, 255))
+    with caplog.at_level(logging.WARNING, logger="code128"):
+        draw_code128(ImageDraw.Draw(image), data, (30, 10), (50, 40))
+
+    assert sum(code128_widths(data)) > 50
+    assert "可能無法掃描" in caplog.text
+    outside = Image.new("RGBA", image.size, (200, 200, 200, 255))
+    outside.paste(image.crop((30, 10, 80, 50)), (30, 10))
+    assert outside.tobytes() == image.tobytes()
+
+
+def test_rejects_non_ascii():
+    with pytest.raises(ValueError):
+        encode_code128("證件")
+    with pytest.raises(ValueError):
+        encode_code128("")
@@ -0,0 +1,62 @@
+"""照片轉換：只轉換新增或變更的照片，不覆蓋使用者自行放入的 PNG"""
+
+import os
+
+from PIL import Image
+
+from converter import MANIFEST_NAME, convert_images_to_png
+from photo_index import PhotoIndex
+
+
+def _write_jpeg(path, color):
+    Image.new("RGB", (40, 60), color).save(path, quality=95)
+
+
+def test_converts_new_and_changed_sources(tmp_path):
+    _write_jpeg(tmp_path / "a.jpg", (200, 10, 10))
+    convert_images_to_png(tmp_path, workers=1)
+    assert Image.open(tmp_path / "a.png").getpixel((5, 5))[0] > 150
+    assert (tmp_path / MANIFEST_NAME).exists()
+
+    # 未變更時不重新轉換
+    mtime = os.stat(tmp_path / "a.png").st_mtime_ns
+    convert_images_to_png(tmp_path, workers=1)
+    assert os.stat(tmp_path / "a.png").st_mtime_ns == mtime
+
+    # 內容變更時重新轉換
+    _write_jpeg(tmp_path / "a.jpg", (10, 10, 200))
+    os.utime(tmp_path / "a.jpg", ns=(mtime + 10**9, mtime + 10**9))
+    convert_images_to_png(tmp_path, workers=1)
+    assert Image.open(tmp_path / "a.png").getpixel((5, 5))[2] > 150
+
+
+def test_keeps_user_png_without_manifest_entry(tmp_path, capsys):
+    Image.new("RGB", (40, 60), (0, 255, 0)).save(tmp_path / "b.png")
+    original = (tmp_path / "b.png").read_bytes()
+    _write_jpeg(tmp_path / "b.jpg", (200, 10, 10))
+    os.utime(tmp_path / "b.png", ns=(1, 1))
+
+    convert_images_to_png(tmp_path, workers=1)
+
+    assert (tmp_path / "b.png").read_bytes() == original
+    assert "不會覆蓋" in capsys.readouterr().out
+
+
+def test_noop_conversion_keeps_photo_index(tmp_path, monkeypatch):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    Image.new("RGB", (40, 60), (10, 200, 10)).save(photos / "c.bmp")
+    convert_images_to_png(photos, workers=1)
+    index_file = tmp_path / "photo_index.json"
+    PhotoIndex.build(photos, index_file)
+    mtime = os.stat(photos).st_mtime_ns
+
+    # 沒有需要轉換的照片時不改寫轉換清單，照片目錄的修改時間不變，照片索引檔可直接沿用
+    convert_images_to_png(photos, workers=1)
+    assert os.stat(photos).st_mtime_ns == mtime
+
+    def rescan(folder):
+        raise AssertionError("照片索引檔應直接沿用，不應重新掃描")
+
+    monkeypatch.setattr(PhotoIndex, "scan", staticmethod(rescan))
+    assert PhotoIndex.build(photos, index_file).find("c") == photos / "c.png"
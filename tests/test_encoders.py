@@ -0,0 +1,27 @@
+"""輸出編碼：各格式都記錄模板設定的 DPI"""
+
+import io
+
+import pytest
+from PIL import ExifTags, Image
+
+from encoders import encode_image
+from schema import EncoderConfig
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG", "TIFF"])
+def test_dpi_is_written(fmt):
+    data = encode_image(Image.new("RGBA", (32, 20), (10, 20, 30, 255)), fmt, 300, EncoderConfig())
+    dpi = Image.open(io.BytesIO(data)).info["dpi"]
+    assert [round(float(v)) for v in dpi] == [300, 300]
+
+
+@pytest.mark.parametrize("lossless", [False, True])
+def test_webp_dpi_is_written_to_exif(lossless):
+    encoder = EncoderConfig()
+    encoder.webp.lossless = lossless
+    data = encode_image(Image.new("RGBA", (32, 20), (10, 20, 30, 255)), "WEBP", 300, encoder)
+    exif = Image.open(io.BytesIO(data)).getexif()
+    assert exif[ExifTags.Base.XResolution] == 300
+    assert exif[ExifTags.Base.YResolution] == 300
+    assert exif[ExifTags.Base.ResolutionUnit] == 2
@@ -0,0 +1,94 @@
+"""增量生成：輸入未變更的證件略過，變更的證件（包含照片內容）重新生成，過時的輸出可刪除"""
+
+import os
+
+from PIL import Image
+
+from document_generator import DocumentGenerator
+from manifest import MANIFEST_NAME, UP_TO_DATE_MESSAGE
+
+
+def _run(rows, **kwargs):
+    generator = DocumentGenerator("template.yml", output_dir="output", use_template_cache=False)
+    results = generator.process_batch(rows, create_archive=True, incremental=True, **kwargs)
+    assert all(success for _, success, _ in results)
+    return {id_number: message for id_number, _, message in results}
+
+
+def _save_photo(path, color):
+    # 不壓縮的 PNG，尺寸相同時檔案大小也相同
+    Image.new("RGB", (120, 160), color).save(path, "PNG", compress_level=0)
+
+
+def test_unchanged_rows_are_skipped(workspace, rows):
+    assert _run(rows) == {"A100000000": "", "A100000001": ""}
+    assert _run(rows) == {"A100000000": UP_TO_DATE_MESSAGE, "A100000001": UP_TO_DATE_MESSAGE}
+
+
+def test_changed_row_and_missing_output_are_regenerated(workspace, rows):
+    _run(rows)
+    changed = [dict(rows[0], name="Alicia"), rows[1]]
+    assert _run(changed) == {"A100000000": "", "A100000001": UP_TO_DATE_MESSAGE}
+
+    (workspace / "output" / "A100000001_documents.zip").unlink()
+    assert _run(changed) == {"A100000000": UP_TO_DATE_MESSAGE, "A100000001": ""}
+
+
+def test_photo_content_change_with_same_size_and_mtime(workspace, rows):
+    photo = workspace / "photos" / "A100000000.png"
+    _save_photo(photo, (200, 120, 80))
+    _run(rows)
+    before = os.stat(photo)
+
+    # 以相同大小的照片取代，並還原修改時間（例如 cp -p 或同步工具）
+    replacement = workspace / "new-photo.tmp"
+    _save_photo(replacement, (20, 60, 200))
+    os.utime(replacement, ns=(before.st_atime_ns, before.st_mtime_ns))
+    os.replace(replacement, photo)
+    after = os.stat(photo)
+    assert (after.st_size, after.st_mtime_ns) == (before.st_size, before.st_mtime_ns)
+
+    assert _run(rows) == {"A100000000": "", "A100000001": UP_TO_DATE_MESSAGE}
+    assert _run(rows) == {"A100000000": UP_TO_DATE_MESSAGE, "A100000001": UP_TO_DATE_MESSAGE}
+
+
+def test_touched_photo_with_same_content_is_up_to_date(workspace, rows):
+    _run(rows)
+    photo = workspace / "photos" / "A100000000.png"
+    photo.write_bytes(photo.read_bytes())
+    assert _run(rows) == {"A100000000": UP_TO_DATE_MESSAGE, "A100000001": UP_TO_DATE_MESSAGE}
+
+
+def test_prune_removes_stale_outputs(workspace, rows):
+    _run(rows, copy_additional=True)
+    assert (workspace / "output" / "A100000001" / "p0.png").exists()
+
+    _run(rows[:1], copy_additional=True)
+    assert (workspace / "output" / "A100000001_documents.zip").exists()
+
+    _run(rows[:1], copy_additional=True, prune=True)
+    assert not (workspace / "output" / "A100000001_documents.zip").exists()
+    assert not (workspace / "output" / "A100000001").exists()
+    assert (workspace / "output" / "A100000000" / "card-A100000000.png").exists()
+
+
+def test_without_incremental_no_manifest_is_written(workspace, rows):
+    generator = DocumentGenerator("template.yml", output_dir="output", use_template_cache=False)
+    generator.process_batch(rows, create_archive=True)
+    assert not (workspace / "output" / MANIFEST_NAME).exists()
+
+
+def test_prune_after_renaming_output_keeps_live_files(workspace, rows):
+    _run(rows, copy_additional=True)
+    template = workspace / "template.yml"
+    template.write_text(template.read_text(encoding="utf-8").replace("card-{id_number}", "passport-{id_number}"),
+                        encoding="utf-8")
+    _run(rows, copy_additional=True)
+    _run(rows, copy_additional=True, prune=True)
+
+    for row in rows:
+        person_dir = workspace / "output" / row["id_number"]
+        assert not (person_dir / f"card-{row['id_number']}.png").exists()
+        assert (person_dir / f"passport-{row['id_number']}.png").exists()
+        assert (person_dir / "p0.png").exists() and (person_dir / "p1.png").exists()
+        assert (workspace / "output" / f"{row['id_number']}_documents.zip").exists()
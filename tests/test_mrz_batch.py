@@ -0,0 +1,57 @@
+"""MRZ 批次 API：結果與逐筆產生完全相同"""
+
+import pytest
+
+from benchmarks.mrz_batch import batch, generate_columns, per_row
+from libs.mrzgenerater import MRZGenerator
+from mrz_renderer import build_mrz_lines, build_mrz_lines_batch
+from schema import MRZSourceConfig
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_generator_batch_matches_per_row(seed):
+    generator = MRZGenerator()
+    columns = generate_columns(2000, seed=seed, non_ascii_ratio=0.2)
+    expected_line1, expected_line2 = per_row(generator, columns)
+    line1, line2 = batch(generator, columns)
+    assert line1.tolist() == expected_line1
+    assert line2.tolist() == expected_line2
+
+
+SOURCE = MRZSourceConfig(country_code="NRE", last_name="{last_name}", first_name="{first_name}",
+                         gender="{gender}", personal_identifier="{id_number}")
+
+
+def _row(i, **overrides):
+    row = {
+        "last_name": f"Novarex-{i}",
+        "first_name": "Aurélia Maria" if i % 3 else "王 Ming",
+        "birth_date": f"19{50 + i % 50}/{1 + i % 12}/{1 + i % 28}",
+        "expiry_date": "350101",
+        "gender": ["男", "女", "非二元性別", "M"][i % 4],
+        "id_number": f"A{100000000 + i}",
+    }
+    row.update(overrides)
+    return row
+
+
+def test_template_batch_matches_per_row():
+    rows = [_row(i) for i in range(200)]
+    numbers = [row["id_number"] for row in rows]
+    lines, errors = build_mrz_lines_batch(SOURCE, numbers, rows)
+    assert errors == {}
+    assert lines == [build_mrz_lines(SOURCE, number, row) for number, row in zip(numbers, rows)]
+
+
+def test_template_batch_reports_failed_rows():
+    rows = [_row(i) for i in range(6)]
+    del rows[1]["gender"]
+    rows[4]["birth_date"] = "19xx/01/01"
+    numbers = [row["id_number"] for row in rows]
+    lines, errors = build_mrz_lines_batch(SOURCE, numbers, rows)
+
+    assert set(errors) == {1, 4}
+    assert "gender" in errors[1]
+    for i in (0, 2, 3, 5):
+        assert lines[i] == build_mrz_lines(SOURCE, numbers[i], rows[i])
+    assert lines[1] is None and lines[4] is None
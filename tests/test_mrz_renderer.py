@@ -0,0 +1,49 @@
+"""MRZ 字元圖集：拼接結果與 ImageDraw.text 直接繪製的像素完全相同"""
+
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from mrz_renderer import MRZ_CHARSET, GlyphAtlas
+
+OCR_B = Path(__file__).resolve().parent.parent / "fonts" / "OCR-B.ttf"
+
+# 含有字距微調字元對（例如 AV、WA、TA）的 MRZ 行
+LINES = [
+    "P<NRENOVAREX<<AURELIA<MARIA<<<<<<<<<<<<<<<<<",
+    "AVATAWAYTVWAVAYLTY<<AVWAVATAY<<TAVWAYV<<AVTA",
+]
+
+
+def _random_line(rng):
+    return "".join(rng.choice(MRZ_CHARSET) for _ in range(44))
+
+
+def _render(xy, text, font, atlas=None):
+    image = Image.new("L", (1100, 90), 0)
+    draw = ImageDraw.Draw(image)
+    if atlas is not None:
+        atlas.draw(draw, xy, text, 255)
+    else:
+        draw.text(xy, text, fill=255, font=font)
+    return np.asarray(image)
+
+
+@pytest.mark.parametrize("size", [18, 24, 32])
+def test_atlas_matches_draw_text(size):
+    font = ImageFont.truetype(str(OCR_B), size)
+    rng = random.Random(size)
+    lines = LINES + [_random_line(rng) for _ in range(3)]
+    # 涵蓋整數座標與 .50–.55 附近（字距微調累積到半像素時最容易出現差異）的次像素起點
+    fractions = [0.0, 0.25, 0.5, 0.51, 0.53, 0.55, 0.75] + [rng.random() for _ in range(5)]
+    for fraction in fractions:
+        for fy in (0.0, 0.4):
+            xy = (20 + fraction, 10 + fy)
+            atlas = GlyphAtlas(font, (xy[0] % 1, xy[1] % 1))
+            for text in lines:
+                expected = _render(xy, text, font)
+                actual = _render(xy, text, font, atlas)
+                assert np.array_equal(actual, expected), (size, xy, text)
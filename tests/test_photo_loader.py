@@ -0,0 +1,40 @@
+"""照片讀取：JPEG 與 WebP 原始檔直接縮小解碼，不經過全尺寸 PNG"""
+
+from PIL import Image
+
+from converter import CONVERT_EXTENSIONS, convert_images_to_png
+from photo_index import PhotoIndex
+from photo_loader import REDUCING_GAP, open_photo
+
+
+def test_index_prefers_original_jpeg_over_converted_png(tmp_path):
+    for name in ("a.png", "a.jpg", "b.png", "c.webp", "c.bmp"):
+        Image.new("RGB", (8, 8)).save(tmp_path / name)
+
+    index = PhotoIndex(tmp_path, PhotoIndex.scan(tmp_path))
+
+    assert index.find("a") == tmp_path / "a.jpg"
+    assert index.find("b") == tmp_path / "b.png"
+    assert index.find("c") == tmp_path / "c.webp"
+
+
+def test_cli_conversion_skips_directly_decoded_formats(tmp_path):
+    for name in ("a.jpg", "b.webp", "c.bmp"):
+        Image.new("RGB", (8, 8)).save(tmp_path / name)
+
+    convert_images_to_png(tmp_path, workers=1, extensions=CONVERT_EXTENSIONS)
+
+    assert sorted(p.name for p in tmp_path.glob("*.png")) == ["c.png"]
+
+
+def test_jpeg_is_decoded_at_reduced_size(tmp_path):
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (1200, 1600), (120, 80, 40)).save(path, quality=90)
+
+    photo = open_photo(path, (260, 340))
+
+    assert photo.mode == "RGBA"
+    assert photo.size == (600, 800)
+    # 仍保留 cover 縮放需要的 REDUCING_GAP 倍像素
+    assert photo.width >= 260 * REDUCING_GAP and photo.height >= 340 * REDUCING_GAP
+    assert open_photo(path, (260, 340), reduce=False).size == (1200, 1600)
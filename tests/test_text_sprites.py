@@ -0,0 +1,50 @@
+"""文字點陣快取：貼上快取遮罩的結果與 ImageDraw.text 直接繪製的像素完全相同"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from text_sprites import TextSpriteCache
+
+FONTS_DIR = Path(__file__).resolve().parent.parent / "fonts"
+
+TEXTS = ["NRE", "男", "2024/01/31", "AVATAR Wy", "第一行\n第二行"]
+
+
+def _canvas():
+    return Image.new("RGBA", (400, 120), (240, 235, 220, 255))
+
+
+@pytest.mark.parametrize("font_file", ["OCR-B.ttf", "CartographMonoCF-Regular.ttf"])
+@pytest.mark.parametrize("fontmode", ["L", "1"])
+def test_sprite_matches_draw_text(font_file, fontmode):
+    font = ImageFont.truetype(str(FONTS_DIR / font_file), 26)
+    cache = TextSpriteCache()
+    for xy in [(10, 10), (10.5, 10.25), (33.53, 7.9), (0.75, 40.5)]:
+        for text in TEXTS:
+            expected = _canvas()
+            draw = ImageDraw.Draw(expected)
+            draw.fontmode = fontmode
+            draw.text(xy, text, fill=(17, 34, 51, 200), font=font)
+
+            # 第一次點陣化並快取，第二次直接使用快取的遮罩
+            for _ in range(2):
+                actual = _canvas()
+                draw = ImageDraw.Draw(actual)
+                draw.fontmode = fontmode
+                cache.draw_text(draw, xy, text, (17, 34, 51, 200), font)
+                assert np.array_equal(np.asarray(actual), np.asarray(expected)), (font_file, xy, text)
+
+    assert cache.hits > 0
+
+
+def test_color_does_not_split_cache():
+    font = ImageFont.truetype(str(FONTS_DIR / "OCR-B.ttf"), 20)
+    cache = TextSpriteCache()
+    draw = ImageDraw.Draw(_canvas())
+    cache.draw_text(draw, (5.5, 5), "NRE", (255, 0, 0), font)
+    cache.draw_text(draw, (40.5, 30), "NRE", (0, 0, 255), font)
+    assert cache.stats()["size"] == 1
+    assert cache.counters() == (1, 1)
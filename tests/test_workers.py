@@ -0,0 +1,34 @@
+"""工作行程：沿用主行程建立的照片索引與額外檔案清單，不各自重新掃描資料夾"""
+
+from PIL import Image
+
+from document_generator import DocumentGenerator
+
+
+def test_workers_use_parent_photo_index(workspace, rows):
+    generator = DocumentGenerator("template.yml", output_dir="output", use_template_cache=False)
+
+    # 建立生成器之後才放入的照片不在主行程的索引中；工作行程若重新掃描，就會使用這張照片
+    Image.new("RGB", (120, 160), (0, 0, 255)).save(workspace / "photos" / "A100000001.png")
+
+    results = generator.process_batch(rows, workers=2, chunk_size=1)
+    assert all(success for _, success, _ in results)
+
+    with Image.open(workspace / "output" / "A100000000" / "card-A100000000.png") as card:
+        assert card.convert("RGB").getpixel((40, 100)) == (200, 120, 80)
+    with Image.open(workspace / "output" / "A100000001" / "card-A100000001.png") as card:
+        assert card.convert("RGB").getpixel((40, 100)) != (0, 0, 255)
+
+
+def test_workers_use_parent_shared_resources(workspace, rows):
+    generator = DocumentGenerator("template.yml", output_dir="output", use_template_cache=False)
+
+    # 建立生成器之後才放入的額外檔案不在主行程的清單中
+    Image.new("RGB", (40, 40), (0, 0, 0)).save(workspace / "resources" / "pages" / "p2.png")
+
+    results = generator.process_batch(rows, workers=2, chunk_size=1, copy_additional=True, create_archive=True)
+    assert all(success for _, success, _ in results)
+
+    for row in rows:
+        person_dir = workspace / "output" / row["id_number"]
+        assert sorted(path.name for path in person_dir.iterdir()) == [f"card-{row['id_number']}.png", "p0.png", "p1.png"]
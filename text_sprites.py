@@ -0,0 +1,113 @@
+"""
+文字點陣快取模組
+快取文字點陣化後的遮罩，同一字體、同一次像素位置的重複文字（國籍、性別、年月日等）直接以遮罩貼上顏色，
+不需要每張證件重新排版與點陣化
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from PIL import ImageDraw, ImageFont
+
+# 快取鍵：(文字, 字體物件, 點陣模式, 座標的小數部分)
+# 遮罩只包含透明度，與顏色無關，同一段文字以不同顏色繪製時共用同一個遮罩
+SpriteKey = Tuple[str, ImageFont.FreeTypeFont, str, Tuple[float, float]]
+
+# 快取值：(文字遮罩, 遮罩相對於整數座標的偏移量)
+Sprite = Tuple[object, Tuple[int, int]]
+
+
+class TextSpriteCache:
+    """
+    以 LRU 方式快取文字遮罩
+
+    點陣化的方式與 ImageDraw.text 相同（同樣的次像素起點與錨點），貼上後的像素與直接繪製文字完全一致。
+
+    :param max_size: 最多保留的遮罩數量，超過時淘汰最久未使用的遮罩
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._sprites: "OrderedDict[SpriteKey, Sprite]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def draw_text(self, draw: ImageDraw.ImageDraw, xy: Tuple[float, float], text: str,
+                  fill: Tuple[int, ...], font: ImageFont.FreeTypeFont):
+        """
+        繪製單行文字，重複的文字直接使用快取的遮罩
+
+        多行文字或非 FreeType 字體交給 ImageDraw.text 處理。
+
+        :param draw: 證件圖片的繪圖物件
+        :param xy: 文字左上角位置（可為浮點數）
+        :param text: 文字內容
+        :param fill: RGB 或 RGBA 顏色
+        :param font: 字體物件
+        """
+        if "\n" in text or not isinstance(font, ImageFont.FreeTypeFont):
+            draw.text(xy, text, fill=fill, font=font)
+            return
+
+        x, y = xy
+        start = (math.modf(x)[0], math.modf(y)[0])
+        key = (text, font, draw.fontmode, start)
+
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if sprite is None:
+            # 與 ImageDraw.text 單行文字的點陣化參數相同（預設錨點為 la）
+            sprite = font.getmask2(text, draw.fontmode, anchor="la", start=start, stroke_filled=True)
+            with self._lock:
+                self._sprites[key] = sprite
+                while len(self._sprites) > self.max_size:
+                    self._sprites.popitem(last=False)
+                    self.evictions += 1
+
+        mask, offset = sprite
+        # 以遮罩將顏色混合到證件上，與 ImageDraw.text 最後一步相同
+        draw.draw.draw_bitmap((int(x) + offset[0], int(y) + offset[1]), mask, draw.draw.draw_ink(fill))
+
+    def counters(self) -> Tuple[int, int]:
+        """目前的 (命中, 未命中) 次數，供計算一段期間的差值"""
+        with self._lock:
+            return self.hits, self.misses
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得快取統計資訊
+
+        :return: 包含命中、未命中、淘汰次數與命中率的字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._sprites),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """清除所有快取的遮罩與統計資訊"""
+        with self._lock:
+            self._sprites.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# 行程內共用的文字點陣快取
+sprite_cache = TextSpriteCache()
@@ -0,0 +1,237 @@
+"""
+階段耗時統計模組
+以固定分界的直方圖記錄每張證件各階段（照片查詢與解碼、各欄位渲染、編碼、寫入、額外檔案、壓縮）的耗時，
+工作行程的統計可直接合併回主行程，並可輸出為摘要表、JSON Lines 或 Prometheus textfile
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 直方圖的分界（秒）：從 10 微秒開始每格放大 √2 倍，到約 2 分鐘，百分位數的誤差在一格以內
+BUCKET_BOUNDS: Tuple[float, ...] = tuple(1e-5 * 2 ** (i / 2) for i in range(48))
+
+# 統計鍵：(階段名稱, 欄位名稱)，不區分欄位的階段欄位名稱為空字串
+TimingKey = Tuple[str, str]
+
+# Prometheus 指標名稱
+PROMETHEUS_METRIC = "id_gen_stage_duration_seconds"
+
+
+class Histogram:
+    """
+    固定分界的耗時直方圖，可與其他直方圖合併
+
+    百分位數以所在分界內線性內插估計（與 Prometheus histogram_quantile 相同），並限制在實際的最小與最大值之間。
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        """記錄一次耗時"""
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram"):
+        """將另一個直方圖的紀錄加入此直方圖"""
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """
+        估計百分位數
+
+        :param q: 0 到 1 之間的比例，例如 0.95
+        :return: 耗時（秒），沒有紀錄時為 0
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+
+class StageTimings:
+    """
+    依 (階段, 欄位) 分開記錄耗時直方圖
+
+    渲染、編碼與寫入執行緒會同時記錄，所有操作都以鎖保護。
+    """
+
+    def __init__(self):
+        self._histograms: Dict[TimingKey, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, key: str = ""):
+        """
+        記錄一次耗時
+
+        :param stage: 階段名稱，例如 encode、render.text
+        :param seconds: 耗時（秒）
+        :param key: 欄位名稱，不區分欄位的階段為空字串
+        """
+        with self._lock:
+            histogram = self._histograms.get((stage, key))
+            if histogram is None:
+                histogram = self._histograms[(stage, key)] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str, key: str = "") -> Iterator[None]:
+        """以 with 區塊計時，區塊拋出例外時同樣記錄"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, key)
+
+    def drain(self) -> Dict[TimingKey, Histogram]:
+        """取出目前的紀錄並清空，工作行程每處理完一個區塊就交回主行程合併"""
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        return histograms
+
+    def merge(self, histograms: Dict[TimingKey, Histogram]):
+        """合併工作行程交回的紀錄"""
+        with self._lock:
+            for timing_key, other in histograms.items():
+                histogram = self._histograms.get(timing_key)
+                if histogram is None:
+                    histogram = self._histograms[timing_key] = Histogram()
+                histogram.merge(other)
+
+    def clear(self):
+        """清除所有紀錄"""
+        with self._lock:
+            self._histograms.clear()
+
+    def __bool__(self) -> bool:
+        return bool(self._histograms)
+
+    def by_stage(self) -> Dict[str, Histogram]:
+        """將同一階段不同欄位的紀錄合併，依階段名稱排序"""
+        stages: Dict[str, Histogram] = {}
+        with self._lock:
+            for (stage, _), histogram in sorted(self._histograms.items()):
+                stages.setdefault(stage, Histogram()).merge(histogram)
+        return stages
+
+    def by_key(self) -> Dict[TimingKey, Histogram]:
+        """各 (階段, 欄位) 的紀錄，依名稱排序"""
+        with self._lock:
+            return {timing_key: self._histograms[timing_key] for timing_key in sorted(self._histograms)}
+
+    def summary_rows(self, per_key: bool = False) -> List[List[str]]:
+        """
+        摘要表格資料：階段、欄位、次數、總耗時、p50、p95、最大值
+
+        :param per_key: 是否依欄位分開列出（否則同一階段合併為一列）
+        """
+        if per_key:
+            items = list(self.by_key().items())
+        else:
+            items = [((stage, ""), histogram) for stage, histogram in self.by_stage().items()]
+        return [
+            [stage, key, str(h.count), f"{h.total:.2f}", f"{h.quantile(0.5) * 1000:.2f}",
+             f"{h.quantile(0.95) * 1000:.2f}", f"{h.max * 1000:.2f}"]
+            for (stage, key), h in items
+        ]
+
+    def to_json_lines(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        以 JSON Lines 輸出，每個 (階段, 欄位) 一行，包含百分位數與各分界的次數
+
+        :param labels: 附加在每一行的標籤，例如模板名稱
+        """
+        timestamp = time.time()
+        lines = []
+        for (stage, key), h in self.by_key().items():
+            lines.append(json.dumps({
+                **(labels or {}),
+                "timestamp": timestamp,
+                "stage": stage,
+                "field": key,
+                "count": h.count,
+                "sum_seconds": h.total,
+                "p50_ms": h.quantile(0.5) * 1000,
+                "p95_ms": h.quantile(0.95) * 1000,
+                "max_ms": h.max * 1000,
+                "buckets": [[bound, count] for bound, count in zip(BUCKET_BOUNDS + (math.inf,), h.counts) if count],
+            }, ensure_ascii=False))
+        return "".join(line + "\n" for line in lines)
+
+    def to_prometheus(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        以 Prometheus 文字格式輸出直方圖，供 node exporter 的 textfile collector 讀取
+
+        :param labels: 附加在每個指標的標籤，例如模板名稱
+        """
+        lines = [
+            f"# HELP {PROMETHEUS_METRIC} 證件生成各階段的耗時",
+            f"# TYPE {PROMETHEUS_METRIC} histogram",
+        ]
+        for (stage, key), h in self.by_key().items():
+            label_values = {**(labels or {}), "stage": stage}
+            if key:
+                label_values["field"] = key
+            base = ",".join(f'{name}="{_escape_label(value)}"' for name, value in label_values.items())
+            cumulative = 0
+            for bound, count in zip(BUCKET_BOUNDS, h.counts):
+                cumulative += count
+                lines.append(f'{PROMETHEUS_METRIC}_bucket{{{base},le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{PROMETHEUS_METRIC}_bucket{{{base},le="+Inf"}} {h.count}')
+            lines.append(f"{PROMETHEUS_METRIC}_sum{{{base}}} {h.total:.9g}")
+            lines.append(f"{PROMETHEUS_METRIC}_count{{{base}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    """跳脫 Prometheus 標籤值中的特殊字元"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def write_atomic(path: str | Path, content: str):
+    """
+    先寫暫存檔再取代，textfile collector 不會讀到寫到一半的檔案
+
+    :param path: 輸出檔案路徑
+    :param content: 檔案內容
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+# 行程內共用的階段耗時統計
+stage_timings = StageTimings()
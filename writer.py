@@ -0,0 +1,103 @@
+"""
+輸出寫入模組
+以專用的寫入執行緒在背景寫入已編碼的檔案，讓渲染不必等待磁碟或網路儲存
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Optional, Set
+
+from timings import stage_timings
+
+logger = logging.getLogger(__name__)
+
+# 寫入完成後在寫入執行緒中執行的函式，接收檔案路徑，回傳值即為 Future 的結果
+AfterWrite = Callable[[Path], Any]
+
+# 通知寫入執行緒結束的標記
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    有上限的背景寫入佇列
+
+    佇列已滿時 submit 會阻塞，使生成速度不會超過寫入速度（背壓）。
+    已建立過的資料夾會記錄下來，同一個資料夾只呼叫一次 mkdir。
+
+    :param threads: 寫入執行緒數量
+    :param queue_size: 等待寫入的檔案數量上限
+    :param created_dirs: 已建立的資料夾集合，可在多個佇列之間共用
+    """
+
+    def __init__(self, threads: int = 4, queue_size: int = 32, created_dirs: Optional[Set[Path]] = None):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._created_dirs = created_dirs if created_dirs is not None else set()
+        self._dirs_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"writer-{i}", daemon=True)
+            for i in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> "WriteBehindQueue":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, path: Path, data: bytes, after: Optional[AfterWrite] = None) -> Future:
+        """
+        排入一個寫入工作，佇列已滿時等待
+
+        :param path: 輸出檔案路徑
+        :param data: 檔案內容
+        :param after: 寫入完成後執行的函式，None 表示以檔案路徑作為結果
+        :return: 寫入完成（含 after）後取得結果的 Future，寫入失敗時帶有例外
+        """
+        future = Future()
+        self._queue.put((Path(path), data, after, future))
+        return future
+
+    def close(self):
+        """等待所有寫入完成並結束寫入執行緒"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _ensure_dir(self, directory: Path):
+        """建立資料夾，已建立過的資料夾直接略過"""
+        if directory in self._created_dirs:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._dirs_lock:
+            self._created_dirs.add(directory)
+
+    def _run(self):
+        """寫入執行緒主迴圈"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            path, data, after, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with stage_timings.time("write"):
+                    self._ensure_dir(path.parent)
+                    path.write_bytes(data)
+            except Exception as e:
+                logger.error(f"儲存檔案失敗 {path}: {e}")
+                future.set_exception(e)
+                continue
+
+            logger.info("證件已儲存: %s", path)
+            try:
+                future.set_result(after(path) if after is not None else path)
+            except Exception as e:
+                future.set_exception(e)